@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+تطبيع النص العربي وتقسيمه إلى كلمات (مشترك بين الفلترة والتكرار والقصص والصياغة)
+Shared Arabic normalization and tokenization, memoized per message
+"""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# التشكيل (الفتحة، الضمة، الكسرة، السكون، الشدة، التنوين...) والألف الخنجرية والتطويل
+_DIACRITICS = [chr(c) for c in range(0x064B, 0x0660)] + ['ٰ', 'ـ']
+
+# جدول translate محسوب مرة واحدة: حذف التشكيل والتطويل وتوحيد الحروف في مرور واحد
+_ARABIC_FOLD = str.maketrans({
+    **{c: None for c in _DIACRITICS},
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ة': 'ه',
+    'ؤ': 'و',
+})
+
+# حذف التشكيل والتطويل فقط (دون توحيد الحروف ولا علامات الترقيم)
+_STRIP_DIACRITICS = str.maketrans({c: None for c in _DIACRITICS})
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+# علامات الترقيم في طرفي الكلمة (التشكيل ليس \w لكنه جزء من الكلمة)
+_EDGES = re.compile(r'^([^\wً-ٰٟـ]*)(.*?)([^\wً-ٰٟـ]*)$', re.S)
+
+# أداة التعريف وما يلتصق بها (الأطول أولاً)، ثم واو العطف وفاؤه
+ARTICLE_PREFIXES = ('وال', 'فال', 'بال', 'كال', 'لل', 'ال')
+CONJUNCTIONS = ('و', 'ف')
+
+# الرسائل الجارية في خط المعالجة (فلترة، قصص، ذاكرة الصياغة، صياغة بديلة)
+MESSAGE_CACHE_SIZE = 4096
+WORD_CACHE_SIZE = 65536
+
+
+def _fold(text: str) -> str:
+    return _NON_WORD.sub(' ', text.lower().translate(_ARABIC_FOLD))
+
+
+@lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def normalize_arabic(text: str) -> str:
+    """
+    تطبيع النص للمقارنة: حذف التشكيل والتطويل وعلامات الترقيم، وتوحيد أشكال
+    الألف والياء والتاء المربوطة
+    """
+    return _SPACES.sub(' ', _fold(text)).strip()
+
+
+def strip_diacritics(text: str) -> str:
+    """
+    النص دون تشكيل أو تطويل، بحروفه وعلامات ترقيمه (إعلانٌ -> إعلان، عـاجل -> عاجل)
+
+    لمطابقة الكلمات المفتاحية كمقاطع جزئية: توحيد الألف هنا يجعل "الآن"
+    تطابق "الأنبار".
+    """
+    return text.translate(_STRIP_DIACRITICS)
+
+
+def detach_prefix(word: str) -> Tuple[str, str]:
+    """
+    فصل السابقة عن كلمة مطبّعة: والحكومه -> (وال، حكومه)، وقال -> (و، قال)
+
+    يبقى للجذع حرفان على الأقل بعد أداة التعريف وثلاثة بعد الواو أو الفاء
+    (فلا تُقطع كلمات مثل وقف أو فتح).
+
+    Returns:
+        (السابقة أو ''، الجذع)
+    """
+    for prefix in ARTICLE_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            return prefix, word[len(prefix):]
+    if word[:1] in CONJUNCTIONS and len(word) >= 4:
+        return word[0], word[1:]
+    return '', word
+
+
+@lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def tokenize(text: str) -> Tuple[str, ...]:
+    """
+    كلمات النص المطبّعة بعد فصل السوابق، بترتيبها
+
+    النتيجة محفوظة لكل نص: خصائص الفلترة وفهرس التكرار يقسمان الرسالة نفسها
+    مرة واحدة. الصياغة البديلة تعمل على جمل معدلة فتبحث بـ word_key لكل كلمة.
+    """
+    return tuple(detach_prefix(word)[1] for word in normalize_arabic(text).split())
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def word_key(word: str) -> Tuple[str, str, str]:
+    """
+    مفاتيح البحث لكلمة واحدة من النص الأصلي (في المرادفات مثلاً)
+
+    Returns:
+        (الكلمة المطبّعة، السابقة، الجذع) - يُبحث بالكلمة كاملة أولاً ثم
+        بالجذع، فلا تُقطع كلمة مثل واضح إلى و+اضح إن كانت معروفة كاملة
+    """
+    folded = _fold(word).split()
+    if len(folded) != 1:
+        normalized = ' '.join(folded)
+        return normalized, '', normalized
+    prefix, stem = detach_prefix(folded[0])
+    return folded[0], prefix, stem
+
+
+def split_edges(word: str) -> Tuple[str, str, str]:
+    """
+    (علامات الترقيم قبل الكلمة، الكلمة، علامات الترقيم بعدها)
+    """
+    return _EDGES.match(word).groups()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+استرجاع ما فات من رسائل القنوات المصدر بعد توقف البوت
+Catch-up backfill: paged, rate-limited history fetch merged into one time-ordered stream
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Tuple
+
+from telethon.errors import FloodWaitError
+
+from channels_module import ChannelInfo
+from publisher_module import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# نهاية سجل قناة في الدمج
+_DONE = object()
+
+
+class Backfill:
+    """
+    يقرأ سجل كل قناة مصدر بعد آخر رسالة معالجة منها (cursors: chat_id ->
+    message_id)، على صفحات من page_size رسالة، ولا يتجاوز max_age ثانية إلى
+    الوراء. القناة التي لا موضع لها لم يعمل عليها البوت قبلاً فلا فائت لها.
+
+    القنوات تُقرأ بالتوازي (concurrency طلب في آن واحد)، وكل صفحة تستهلك
+    رمزاً من دلو مشترك (pages_per_minute) فيبقى معدل الطلبات الكلي دون حدود
+    Telegram؛ وإن وقع FloodWait رغم ذلك تنتظر القناة المدة ثم تكمل من حيث توقفت.
+
+    سجلات القنوات (كل منها مرتب زمنياً) تُدمج في تيار واحد مرتب بالتاريخ.
+    """
+
+    def __init__(self, client, channels: List[ChannelInfo], cursors: Dict[int, int],
+                 max_age: float = 3600, page_size: int = 50, pages_per_minute: float = 30,
+                 concurrency: int = 3, buffer: int = 200):
+        self.client = client
+        self.channels = channels
+        self.cursors = cursors
+        self.max_age = max_age
+        self.page_size = page_size
+        self.bucket = TokenBucket(pages_per_minute / 60.0, burst=concurrency)
+        self.buffer = buffer
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.pages = 0
+
+    async def _read_channel(self, channel: ChannelInfo, queue: asyncio.Queue, cutoff: datetime):
+        """
+        قراءة سجل قناة واحدة صفحة بعد صفحة (الأقدم أولاً) إلى طابورها
+        """
+        try:
+            last_id = self.cursors.get(channel.chat_id)
+            if last_id is None:
+                logger.info(f"📥 لا موضع محفوظ لـ {channel.name} - لا استرجاع")
+                await queue.put(_DONE)
+                return
+
+            while True:
+                await self.bucket.acquire()
+                self.pages += 1
+                try:
+                    # الحد يشمل الطلب فقط: قناة تنتظر مكاناً في طابورها لا تحجز دور غيرها
+                    async with self._semaphore:
+                        page = [
+                            message async for message in self.client.iter_messages(
+                                channel.input_peer, limit=self.page_size, min_id=last_id,
+                                offset_date=cutoff, reverse=True,
+                            )
+                        ]
+                except FloodWaitError as e:
+                    logger.warning(f"🌊 FloodWait أثناء استرجاع {channel.name}: انتظار {e.seconds}s")
+                    await asyncio.sleep(e.seconds)
+                    continue
+
+                for message in page:
+                    last_id = max(last_id, message.id)
+                    if message.date >= cutoff:
+                        await queue.put((message.date, message.id, channel, message))
+
+                if len(page) < self.page_size:
+                    break
+        except Exception as e:
+            logger.error(f"❌ تعذر استرجاع سجل {channel.name}: {str(e)}")
+        # عند الإلغاء لا تصل إلى هنا، فلا تنتظر مكاناً في طابور لم يعد يُقرأ
+        await queue.put(_DONE)
+
+    async def stream(self) -> AsyncIterator[Tuple[ChannelInfo, object]]:
+        """
+        الرسائل الفائتة من كل القنوات مرتبة بالتاريخ
+
+        Yields:
+            (القناة، الرسالة)
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        queues: Dict[int, asyncio.Queue] = {
+            channel.chat_id: asyncio.Queue(maxsize=self.buffer) for channel in self.channels
+        }
+        tasks = [
+            asyncio.create_task(self._read_channel(channel, queues[channel.chat_id], cutoff))
+            for channel in self.channels
+        ]
+
+        try:
+            # دمج k طريقاً: رأس كل قناة، ويخرج الأقدم في كل خطوة
+            heads = {}
+            for chat_id, queue in queues.items():
+                head = await queue.get()
+                if head is not _DONE:
+                    heads[chat_id] = head
+
+            while heads:
+                chat_id = min(heads, key=lambda c: heads[c][:2])
+                _, _, channel, message = heads[chat_id]
+                yield channel, message
+
+                head = await queues[chat_id].get()
+                if head is _DONE:
+                    del heads[chat_id]
+                else:
+                    heads[chat_id] = head
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+تجميع طلبات الصياغة المتقاربة في استدعاء LLM واحد
+Micro-batching rewriter: packs queued messages into one completion call
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingRewriter:
+    """
+    غلاف حول مزود يدعم arewrite_batch (مثل DeepSeekRewriter) بواجهة المزود
+    نفسها، فيمكن وضعه مكان المزود في RewriteRouter.
+
+    الطلبات التي تصل خلال max_wait ثانية من أول طلب (أو حتى يبلغ عددها
+    max_batch) تُرسل في طلب واحد بمخرجات JSON مرقمة، ثم توزع النتائج على
+    طالبيها. العنصر الذي تعذر استخراجه من المخرجات يُعاد بطلب منفرد، أما
+    فشل الطلب المجمع كله (مهلة، خطأ HTTP، قاطع مفتوح) فيفشل عناصره جميعاً
+    دون مضاعفة الاستدعاءات على خدمة متعثرة.
+    """
+
+    def __init__(self, rewriter, max_batch: int = 8, max_wait: float = 0.2):
+        self.rewriter = rewriter
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        # أسلوب الصياغة -> [(النص، future)]
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+
+    # واجهة المزود (يقرؤها RewriteRouter وbot.py)
+    @property
+    def api_key(self) -> str:
+        return self.rewriter.api_key
+
+    @property
+    def breaker(self):
+        return self.rewriter.breaker
+
+    def lookup_cache(self, text: str, style: str = 'professional') -> Optional[str]:
+        return self.rewriter.lookup_cache(text, style)
+
+    def cache_key(self, text: str, style: str = 'professional') -> Optional[str]:
+        return self.rewriter.cache_key(text, style)
+
+    async def arewrite(self, text: str, style: str = 'professional',
+                       cache_lookup: bool = True) -> Tuple[str, bool]:
+        """
+        إعادة الصياغة ضمن أقرب دفعة
+
+        Returns:
+            (النص المعاد صياغته، هل نجح)
+        """
+        if cache_lookup:
+            cached = self.rewriter.lookup_cache(text, style)
+            if cached is not None:
+                return cached, True
+
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(style, [])
+        pending.append((text, future))
+
+        if len(pending) >= self.max_batch:
+            self._flush(style)
+        elif len(pending) == 1:
+            self._timers[style] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, style)
+
+        return await future
+
+    def _flush(self, style: str):
+        timer = self._timers.pop(style, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(style, [])
+        if items:
+            asyncio.ensure_future(self._run(items, style))
+
+    async def _run(self, items: List[Tuple[str, asyncio.Future]], style: str):
+        # عناصر أُلغي طالبوها (مثلاً بالتحوط) لا تُرسل
+        items = [(text, future) for text, future in items if not future.done()]
+        if not items:
+            return
+
+        try:
+            if len(items) == 1:
+                text, future = items[0]
+                result = await self.rewriter.arewrite(text, style=style, cache_lookup=False)
+                _resolve(future, result)
+                return
+
+            texts = [text for text, _ in items]
+            self.batches += 1
+            self.batched_items += len(items)
+            outputs = await self.rewriter.arewrite_batch(texts, style=style)
+
+            if outputs is None:
+                for text, future in items:
+                    _resolve(future, (text, False))
+                return
+
+            retry = []
+            for (text, future), output in zip(items, outputs):
+                if output is None:
+                    retry.append((text, future))
+                else:
+                    _resolve(future, (output, True))
+
+            if retry:
+                # مخرجات مشوهة أو ناقصة: طلب منفرد لكل عنصر مفقود
+                self.fallbacks += len(retry)
+                logger.warning(f"📦 {len(retry)} من {len(items)} عناصر الدفعة بلا مخرجات صالحة - طلبات منفردة")
+                results = await asyncio.gather(
+                    *(self.rewriter.arewrite(text, style=style, cache_lookup=False) for text, _ in retry),
+                    return_exceptions=True,
+                )
+                for (text, future), result in zip(retry, results):
+                    _resolve(future, result if not isinstance(result, BaseException) else (text, False))
+
+        except Exception as e:
+            logger.error(f"❌ خطأ في الدفعة: {str(e)}")
+            for text, future in items:
+                _resolve(future, (text, False))
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'batched_items': self.batched_items,
+            'fallbacks': self.fallbacks,
+        }
+
+
+def _resolve(future: asyncio.Future, result: Tuple[str, bool]):
+    if not future.done():
+        future.set_result(result)
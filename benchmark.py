@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس أداء المسارات الساخنة: الفلترة، الصياغة المحلية، والمعالجة الكاملة
+Reproducible benchmarks for the filter and rewrite hot paths with a mocked LLM server
+
+    python benchmark.py                          # كل القياسات -> benchmark_results.json
+    python benchmark.py --only filter --history-sizes 0,20000
+    python benchmark.py --compare old.json       # مقارنة مع تشغيل سابق
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from corpus_module import SyntheticCorpus
+from dedup_module import MinHashLSHIndex
+from filter_module import SmartFilter
+from rewrite_module import AdvancedRewriter
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS = ('filter', 'rewrite', 'process')
+
+
+# ============================================================================
+# الإحصائيات
+# ============================================================================
+
+def summarize(latencies: List[float], elapsed: float) -> Dict:
+    """
+    ملخص أزمنة الاستدعاءات: الإنتاجية والنسب المئوية (بالمللي ثانية)
+    """
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        'calls': len(ordered),
+        'elapsed_s': round(elapsed, 4),
+        'throughput_per_s': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 4) if ordered else 0.0,
+        'p50_ms': round(percentile(0.50), 4),
+        'p90_ms': round(percentile(0.90), 4),
+        'p99_ms': round(percentile(0.99), 4),
+        'max_ms': round(ordered[-1] * 1000, 4) if ordered else 0.0,
+    }
+
+
+def measure(fn: Callable, items: List) -> Dict:
+    """
+    استدعاء fn لكل عنصر بالتتابع وقياس زمن كل استدعاء
+    """
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def measure_batches(fn: Callable, items: List, batch_size: int) -> Dict:
+    """
+    استدعاء fn لكل دفعة من batch_size عنصراً؛ زمن الدفعة موزع على عناصرها
+    (فالإنتاجية بالرسائل وتقارن مباشرة مع measure)
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        t0 = time.perf_counter()
+        fn(batch)
+        latencies.extend([(time.perf_counter() - t0) / len(batch)] * len(batch))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+# ============================================================================
+# خادم LLM وهمي
+# ============================================================================
+
+class MockLLMServer:
+    """
+    خادم محلي بواجهة chat/completions المتوافقة مع OpenAI يرد بعد زمن
+    latency ± jitter ثانية (في خيط منفصل، فيخدم requests وaiohttp معاً)
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, body: Dict):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply({'data': [{'id': 'mock'}]})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                mock.requests += 1
+                time.sleep(max(0.0, mock.latency + mock.random.uniform(-mock.jitter, mock.jitter)))
+
+                # "صياغة" حتمية: آخر سطر من طلب المستخدم (النص نفسه في الـ prompt)
+                prompt = payload.get('messages', [{}])[-1].get('content', '')
+                lines = [line for line in prompt.splitlines() if line.strip()]
+                content = lines[-1] if lines else prompt
+                self._reply({'choices': [{'message': {'role': 'assistant', 'content': content}}]})
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+# ============================================================================
+# القياسات
+# ============================================================================
+
+def bench_filter(args, corpus: List[Dict]) -> Dict:
+    """
+    SmartFilter.filter_text مقابل أحجام مختلفة لسجل النصوص المخزنة (فهرس MinHash/LSH)،
+    وfilter_many بدفعات من --batch-size رسالة تحت batch/
+    """
+    filter_system = SmartFilter()
+    texts = [message['text'] for message in corpus]
+    results = {'batch': {}}
+
+    for size in args.history_sizes:
+        history = MinHashLSHIndex(max_items=max(size, 1))
+        for text in SyntheticCorpus(args.seed + 1).texts(size):
+            history.add(text)
+
+        filter_system.filter_text(texts[0], history)  # إحماء
+        results[str(size)] = measure(lambda text: filter_system.filter_text(text, history), texts)
+        logger.info(f"filter (history={size}): {results[str(size)]['throughput_per_s']} msg/s")
+
+        batches = measure_batches(lambda batch: filter_system.filter_many(batch, history), texts, args.batch_size)
+        results['batch'][str(size)] = batches
+        logger.info(f"filter_many (history={size}, batch={args.batch_size}): {batches['throughput_per_s']} msg/s")
+
+    return results
+
+
+def bench_rewrite(args, corpus: List[Dict]) -> Dict:
+    """
+    AdvancedRewriter.rewrite (البديل المحلي) على الأخبار فقط
+    """
+    rewriter = AdvancedRewriter()
+    texts = [message['text'] for message in corpus if message['kind'] != 'ad']
+    result = measure(lambda text: rewriter.rewrite(text, style='professional'), texts)
+    logger.info(f"rewrite: {result['throughput_per_s']} msg/s")
+    return result
+
+
+def load_bot(server: MockLLMServer):
+    """
+    استيراد bot.py بإعدادات معزولة: بلا قاعدة حالة، وDeepSeek موجه إلى الخادم الوهمي
+    """
+    os.environ.update({
+        'STATE_DB_PATH': '',
+        'DEEPSEEK_API_KEY': 'benchmark',
+        'REWRITE_PROVIDERS': 'deepseek',
+        'REWRITE_HEDGE': '0',
+        'REWRITE_BATCH_SIZE': '1',
+        'REWRITE_STREAMING': '0',
+    })
+    import bot
+    bot.load_state()
+    bot.load_rewriters()
+    # سجلات كل رسالة (ومنها تحذيرات الرفض) تغرق المخرجات؛ تبقى سجلات القياس فقط
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger(bot.__name__).setLevel(logging.ERROR)
+    logger.setLevel(logging.INFO)
+
+    bot.deepseek_rewriter.api_url = f"{server.url}/chat/completions"
+    bot.deepseek_rewriter.models_url = f"{server.url}/models"
+    return bot
+
+
+def reset_bot(bot):
+    # كل تشغيل يبدأ بسجل تكرار وذاكرة صياغة فارغين
+    bot.stored_texts = MinHashLSHIndex(max_items=bot.DEDUP_WINDOW)
+    bot.rewrite_cache.clear()
+
+
+def bench_process(args, corpus: List[Dict]) -> Dict:
+    """
+    المعالجة الكاملة (فلترة + LLM وهمي + إحصائيات): process_message بالتتابع،
+    وaprocess_message بعدة رسائل متزامنة كما في مرحلة الصياغة
+    """
+    server = MockLLMServer(args.llm_latency, args.llm_jitter, seed=args.seed)
+    server.start()
+    try:
+        try:
+            bot = load_bot(server)
+        except ImportError as e:
+            logger.warning(f"تخطي process: {str(e)}")
+            return {'skipped': f"bot.py dependencies missing: {str(e)}"}
+
+        texts = [message['text'] for message in corpus]
+        results = {'llm_latency_s': args.llm_latency, 'llm_jitter_s': args.llm_jitter}
+
+        reset_bot(bot)
+        server.requests = 0
+        results['sync'] = measure(bot.process_message, texts)
+        results['sync']['llm_requests'] = server.requests
+        logger.info(f"process_message: {results['sync']['throughput_per_s']} msg/s")
+
+        reset_bot(bot)
+        server.requests = 0
+        results['async'] = asyncio.run(_bench_aprocess(bot, texts, args.concurrency))
+        results['async']['concurrency'] = args.concurrency
+        results['async']['llm_requests'] = server.requests
+        logger.info(f"aprocess_message (x{args.concurrency}): {results['async']['throughput_per_s']} msg/s")
+
+        return results
+    finally:
+        server.stop()
+
+
+async def _bench_aprocess(bot, texts: List[str], concurrency: int) -> Dict:
+    from http_pool_module import close_http_session
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text: str):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await bot.aprocess_message(text)
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(text) for text in texts))
+    finally:
+        await close_http_session()
+    return summarize(latencies, time.perf_counter() - start)
+
+
+# ============================================================================
+# المقارنة
+# ============================================================================
+
+def _flatten(results: Dict, prefix: str = '') -> Dict[str, Dict]:
+    """
+    كل ملخص قياس (dict فيه throughput_per_s) بمسار مثل filter/20000
+    """
+    flat = {}
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        path = f"{prefix}/{key}" if prefix else key
+        if 'throughput_per_s' in value:
+            flat[path] = value
+        else:
+            flat.update(_flatten(value, path))
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    طباعة الفرق مع تشغيل سابق
+
+    Returns:
+        القياسات التي تراجعت إنتاجيتها أكثر من tolerance
+    """
+    regressions = []
+    before = _flatten(baseline.get('results', {}))
+    for path, now in _flatten(current['results']).items():
+        old = before.get(path)
+        if not old or not old['throughput_per_s']:
+            continue
+        change = now['throughput_per_s'] / old['throughput_per_s'] - 1
+        marker = ''
+        if change < -tolerance:
+            marker = '  <-- تراجع'
+            regressions.append(path)
+        print(
+            f"{path:<24} {old['throughput_per_s']:>10.1f} -> {now['throughput_per_s']:>10.1f} msg/s "
+            f"({change:+.1%})  p90 {old['p90_ms']:.2f} -> {now['p90_ms']:.2f} ms{marker}"
+        )
+    return regressions
+
+
+# ============================================================================
+# البرنامج الرئيسي
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the filter and rewrite hot paths')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--messages', type=int, default=500, help='حجم مجموعة الرسائل المقاسة')
+    parser.add_argument('--history-sizes', default='0,1000,5000,20000',
+                        type=lambda value: [int(size) for size in value.split(',') if size.strip()],
+                        help='أحجام سجل النصوص المخزنة لقياس الفلترة')
+    parser.add_argument('--batch-size', type=int, default=100, help='حجم دفعة filter_many')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='زمن رد الخادم الوهمي (ثوانٍ)')
+    parser.add_argument('--llm-jitter', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=4, help='رسائل متزامنة في aprocess_message')
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        type=lambda value: [name.strip() for name in value.split(',') if name.strip()],
+                        help='القياسات المطلوبة: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='ملف نتائج سابق للمقارنة')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='أقصى تراجع مسموح في الإنتاجية')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] - %(message)s')
+
+    corpus = SyntheticCorpus(args.seed).generate(args.messages)
+    runners = {'filter': bench_filter, 'rewrite': bench_rewrite, 'process': bench_process}
+
+    results = {}
+    for name in args.only:
+        if name not in runners:
+            logger.error(f"قياس غير معروف: {name}")
+            return 2
+        results[name] = runners[name](args, corpus)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'messages': args.messages,
+            'corpus_kinds': {
+                kind: sum(1 for message in corpus if message['kind'] == kind)
+                for kind in ('news', 'ad', 'duplicate', 'near_duplicate')
+            },
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"النتائج في {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,16 +7,34 @@ Advanced News Processing Bot with Smart Filtering and Professional Rewriting
 """
 
 import os
-import sys
 import logging
 import asyncio
-from datetime import datetime
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+# بداية قياس زمن بدء التشغيل (قبل استيراد Telethon وبقية الوحدات)
+_STARTUP_T0 = time.perf_counter()
+
 from telethon import TelegramClient, events
 from telethon.errors import SessionPasswordNeededError
 from telethon.sessions import StringSession
 from filter_module import SmartFilter
-from rewrite_module import AdvancedRewriter
-from deepseek_rewrite_module import DeepSeekRewriter
+from lexicon_module import LexiconWatcher, load_lexicon, DEFAULT_PATH, DEFAULT_CACHE_DIR
+from stream_module import ProgressiveMessage
+from publisher_module import Publisher, build_digest
+from backfill_module import Backfill
+from channels_module import ChannelInfo, ChannelRegistry
+from metrics_module import MetricsRegistry, MetricsServer, DELIVERY_BUCKETS
+from dedup_module import MinHashLSHIndex
+from story_module import StoryClusterer
+from filter_service_module import FilterService
+from state_module import (
+    StateStore, PersistentDedupIndex, PersistentStoryClusterer,
+    OUTBOX_RECEIVED, OUTBOX_FILTERED, OUTBOX_REWRITTEN, OUTBOX_PUBLISHED, OUTBOX_DROPPED,
+)
+from pipeline_module import NewsItem, NewsPipeline
+from scheduler_module import parse_deadlines
 
 # ============================================================================
 # إعداد السجلات
@@ -41,6 +59,44 @@ DESTINATION_CHANNEL = os.getenv('DESTINATION_CHANNEL', '@AjeelNewsIq')
 REWRITE_STYLE = os.getenv('REWRITE_STYLE', 'professional')
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', 'sk-3654875960794adfa355c1befcea1f27')  # قيمة افتراضية للاختبار
 
+# إعدادات خط المعالجة
+FILTER_WORKERS = int(os.getenv('FILTER_WORKERS', '1'))        # عمال الفلترة (عمل حسابي)
+FILTER_PROCESSES = int(os.getenv('FILTER_PROCESSES', '0'))    # عمليات منفصلة للفلترة خارج حلقة الأحداث (0 = داخلها)
+REWRITE_WORKERS = int(os.getenv('REWRITE_WORKERS', '4'))      # استدعاءات LLM المتزامنة
+PUBLISH_WORKERS = int(os.getenv('PUBLISH_WORKERS', '1'))      # عمال النشر
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '100'))  # سعة كل طابور
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', '1.0'))  # أقل زمن بين منشورين (ثوانٍ)
+PRIORITY_AGING_STEP = float(os.getenv('PRIORITY_AGING_STEP', '30'))  # ثوانٍ تعادل درجة أولوية واحدة
+DEDUP_WINDOW = int(os.getenv('DEDUP_WINDOW', '20000'))  # عدد النصوص المحفوظة لكشف التكرار
+STORY_CLUSTERING = os.getenv('STORY_CLUSTERING', '1') == '1'  # نشر خبر واحد فقط لكل حدث من عدة قنوات
+STORY_THRESHOLD = float(os.getenv('STORY_THRESHOLD', '0.35'))  # حد تشابه المقاطع الحرفية لضم رسالة إلى قصة
+STORY_WINDOW = float(os.getenv('STORY_WINDOW', '7200'))  # نافذة القصة (ثوانٍ)
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'bot_state.db')  # سجل التكرار والقصص على القرص (فارغ = في الذاكرة فقط)
+REWRITE_CACHE_SIZE = int(os.getenv('REWRITE_CACHE_SIZE', '2000'))  # عدد الصياغات المحفوظة في الذاكرة
+REWRITE_CACHE_TTL = float(os.getenv('REWRITE_CACHE_TTL', '86400'))  # صلاحية الصياغة المحفوظة (ثوانٍ)
+REWRITE_PROVIDERS = [p.strip() for p in os.getenv('REWRITE_PROVIDERS', 'deepseek,openai').split(',') if p.strip()]  # مزودو LLM بترتيب التفضيل
+REWRITE_HEDGE = os.getenv('REWRITE_HEDGE', '1') == '1'  # طلب احتياطي لمزود ثانٍ إذا تأخر الأول عن زمن p90
+PUBLISH_RATE = float(os.getenv('PUBLISH_RATE', '20'))  # أقصى عدد منشورات في الدقيقة (حدود Telegram للقنوات)
+PUBLISH_BURST = int(os.getenv('PUBLISH_BURST', '3'))  # منشورات متتالية مسموحة قبل تطبيق المعدل
+DIGEST_BACKLOG = int(os.getenv('DIGEST_BACKLOG', '10'))  # عمق طابور النشر الذي تبدأ عنده الموجزات (0 = معطل)
+DIGEST_MIN_PRIORITY = int(os.getenv('DIGEST_MIN_PRIORITY', '3'))  # الأولويات التي تُدمج في الموجز (هذه فأدنى)
+DIGEST_MAX_ITEMS = int(os.getenv('DIGEST_MAX_ITEMS', '5'))  # أقصى عدد أخبار في الموجز الواحد
+REWRITE_BATCH_SIZE = int(os.getenv('REWRITE_BATCH_SIZE', '1'))  # أقصى عدد رسائل في طلب DeepSeek واحد (1 = بلا تجميع)
+REWRITE_BATCH_WINDOW = float(os.getenv('REWRITE_BATCH_WINDOW', '0.2'))  # أقصى انتظار لاكتمال الدفعة (ثوانٍ)
+REWRITE_STREAMING = os.getenv('REWRITE_STREAMING', '0') == '1'  # بث صياغة DeepSeek ونشر أول جملة فور اكتمالها
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '3.0'))  # أقل زمن بين تعديلين للرسالة المنشورة (ثوانٍ)
+OUTBOX_REPLAY_MAX_AGE = float(os.getenv('OUTBOX_REPLAY_MAX_AGE', '3600'))  # أقدم رسالة غير مكتملة تُستأنف بعد إعادة التشغيل (ثوانٍ)
+BACKFILL = os.getenv('BACKFILL', '1') == '1'  # استرجاع رسائل القنوات الفائتة عند بدء التشغيل
+BACKFILL_MAX_AGE = float(os.getenv('BACKFILL_MAX_AGE', '3600'))  # أقدم رسالة فائتة تُسترجع (ثوانٍ)
+BACKFILL_PAGE_SIZE = int(os.getenv('BACKFILL_PAGE_SIZE', '50'))  # رسائل كل طلب سجل
+BACKFILL_PAGES_PER_MINUTE = float(os.getenv('BACKFILL_PAGES_PER_MINUTE', '30'))  # حد طلبات السجل لتجنب FloodWait
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # عنوان خادم المقاييس المحلي
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))  # منفذ /metrics بصيغة Prometheus (0 = معطل)
+LEXICON_PATH = os.getenv('LEXICON_PATH', DEFAULT_PATH)  # ملف المعجم: الكلمات الإعلانية والموثوقة والمرادفات
+LEXICON_CACHE_DIR = os.getenv('LEXICON_CACHE_DIR', DEFAULT_CACHE_DIR)  # مجلد المعجم المجمع (فارغ = بلا حفظ)
+LEXICON_RELOAD_INTERVAL = float(os.getenv('LEXICON_RELOAD_INTERVAL', '30'))  # فحص تغير ملف المعجم (ثوانٍ، 0 = عند SIGHUP فقط)
+PRIORITY_DEADLINES = os.getenv('PRIORITY_DEADLINES', '')  # مثال: "3:600,999:300" (أولوية:أقصى عمر بالثواني)
+
 # ============================================================================
 # نظام الأولويات
 # ============================================================================
@@ -53,39 +109,272 @@ CHANNEL_PRIORITIES = {
     'llio76ioll': 3         # الأولوية الثالثة (الأقل)
 }
 
-def get_channel_priority(channel_name):
-    """الحصول على أولوية القناة"""
-    return CHANNEL_PRIORITIES.get(channel_name, 999)  # 999 للقنوات غير المعروفة
-
 # ============================================================================
 # تهيئة المكونات
 # ============================================================================
 
-filter_system = SmartFilter()
-rewriter = AdvancedRewriter()
-deepseek_rewriter = DeepSeekRewriter()  # نظام الصياغة عبر DeepSeek
+# مكونات الحالة والفلترة والصياغة لا يلزم شيء منها للاتصال بـ Telegram:
+# تُبنى في load_state وload_rewriters (في خيط أثناء الاتصال، انظر main)
+lexicon = None
+state_store = None
+stored_texts = None
+story_clusterer = None
+filter_system = None
+filter_service = None
+rewrite_cache = None
+rewriter = None
+deepseek_rewriter = None
+rewrite_router = None
+
+# عميل Telegram يُنشأ في main بعد التحقق من بيانات الدخول
+client = None
+
+# كيانات القنوات المصدر والوجهة تُحل مرة واحدة عند بدء التشغيل (main يسند العميل)
+channel_registry = ChannelRegistry(None, CHANNEL_PRIORITIES)
+
+# أزمنة مراحل بدء التشغيل (ثوانٍ): imports، state، rewriters، connect، resolve، ready
+startup_seconds = {}
+
+
+@contextmanager
+def _startup_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_seconds[name] = time.perf_counter() - started
+
+
+def _build_client() -> TelegramClient:
+    """
+    إنشاء عميل Telegram باستخدام StringSession
+    """
+    if SESSION_STRING:
+        session = StringSession(SESSION_STRING)
+    else:
+        session = StringSession()
+    
+    return TelegramClient(session, TELEGRAM_API_ID, TELEGRAM_API_HASH)
+
+
+def load_state():
+    """
+    فتح مخزن الحالة واستعادة فهرس التكرار والقصص، وبناء نظام الفلترة
+    
+    أبطأ خطوة في بدء التشغيل (استعادة حتى DEDUP_WINDOW توقيع من SQLite) ولا
+    تحتاج الشبكة، فتعمل في خيط بينما ينتظر الاتصال بـ Telegram.
+    """
+    global lexicon, state_store, stored_texts, story_clusterer, filter_system, filter_service
+    
+    # المعجم المجمع (من الملف المحفوظ إن لم يتغير lexicon.json)
+    lexicon = load_lexicon(LEXICON_PATH, LEXICON_CACHE_DIR or None)
+    filter_system = SmartFilter(lexicon)
+    
+    # مخزن الحالة: بصمات النصوص وتوقيعاتها وصياغاتها تبقى بعد إعادة التشغيل أو إعادة النشر
+    state_store = StateStore(STATE_DB_PATH) if STATE_DB_PATH else None
+    
+    if state_store is not None:
+        # فهرس النصوص المعالجة (MinHash/LSH) لكشف التكرار في نافذة كبيرة
+        stored_texts = PersistentDedupIndex(state_store, max_items=DEDUP_WINDOW)
+        # تجميع الرسائل المتشابهة من القنوات المختلفة في قصص
+        story_clusterer = PersistentStoryClusterer(state_store, threshold=STORY_THRESHOLD, window=STORY_WINDOW,
+                                                   places=lexicon.places)
+    else:
+        stored_texts = MinHashLSHIndex(max_items=DEDUP_WINDOW)
+        story_clusterer = StoryClusterer(threshold=STORY_THRESHOLD, window=STORY_WINDOW, places=lexicon.places)
+    
+    # الفلترة في عمليات منفصلة لكل منها نسخة من فهرس التكرار: الحلقة تنتظر النتيجة فقط
+    filter_service = FilterService(stored_texts, filter_system, workers=FILTER_PROCESSES) if FILTER_PROCESSES > 0 else None
+
+
+def load_rewriters():
+    """
+    بناء الصياغة المحلية ومزودي LLM وموجههم (بعد load_state: الذاكرة المؤقتة في مخزن الحالة)
+    
+    وحدات المزودين (ومعها aiohttp) تُستورد هنا لا عند استيراد bot.py.
+    """
+    global rewrite_cache, rewriter, deepseek_rewriter, rewrite_router
+    
+    from rewrite_module import AdvancedRewriter
+    from deepseek_rewrite_module import DeepSeekRewriter
+    from openai_rewrite_module import OpenAIRewriter
+    from router_module import RewriteRouter
+    from batch_module import BatchingRewriter
+    from cache_module import RewriteCache
+    
+    rewriter = AdvancedRewriter(lexicon)
+    
+    # ذاكرة مؤقتة للصياغات: النص المكرر (أو المطابق بعد التطبيع) لا يُرسل إلى LLM مرة أخرى
+    rewrite_cache = RewriteCache(max_items=REWRITE_CACHE_SIZE, ttl=REWRITE_CACHE_TTL, store=state_store)
+    
+    deepseek_rewriter = DeepSeekRewriter(cache=rewrite_cache)  # نظام الصياغة عبر DeepSeek
+    
+    # تعيين المفتاح مباشرة إذا لم يتم قراؤته من البيئة
+    if DEEPSEEK_API_KEY:
+        deepseek_rewriter.api_key = DEEPSEEK_API_KEY
+        logger.info(f"✅ تم تعيين DeepSeek API Key")
+    else:
+        logger.warning("⚠️ DeepSeek API Key غير محدد!")
+    
+    # موجه الصياغة: أسرع مزود سليم أولاً، مع طلب احتياطي عند التأخر
+    providers = {'deepseek': deepseek_rewriter}
+    if REWRITE_BATCH_SIZE > 1:
+        # أثناء موجات الأخبار تُجمع الرسائل المتقاربة في طلب واحد
+        providers['deepseek'] = BatchingRewriter(
+            deepseek_rewriter, max_batch=REWRITE_BATCH_SIZE, max_wait=REWRITE_BATCH_WINDOW
+        )
+    if 'openai' in REWRITE_PROVIDERS:
+        providers['openai'] = OpenAIRewriter(cache=rewrite_cache)
+    
+    rewrite_router = RewriteRouter(
+        {name: providers[name] for name in REWRITE_PROVIDERS
+         if name in providers and providers[name].api_key},
+        cache=rewrite_cache,
+        hedge=REWRITE_HEDGE,
+    )
+
+# ============================================================================
+# المقاييس
+# ============================================================================
+
+metrics = MetricsRegistry()
+
+# زمن كل خطوة: channel، filter، story، llm، fallback، send
+stage_seconds = metrics.histogram(
+    'chiqnews_stage_seconds', 'Time spent in each processing step', ['stage'],
+)
+# زمن وصول الخبر: من تاريخ الرسالة في القناة المصدر إلى نشرها في الوجهة
+delivery_seconds = metrics.histogram(
+    'chiqnews_delivery_seconds', 'Source message date to destination publish', ['origin'],
+    buckets=DELIVERY_BUCKETS,
+)
+filter_rejections = metrics.counter(
+    'chiqnews_filter_rejections_total', 'Messages rejected by the filter stage', ['reason'],
+)
+rewrite_results = metrics.counter(
+    'chiqnews_rewrites_total', 'Rewrites by outcome (llm = provider succeeded, fallback = local rewriter)', ['result'],
+)
 
-# تعيين المفتاح مباشرة إذا لم يتم قراؤته من البيئة
-if DEEPSEEK_API_KEY:
-    deepseek_rewriter.api_key = DEEPSEEK_API_KEY
-    logger.info(f"✅ تم تعيين DeepSeek API Key")
-else:
-    logger.warning("⚠️ DeepSeek API Key غير محدد!")
 
-stored_texts = []  # لتخزين النصوص المعالجة
+async def _send_message(text: str):
+    with stage_seconds.time(stage='send'):
+        return await client.send_message(channel_registry.destination_peer(DESTINATION_CHANNEL), text)
 
-# إنشاء عميل Telegram باستخدام StringSession
-if SESSION_STRING:
-    session = StringSession(SESSION_STRING)
-else:
-    session = StringSession()
 
-client = TelegramClient(session, TELEGRAM_API_ID, TELEGRAM_API_HASH)
+# الناشر: معدل محدود، وتوقف كامل عند FloodWait بدلاً من إسقاط الرسائل
+publisher = Publisher(
+    _send_message,
+    rate_per_minute=PUBLISH_RATE,
+    burst=PUBLISH_BURST,
+)
 
 # ============================================================================
 # دوال المعالجة
 # ============================================================================
 
+def _filter_message(text: str) -> Tuple[dict, Optional[dict]]:
+    """
+    مرحلة الفلترة المشتركة بين المسار المتزامن وغير المتزامن
+    
+    Returns:
+        (نتيجة الفلترة، نتيجة الرفض الكاملة أو None إذا مرت الرسالة)
+    """
+    # 1. الفلترة الذكية
+    logger.info("🔍 جاري فحص الرسالة...")
+    with stage_seconds.time(stage='filter'):
+        filter_result = filter_system.filter_text(text, stored_texts)
+    
+    rejected = _filter_outcome(text, filter_result)
+    if rejected is None:
+        # إضافة إلى قائمة النصوص المخزنة فور المرور (قبل انتظار الصياغة)
+        # حتى لا تمر نسخة مكررة تصل بالتوازي أثناء انتظار DeepSeek
+        # (الفهرس يحذف الأقدم تلقائياً عند تجاوز DEDUP_WINDOW)
+        stored_texts.add(text)
+    
+    return filter_result, rejected
+
+
+async def _afilter_message(text: str) -> Tuple[dict, Optional[dict]]:
+    """
+    مرحلة الفلترة دون حجب حلقة الأحداث: في عملية منفصلة إن كانت خدمة الفلترة
+    مفعلة (وهي تضيف النص الناجح إلى الفهرس بنفسها)، وإلا كـ _filter_message
+    """
+    if filter_service is None:
+        return _filter_message(text)
+    
+    logger.info("🔍 جاري فحص الرسالة...")
+    with stage_seconds.time(stage='filter'):
+        filter_result = await filter_service.filter(text)
+    
+    return filter_result, _filter_outcome(text, filter_result)
+
+
+def _filter_outcome(text: str, filter_result: dict) -> Optional[dict]:
+    """
+    تسجيل نتيجة الفلترة
+    
+    Returns:
+        نتيجة الرفض الكاملة، أو None إذا مرت الرسالة
+    """
+    if not filter_result['passed']:
+        for reason in ('ad', 'low_quality', 'duplicate'):
+            if filter_result[f'is_{reason}']:
+                filter_rejections.inc(reason=reason)
+        logger.warning(f"❌ الرسالة لم تمر الفلترة:")
+        for reason in filter_result['reasons']:
+            logger.warning(f"   {reason}")
+        
+        return {
+            'passed': False,
+            'original': text,
+            'rewritten': None,
+            'filter_result': filter_result,
+            'rewrite_stats': None,
+            'errors': filter_result['reasons']
+        }
+    
+    logger.info(f"✅ الرسالة موثوقة: {filter_result['reasons'][0]}")
+    return None
+
+
+def _finalize_message(text: str, rewritten: str, filter_result: dict) -> dict:
+    """
+    حساب إحصائيات الصياغة وبناء النتيجة النهائية
+    """
+    # 3. حساب الإحصائيات
+    rewrite_stats = rewriter.get_rewrite_stats(text, rewritten)
+    
+    logger.info(f"📊 إحصائيات الصياغة:")
+    logger.info(f"   - نسبة التغيير: {rewrite_stats['change_ratio']:.0%}")
+    logger.info(f"   - عدد الكلمات: {rewrite_stats['original_length']} → {rewrite_stats['rewritten_length']}")
+    
+    return {
+        'passed': True,
+        'original': text,
+        'rewritten': rewritten,
+        'filter_result': filter_result,
+        'rewrite_stats': rewrite_stats,
+        'errors': []
+    }
+
+
+def _error_result(text: str, e: Exception) -> dict:
+    """
+    نتيجة موحدة عند حدوث خطأ أثناء المعالجة
+    """
+    error_msg = f"❌ خطأ في المعالجة: {str(e)}"
+    logger.error(error_msg)
+    
+    return {
+        'passed': False,
+        'original': text,
+        'rewritten': None,
+        'filter_result': None,
+        'rewrite_stats': None,
+        'errors': [error_msg]
+    }
+
+
 def process_message(text: str) -> dict:
     """
     معالجة شاملة للرسالة
@@ -100,28 +389,10 @@ def process_message(text: str) -> dict:
             'errors': [str]
         }
     """
-    errors = []
-    
     try:
-        # 1. الفلترة الذكية
-        logger.info("🔍 جاري فحص الرسالة...")
-        filter_result = filter_system.filter_text(text, stored_texts)
-        
-        if not filter_result['passed']:
-            logger.warning(f"❌ الرسالة لم تمر الفلترة:")
-            for reason in filter_result['reasons']:
-                logger.warning(f"   {reason}")
-            
-            return {
-                'passed': False,
-                'original': text,
-                'rewritten': None,
-                'filter_result': filter_result,
-                'rewrite_stats': None,
-                'errors': filter_result['reasons']
-            }
-        
-        logger.info(f"✅ الرسالة موثوقة: {filter_result['reasons'][0]}")
+        filter_result, rejected = _filter_message(text)
+        if rejected:
+            return rejected
         
         # 2. إعادة الصياغة
         logger.info("✍️ جاري إعادة صياغة النص...")
@@ -134,51 +405,114 @@ def process_message(text: str) -> dict:
             logger.info("⚠️ استخدام نظام الصياغة المحلي كـ fallback...")
             rewritten = rewriter.rewrite(text, style=REWRITE_STYLE)
         
-        # 3. حساب الإحصائيات
-        rewrite_stats = rewriter.get_rewrite_stats(text, rewritten)
-        
-        logger.info(f"📊 إحصائيات الصياغة:")
-        logger.info(f"   - نسبة التغيير: {rewrite_stats['change_ratio']:.0%}")
-        logger.info(f"   - عدد الكلمات: {rewrite_stats['original_length']} → {rewrite_stats['rewritten_length']}")
-        
-        # 4. إضافة إلى قائمة النصوص المخزنة
-        stored_texts.append(text)
-        if len(stored_texts) > 100:  # الاحتفاظ بآخر 100 نص فقط
-            stored_texts.pop(0)
-        
-        return {
-            'passed': True,
-            'original': text,
-            'rewritten': rewritten,
-            'filter_result': filter_result,
-            'rewrite_stats': rewrite_stats,
-            'errors': []
-        }
+        return _finalize_message(text, rewritten, filter_result)
     
     except Exception as e:
-        error_msg = f"❌ خطأ في المعالجة: {str(e)}"
-        logger.error(error_msg)
-        errors.append(error_msg)
+        return _error_result(text, e)
+
+
+async def _arewrite_text(text: str) -> str:
+    """
+    إعادة الصياغة عبر موجه مزودي LLM دون حجب حلقة الأحداث، مع الرجوع للنظام المحلي عند الفشل
+    """
+    logger.info("✍️ جاري إعادة صياغة النص...")
+    
+    # أسرع مزود LLM سليم (مع التحوط عند التأخر)
+    with stage_seconds.time(stage='llm'):
+        rewritten, llm_success = await rewrite_router.arewrite(text, style=REWRITE_STYLE)
+    
+    # إذا فشل كل المزودين، استخدم النظام المحلي
+    if not llm_success:
+        logger.info("⚠️ استخدام نظام الصياغة المحلي كـ fallback...")
+        with stage_seconds.time(stage='fallback'):
+            rewritten = rewriter.rewrite(text, style=REWRITE_STYLE)
+    
+    rewrite_results.inc(result='llm' if llm_success else 'fallback')
+    return rewritten
+
+
+async def _astream_rewrite_text(item: NewsItem) -> str:
+    """
+    إعادة الصياغة عبر بث DeepSeek: أول جملة مكتملة تُنشر فوراً في قناة الوجهة
+    ثم تُعدل الرسالة مكانها حتى اكتمال الصياغة
+    """
+    logger.info("✍️ جاري إعادة صياغة النص (بث)...")
+    
+    async def send_early(text: str):
+        await pipeline.throttle_publish()
+        message = await send_to_destination(text)
+        if message is not None:
+            _observe_delivery(item)
+        return message
+    
+    async def edit_published(message, text: str):
+        await client.edit_message(channel_registry.destination_peer(DESTINATION_CHANNEL), message, text)
+    
+    progressive = ProgressiveMessage(send_early, edit_published, render=format_message,
+                                     min_interval=STREAM_EDIT_INTERVAL)
+    try:
+        with stage_seconds.time(stage='llm'):
+            rewritten, deepseek_success = await deepseek_rewriter.arewrite_stream(
+                item.text, style=REWRITE_STYLE, on_partial=progressive.update
+            )
+    finally:
+        # لا تحديثات جزئية بعد انتهاء البث؛ انتظار نشر أول جملة إن كان جارياً
+        await progressive.close()
+    
+    # إذا فشل DeepSeek، استخدم النظام المحلي (ويحل محل أي جزء نُشر)
+    if not deepseek_success:
+        logger.info("⚠️ استخدام نظام الصياغة المحلي كـ fallback...")
+        with stage_seconds.time(stage='fallback'):
+            rewritten = rewriter.rewrite(item.text, style=REWRITE_STYLE)
+    
+    rewrite_results.inc(result='llm' if deepseek_success else 'fallback')
+    
+    # الرسالة لم تُنشر بعد (صياغة محفوظة، أو لم تكتمل أي جملة، أو فشل النشر
+    # المبكر): تُترك لمرحلة النشر العادية
+    if progressive.message is not None:
+        await progressive.finish(rewritten)
+        item.message = progressive.message
+        logger.info(f"✏️ اكتمل البث بعد {progressive.edits} تعديل")
+    
+    return rewritten
+
+
+async def aprocess_message(text: str) -> dict:
+    """
+    معالجة شاملة للرسالة (نسخة غير متزامنة)
+    
+    مطابقة لـ process_message لكن استدعاء DeepSeek لا يحجب حلقة الأحداث،
+    فتُعالج رسائل القنوات الأخرى بالتوازي أثناء انتظار الرد.
+    """
+    try:
+        filter_result, rejected = await _afilter_message(text)
+        if rejected:
+            return rejected
         
-        return {
-            'passed': False,
-            'original': text,
-            'rewritten': None,
-            'filter_result': None,
-            'rewrite_stats': None,
-            'errors': errors
-        }
+        rewritten = await _arewrite_text(text)
+        return _finalize_message(text, rewritten, filter_result)
+    
+    except Exception as e:
+        return _error_result(text, e)
 
 
-def format_message(text: str) -> str:
+def _localize(text: str) -> str:
     """
-    تنسيق الرسالة للنشر
+    استبدال أسماء المراسلين
     """
-    # استبدال أسماء المراسلين
     text = text.replace('مراسل', 'مراسلنا')
     text = text.replace('مراسلة', 'مراسلتنا')
     text = text.replace('المراسل', 'مراسلنا')
     text = text.replace('المراسلة', 'مراسلتنا')
+    return text
+
+
+def format_message(text: str) -> str:
+    """
+    تنسيق الرسالة للنشر
+    """
+    # استبدال أسماء المراسلين
+    text = _localize(text)
     
     # إضافة البادئة
     text = f"🔴 {text}"
@@ -189,76 +523,447 @@ def format_message(text: str) -> str:
     return text
 
 
-async def send_to_destination(text: str) -> bool:
+def format_digest(texts: list) -> str:
+    """
+    تنسيق موجز يضم عدة أخبار في منشور واحد
+    """
+    return build_digest(
+        [_localize(text) for text in texts],
+        header="🔴 موجز الأخبار",
+        footer="تابعنا على @AjeelNewsIq",
+    )
+
+
+async def send_to_destination(text: str):
+    """
+    إرسال الرسالة إلى قناة الوجهة (عبر الناشر: حد المعدل وFloodWait وإعادة المحاولة)
+    
+    Returns:
+        الرسالة المنشورة أو None عند الفشل
+    """
+    logger.info(f"📤 جاري الإرسال إلى {DESTINATION_CHANNEL}...")
+    
+    message = await publisher.send(text)
+    
+    if message is not None:
+        logger.info("✅ تم الإرسال بنجاح!")
+    return message
+
+
+# ============================================================================
+# مراحل خط المعالجة
+# ============================================================================
+
+def _outbox_mark(item: NewsItem, stage: str, rewritten: str = None):
     """
-    إرسال الرسالة إلى قناة الوجهة
+    تسجيل انتقال الرسالة إلى مرحلة في صندوق الصادر (إن كان مفعلاً)
     """
+    if state_store is not None and item.message_id is not None:
+        state_store.outbox_mark(item.chat_id, item.message_id, stage, rewritten)
+
+
+def _observe_delivery(item: NewsItem):
+    """
+    تسجيل زمن وصول الخبر منذ نشره في القناة المصدر
+    """
+    if item.message_date is not None:
+        delivery_seconds.observe(time.time() - item.message_date.timestamp(), origin=item.origin)
+
+
+async def filter_stage(item: NewsItem) -> bool:
+    """
+    مرحلة الفلترة: فحص الإعلانات والجودة والتكرار
+    """
+    passed = await _filter_item(item)
+    _outbox_mark(item, OUTBOX_FILTERED if passed else OUTBOX_DROPPED)
+    return passed
+
+
+async def _filter_item(item: NewsItem) -> bool:
     try:
-        logger.info(f"📤 جاري الإرسال إلى {DESTINATION_CHANNEL}...")
-        
-        await client.send_message(DESTINATION_CHANNEL, text)
+        filter_result, rejected = await _afilter_message(item.text)
+    except Exception as e:
+        item.result = _error_result(item.text, e)
+        return False
+    
+    item.filter_result = filter_result
+    if rejected:
+        item.result = rejected
+        logger.warning(f"⏭️ تم تجاهل الرسالة")
+        return False
+    
+    # تجميع القصص: رسالة واحدة فقط من كل حدث تتابع إلى الصياغة
+    if STORY_CLUSTERING:
+        with stage_seconds.time(stage='story'):
+            cluster_id, story_key, is_leader = story_clusterer.assign(
+                item.text, item.priority, channel=item.channel_name
+            )
+        item.cluster_id = cluster_id
+        item.story_key = story_key
         
-        logger.info("✅ تم الإرسال بنجاح!")
-        return True
+        if not is_leader:
+            filter_rejections.inc(reason='story')
+            cluster = story_clusterer.clusters[cluster_id]
+            logger.info(f"🧩 الخبر منشور مسبقاً من قناة أخرى (القصة #{cluster_id}، {cluster.members} رسائل)")
+            return False
+    
+    return True
+
+
+# رسائل حلت محلها رسالة أعلى أولوية من القصة نفسها (مفتاح العضو -> الرسالة):
+# تعود إلى الصياغة إن لم يُنشر القائد الجديد
+_story_standby = {}
+
+
+def _settle_story(item: NewsItem):
+    """
+    نُشر قائد القصة: الرسائل التي حل محلها لم تعد احتياطاً
+    """
+    if item.cluster_id is not None:
+        for key in story_clusterer.settle(item.cluster_id, item.story_key):
+            _story_standby.pop(key, None)
+
+
+def _release_story(item: NewsItem):
+    """
+    قائد القصة لم يُنشر (فشل أو أُسقط): القيادة لأعلى رسالة حل محلها أولوية
+    """
+    if item.cluster_id is None:
+        return
+    key = story_clusterer.release(item.cluster_id, item.story_key)
+    standby = _story_standby.pop(key, None) if key is not None else None
+    # القائد الجديد ما زال في طابور الصياغة: سيحجز القيادة عند وصوله
+    if standby is not None:
+        logger.info(f"🧩 لم يُنشر قائد القصة #{item.cluster_id} - إعادة رسالة من {standby.channel_name} إلى الصياغة")
+        standby.skip_reason = None
+        if pipeline.requeue(standby, 'rewrite'):
+            _outbox_mark(standby, OUTBOX_FILTERED)
+        else:
+            logger.warning(f"🚧 طابور الصياغة ممتلئ - لم تُعد رسالة القصة #{item.cluster_id}")
+
+
+def _drop_item(item: NewsItem):
+    """
+    رسالة أسقطها خط المعالجة (انتهاء موعدها أو خطأ في مرحلة)
+    """
+    _outbox_mark(item, OUTBOX_DROPPED)
+    _release_story(item)
+
+
+async def rewrite_stage(item: NewsItem) -> bool:
+    """
+    مرحلة الصياغة: استدعاء LLM (عدة استدعاءات متزامنة حسب REWRITE_WORKERS)
+    """
+    passed = await _rewrite_item(item)
+    if not passed:
+        _outbox_mark(item, OUTBOX_DROPPED)
+        if item.skip_reason is None:
+            _release_story(item)
+    elif item.message is not None:
+        # نُشرت أثناء البث
+        _outbox_mark(item, OUTBOX_PUBLISHED, item.rewritten)
+        _settle_story(item)
+    else:
+        _outbox_mark(item, OUTBOX_REWRITTEN, item.rewritten)
+    return passed
+
+
+async def _rewrite_item(item: NewsItem) -> bool:
+    # قد تكون رسالة أعلى أولوية من القصة نفسها حلت محل هذه الرسالة أثناء الانتظار
+    if item.cluster_id is not None and not story_clusterer.claim(item.cluster_id, item.story_key):
+        item.skip_reason = 'superseded'
+        logger.info(f"🧩 تم تخطي الرسالة: حلت محلها رسالة أعلى أولوية (القصة #{item.cluster_id})")
+        if story_clusterer.in_standby(item.cluster_id, item.story_key):
+            # احتياط حتى يُنشر القائد الجديد (القصص المنتهية لا تعيده)
+            for key in [key for key, other in _story_standby.items()
+                        if other.cluster_id not in story_clusterer.clusters]:
+                del _story_standby[key]
+            _story_standby[item.story_key] = item
+        return False
     
+    try:
+        if REWRITE_STREAMING:
+            rewritten = await _astream_rewrite_text(item)
+        else:
+            rewritten = await _arewrite_text(item.text)
+        item.result = _finalize_message(item.text, rewritten, item.filter_result)
     except Exception as e:
-        logger.error(f"❌ خطأ في الإرسال: {str(e)}")
+        item.result = _error_result(item.text, e)
         return False
+    
+    item.rewritten = rewritten
+    item.rewrite_stats = item.result['rewrite_stats']
+    return True
+
+
+async def publish_stage(item: NewsItem) -> bool:
+    """
+    مرحلة النشر: تنسيق الرسالة وإرسالها إلى قناة الوجهة
+    """
+    # نُشرت مبكراً أثناء البث وعُدلت إلى النص النهائي في مرحلة الصياغة
+    if item.message is not None:
+        logger.info("✅ تمت معالجة الرسالة بنجاح (نشر مبكر)!")
+        return True
+    
+    # تنسيق الرسالة (أو الموجز إذا ضُمت إليها رسائل متراكمة)
+    if item.digest:
+        formatted_text = format_digest([item.rewritten] + [other.rewritten for other in item.digest])
+    else:
+        formatted_text = format_message(item.rewritten)
+    
+    # إرسال الرسالة
+    success = await send_to_destination(formatted_text) is not None
+    
+    if success:
+        logger.info("✅ تمت معالجة الرسالة بنجاح!")
+    else:
+        logger.error("❌ فشل إرسال الرسالة")
+    
+    for published in [item] + item.digest:
+        _outbox_mark(published, OUTBOX_PUBLISHED if success else OUTBOX_DROPPED)
+        if success:
+            _observe_delivery(published)
+            _settle_story(published)
+        else:
+            _release_story(published)
+    
+    return success
+
+
+pipeline = NewsPipeline(
+    filter_fn=filter_stage,
+    rewrite_fn=rewrite_stage,
+    publish_fn=publish_stage,
+    filter_workers=FILTER_WORKERS,
+    rewrite_workers=REWRITE_WORKERS,
+    publish_workers=PUBLISH_WORKERS,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    publish_interval=PUBLISH_INTERVAL,
+    aging_step=PRIORITY_AGING_STEP,
+    deadlines=parse_deadlines(PRIORITY_DEADLINES),
+    digest_backlog=DIGEST_BACKLOG,
+    digest_min_priority=DIGEST_MIN_PRIORITY,
+    digest_max_items=DIGEST_MAX_ITEMS,
+    drop_fn=_drop_item,
+)
+
+# مقاييس لحظية تُقرأ من المكونات عند كل طلب /metrics
+metrics.gauge(
+    'chiqnews_queue_depth', 'Items waiting before each pipeline stage',
+    lambda: pipeline.queue_depths(), ['stage'],
+)
+metrics.gauge(
+    'chiqnews_in_flight', 'Items currently being processed by each stage',
+    lambda: dict(pipeline.in_flight), ['stage'],
+)
+metrics.gauge(
+    'chiqnews_pipeline_items_total', 'Pipeline item outcomes',
+    lambda: dict(pipeline.counters), ['outcome'], kind='counter',
+)
+metrics.gauge(
+    'chiqnews_publisher_events_total', 'Publisher FloodWait pauses and send retries',
+    lambda: {'flood_wait': publisher.flood_waits, 'retry': publisher.retries}, ['event'], kind='counter',
+)
+metrics.gauge(
+    'chiqnews_startup_seconds', 'Duration of each startup phase (connect and warm-up overlap)',
+    lambda: dict(startup_seconds), ['phase'],
+)
 
 
 # ============================================================================
 # معالجات الأحداث
 # ============================================================================
 
+async def ingest_message(message, channel: ChannelInfo, wait: bool = False):
+    """
+    مرحلة الاستقبال المشتركة بين الرسائل الحية والمسترجعة: يبني NewsItem
+    ويدفعه إلى خط المعالجة
+    
+    wait=True ينتظر مكاناً في طابور الفلترة بدلاً من إسقاط الرسالة (للاسترجاع).
+    """
+    message_text = message.text
+    
+    if not message_text:
+        return
+    
+    channel_name = channel.name
+    channel_priority = channel.priority
+    chat_id = channel.chat_id
+    
+    logger.info(f"📨 رسالة جديدة من {channel_name} (الأولوية: {channel_priority})")
+    logger.info(f"   النص: {message_text[:50]}...")
+    
+    item = NewsItem(
+        message_text,
+        channel_name=channel_name,
+        priority=channel_priority,
+        chat_id=chat_id,
+        message_id=message.id,
+        message_date=message.date,
+    )
+    if wait:
+        item.origin = 'backfill'
+    
+    if state_store is not None:
+        state_store.advance_cursor(chat_id, message.id)
+        # صندوق الصادر: الرسالة نفسها (مثلاً عند إعادة تسليمها بعد انقطاع) لا تُعالج مرتين
+        if not state_store.outbox_add(chat_id, message.id, channel_name, channel_priority, message_text):
+            logger.info(f"⏭️ الرسالة {message.id} من {channel_name} مستلمة مسبقاً")
+            return
+    
+    if wait:
+        await pipeline.resume(item, 'filter')
+    elif not pipeline.submit(item):
+        _outbox_mark(item, OUTBOX_DROPPED)
+
+
 async def handle_new_message(event):
     """
     معالج الرسائل الجديدة من القنوات المصدر
+    
+    يكتفي بمرحلة الاستقبال: يبني NewsItem ويدفعه إلى خط المعالجة دون انتظار
+    الفلترة أو الصياغة أو النشر.
     """
     try:
-        message_text = event.message.text
-        
-        if not message_text:
-            return
-        
-        # الحصول على اسم القناة
-        chat = await event.get_chat()
-        channel_name = chat.title or chat.username or str(chat.id)
-        channel_priority = get_channel_priority(channel_name)
-        
-        logger.info(f"📨 رسالة جديدة من {channel_name} (الأولوية: {channel_priority})")
-        logger.info(f"   النص: {message_text[:50]}...")
-        
-        # معالجة الرسالة
-        result = process_message(message_text)
-        
-        if not result['passed']:
-            logger.warning(f"⏭️ تم تجاهل الرسالة")
+        if not event.message.text:
             return
         
-        # تنسيق الرسالة
-        formatted_text = format_message(result['rewritten'])
-        
-        # إرسال الرسالة
-        success = await send_to_destination(formatted_text)
+        # اسم القناة وأولويتها من سجل القنوات (بلا طلب شبكة للقنوات المحلولة)
+        with stage_seconds.time(stage='channel'):
+            channel = await channel_registry.from_event(event)
         
-        if success:
-            logger.info("✅ تمت معالجة الرسالة بنجاح!")
-        else:
-            logger.error("❌ فشل إرسال الرسالة")
+        await ingest_message(event.message, channel)
     
     except Exception as e:
         logger.error(f"❌ خطأ في معالجة الرسالة: {str(e)}")
 
 
+async def run_backfill(cursors: dict):
+    """
+    استرجاع ما نشرته القنوات المصدر أثناء توقف البوت (الأقدم أولاً عبر كل القنوات)
+    
+    cursors لقطة من مواضع القنوات قبل تسجيل معالج الرسائل الحية، فلا تقدمها
+    رسالة حية تصل أثناء الاسترجاع فوق الرسائل الفائتة.
+    
+    الرسائل تمر بالفلترة وكشف التكرار نفسيهما، وصندوق الصادر يتجاهل ما عولج منها سابقاً.
+    """
+    backfill = Backfill(
+        client, channel_registry.sources, cursors,
+        max_age=BACKFILL_MAX_AGE, page_size=BACKFILL_PAGE_SIZE,
+        pages_per_minute=BACKFILL_PAGES_PER_MINUTE,
+    )
+    
+    count = 0
+    try:
+        async for channel, message in backfill.stream():
+            await ingest_message(message, channel, wait=True)
+            count += 1
+    except Exception as e:
+        logger.error(f"❌ خطأ في الاسترجاع: {str(e)}")
+    
+    logger.info(f"📥 اكتمل الاسترجاع: {count} رسالة فائتة ({backfill.pages} صفحة)")
+
+
 # ============================================================================
 # البرنامج الرئيسي
 # ============================================================================
 
+# مرحلة صندوق الصادر -> مرحلة خط المعالجة التي تُستأنف منها الرسالة
+_RESUME_STAGES = {
+    OUTBOX_RECEIVED: 'filter',
+    OUTBOX_FILTERED: 'rewrite',
+    OUTBOX_REWRITTEN: 'publish',
+}
+
+
+async def replay_outbox():
+    """
+    استئناف الرسائل التي لم تكتمل قبل إيقاف البوت، كل منها من آخر مرحلة أتمتها
+    """
+    if state_store is None:
+        return
+    
+    rows = state_store.outbox_unfinished()
+    if not rows:
+        return
+    
+    logger.info(f"📬 استئناف {len(rows)} رسالة لم تكتمل قبل إعادة التشغيل")
+    cutoff = time.time() - OUTBOX_REPLAY_MAX_AGE
+    for row in rows:
+        if row['updated_at'] < cutoff:
+            # خبر قديم: نشره الآن أسوأ من تركه
+            state_store.outbox_mark(row['chat_id'], row['message_id'], OUTBOX_DROPPED)
+            continue
+        
+        item = NewsItem(
+            row['text'],
+            channel_name=row['channel_name'],
+            priority=row['priority'],
+            chat_id=row['chat_id'],
+            message_id=row['message_id'],
+        )
+        item.rewritten = row['rewritten']
+        item.origin = 'replay'
+        await pipeline.resume(item, _RESUME_STAGES[row['stage']])
+
+
+async def _connect():
+    """
+    الاتصال بـ Telegram وحل كيانات القنوات
+    """
+    with _startup_phase('connect'):
+        logger.info("🔌 جاري الاتصال بـ Telegram...")
+        await client.start(phone=TELEGRAM_PHONE)
+        logger.info("✅ تم الاتصال بنجاح!")
+    
+    # حل كيانات القنوات مرة واحدة (بدلاً من get_chat وحل الأسماء مع كل رسالة)
+    with _startup_phase('resolve'):
+        await channel_registry.resolve(SOURCE_CHANNELS, DESTINATION_CHANNEL)
+
+
+async def _load_state():
+    with _startup_phase('state'):
+        await asyncio.to_thread(load_state)
+    if filter_service is not None:
+        with _startup_phase('filter_processes'):
+            await filter_service.start()
+
+
+async def _load_rewriters():
+    with _startup_phase('rewriters'):
+        await asyncio.to_thread(load_rewriters)
+
+
+async def _warm_up():
+    await _load_state()
+    await _load_rewriters()
+
+
+def _use_lexicon(new_lexicon):
+    """
+    تطبيق معجم أُعيد تحميله: إسناد واحد في الفلترة والقصص والصياغة (وعمليات الفلترة مع مهمتها التالية)
+    """
+    global lexicon
+    lexicon = new_lexicon
+    filter_system.use_lexicon(new_lexicon)
+    story_clusterer.use_places(new_lexicon.places)
+    if rewriter is not None:
+        rewriter.use_lexicon(new_lexicon)
+
+
+def _startup_report() -> str:
+    return ' | '.join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_seconds.items())
+
+
 async def main():
     """
     البرنامج الرئيسي
     """
+    global client
     logger.info("🚀 جاري بدء البوت المتقدم...")
+    backfill_task = None
+    metrics_server = None
+    lexicon_watcher = None
     
     # التحقق من المتغيرات المطلوبة
     if not TELEGRAM_API_ID or not TELEGRAM_API_HASH:
@@ -266,25 +971,64 @@ async def main():
         return
     
     try:
-        # الاتصال بـ Telegram
-        logger.info("🔌 جاري الاتصال بـ Telegram...")
-        await client.start(phone=TELEGRAM_PHONE)
+        client = _build_client()
+        channel_registry.client = client
+        
+        # الاتصال وحل القنوات (انتظار شبكة) بالتوازي مع استعادة الحالة وبناء
+        # الفلترة والصياغة (عمل محلي في خيط)
+        if FILTER_PROCESSES > 0:
+            # عمليات الفلترة تُنسخ من الفهرس المستعاد قبل الاتصال (لا ترث مقبس Telegram)
+            await _load_state()
+            await asyncio.gather(_connect(), _load_rewriters())
+        else:
+            await asyncio.gather(_connect(), _warm_up())
         
-        logger.info("✅ تم الاتصال بنجاح!")
         logger.info(f"📡 القنوات المراقبة: {', '.join(SOURCE_CHANNELS)}")
         logger.info(f"📤 قناة الوجهة: {DESTINATION_CHANNEL}")
         logger.info(f"🎨 أسلوب الصياغة: {REWRITE_STYLE}")
+        logger.info(f"🔀 مزودو الصياغة: {', '.join(rewrite_router.providers) or 'المحلي فقط'}")
         logger.info(f"🔍 نظام الفلترة الذكية: مفعل")
+        logger.info(f"📚 المعجم: الإصدار {lexicon.version} ({lexicon.digest})")
         logger.info(f"✍️ نظام الصياغة المتقدمة: مفعل")
         
+        # تشغيل عمال خط المعالجة
+        await pipeline.start()
+        if METRICS_PORT:
+            metrics_server = MetricsServer(metrics, host=METRICS_HOST, port=METRICS_PORT)
+            try:
+                await metrics_server.start()
+            except OSError as e:
+                # نقطة تشخيص اختيارية: منفذ مشغول (node_exporter مثلاً) لا يوقف البوت
+                logger.warning(f"⚠️ تعذر تشغيل خادم المقاييس على {METRICS_HOST}:{METRICS_PORT}: {str(e)} - المقاييس معطلة")
+                metrics_server = None
+        await replay_outbox()
+        
+        # إعادة تحميل المعجم عند تعديل الملف أو SIGHUP دون إعادة النشر
+        lexicon_watcher = LexiconWatcher(
+            LEXICON_PATH, _use_lexicon, current=lexicon,
+            cache_dir=LEXICON_CACHE_DIR or None, interval=LEXICON_RELOAD_INTERVAL,
+        )
+        await lexicon_watcher.start()
+        
+        # مواضع القنوات قبل وصول أي رسالة حية (للاسترجاع)
+        cursors = state_store.cursors() if state_store is not None else None
+        
         # إضافة معالج الأحداث لكل قناة
-        @client.on(events.NewMessage(chats=SOURCE_CHANNELS))
+        @client.on(events.NewMessage(chats=channel_registry.chats()))
         async def handler(event):
             await handle_new_message(event)
         
+        startup_seconds['ready'] = time.perf_counter() - _STARTUP_T0
+        logger.info(f"⏱️ زمن بدء التشغيل: {_startup_report()}")
         logger.info("👂 جاري الاستماع للرسائل...")
         logger.info("🟢 البوت جاهز للعمل!")
         
+        # الاسترجاع بعد تسجيل المعالج: ما يصل أثناءه يُستقبل حياً، والمكرر يتجاهله صندوق الصادر
+        if BACKFILL and cursors is not None:
+            backfill_task = asyncio.create_task(run_backfill(cursors))
+        elif BACKFILL:
+            logger.warning("⚠️ الاسترجاع يحتاج STATE_DB_PATH لمعرفة آخر رسالة معالجة")
+        
         # الاستماع للرسائل
         await client.run_until_disconnected()
     
@@ -293,7 +1037,29 @@ async def main():
     except Exception as e:
         logger.error(f"❌ خطأ حرج: {str(e)}")
     finally:
-        await client.disconnect()
+        if backfill_task is not None:
+            backfill_task.cancel()
+        await pipeline.stop()
+        if filter_service is not None:
+            logger.info(f"🧮 خدمة الفلترة: {filter_service.stats()}")
+            filter_service.close()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if lexicon_watcher is not None:
+            await lexicon_watcher.stop()
+        if rewrite_router is not None:
+            from http_pool_module import close_http_session
+            logger.info(f"♻️ ذاكرة الصياغة المؤقتة: {rewrite_cache.stats()}")
+            logger.info(f"🔀 موجه الصياغة: {rewrite_router.snapshot()}")
+            await close_http_session()
+        if client is not None:
+            await client.disconnect()
+        if state_store is not None:
+            state_store.close()
+
+
+# زمن الاستيراد: الوحدات اللازمة للاتصال فقط (الحالة والصياغة تُحمّل في main)
+startup_seconds['imports'] = time.perf_counter() - _STARTUP_T0
 
 
 if __name__ == '__main__':
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+قاطع الدائرة والمهلة التكيفية لعملاء LLM
+Circuit breaker with rolling error/latency windows and adaptive timeouts
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    قاطع دائرة بثلاث حالات:
+
+    - closed: الطلبات تمر، وتُسجل نتائجها في نافذة متدحرجة من آخر window طلب
+    - open: عند تجاوز نسبة الطلبات الفاشلة أو البطيئة failure_rate (بعد
+      min_calls طلب على الأقل) تُرفض الطلبات فوراً فينتقل المستدعي إلى
+      البديل المحلي دون أي انتظار
+    - half_open: بعد open_duration ثانية يُختبر التعافي؛ بطلب فحص في الخلفية
+      (probe_fn) إن وُجد وكانت حلقة أحداث تعمل، وإلا بطلب حقيقي واحد
+
+    المهلة التكيفية: timeout() = ضعف p95 للطلبات الأخيرة، محصورة بين
+    min_timeout وmax_timeout (وmax_timeout قبل توفر قياسات كافية ولطلب
+    التجربة في half_open). الطلب الذي انتهت مهلته يدخل النافذة بالمهلة التي
+    انقضت (record_timeout)، فتكبر المهلة مع تباطؤ المزود ولا تعلق عند أصغر قيمة.
+    """
+
+    def __init__(self, name: str, max_timeout: float = 5.0, min_timeout: float = 1.0,
+                 window: int = 50, min_calls: int = 10, failure_rate: float = 0.5,
+                 slow_call_threshold: float = None, open_duration: float = 30.0,
+                 probe_fn: Callable[[], Awaitable[bool]] = None):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_threshold = slow_call_threshold or max_timeout * 0.8
+        self.open_duration = open_duration
+        self.probe_fn = probe_fn
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)  # True = فشل أو بطء
+        self._latencies = deque(maxlen=window)
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # المهلة
+    # ------------------------------------------------------------------
+
+    def timeout(self) -> float:
+        """
+        مهلة الطلب التالي حسب الأزمنة المرصودة
+        """
+        if self.state != CLOSED or len(self._latencies) < self.min_calls:
+            return self.max_timeout
+        ordered = sorted(self._latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return min(self.max_timeout, max(self.min_timeout, 2 * p95))
+
+    # ------------------------------------------------------------------
+    # الحالات
+    # ------------------------------------------------------------------
+
+    def allow(self) -> bool:
+        """
+        هل يُرسل الطلب؟ (False = انتقل إلى البديل فوراً)
+        """
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_duration:
+            if self._probe_task is None:
+                # لا فحص في الخلفية: طلب حقيقي واحد يختبر التعافي
+                self.state = HALF_OPEN
+
+        if self.state == HALF_OPEN and self._probe_task is None and self._trial_available():
+            self._trial_in_flight = True
+            self._trial_started = time.monotonic()
+            return True
+
+        self.rejected += 1
+        return False
+
+    def _trial_available(self) -> bool:
+        # طلب تجربة أُلغي (مثلاً بالتحوط) لا يسجل نتيجته؛ بعد ضعف المهلة يُسمح بغيره
+        return (not self._trial_in_flight
+                or time.monotonic() - self._trial_started > 2 * self.max_timeout)
+
+    def record(self, ok: bool, latency: float = None):
+        """
+        تسجيل نتيجة طلب أُرسل (latency=None للطلبات التي لا يُقاس زمنها كالبث)
+        """
+        slow = latency is not None and latency > self.slow_call_threshold
+        if ok and latency is not None:
+            self._latencies.append(latency)
+
+        if self.state != CLOSED:
+            # نتائج طلبات بدأت قبل فتح القاطع لا تغير حالته؛ طلب التجربة وحده يحسمها
+            if self.state == HALF_OPEN and self._trial_in_flight:
+                self._trial_in_flight = False
+                if ok and not slow:
+                    self._close()
+                else:
+                    self._open()
+            return
+
+        self._outcomes.append(not ok or slow)
+        if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                and self.error_rate >= self.failure_rate):
+            self._open()
+
+    def record_timeout(self, timeout: float):
+        """
+        تسجيل طلب انتهت مهلته: المهلة التي انقضت حد أدنى لزمنه الفعلي
+        """
+        self._latencies.append(timeout)
+        self.record(False)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(
+            f"🔌 قاطع {self.name} مفتوح (نسبة الفشل/البطء: {self.error_rate:.0%}) - "
+            f"الانتقال للبديل المحلي مباشرة لمدة {self.open_duration:.0f}s"
+        )
+        self._start_probe()
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+        logger.info(f"🔌 قاطع {self.name} مغلق - عاد الاتصال")
+
+    # ------------------------------------------------------------------
+    # الفحص في الخلفية
+    # ------------------------------------------------------------------
+
+    def _start_probe(self):
+        if self.probe_fn is None or self._probe_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._probe_task = loop.create_task(self._probe_loop())
+
+    async def _probe_loop(self):
+        try:
+            while self.state != CLOSED:
+                await asyncio.sleep(self.open_duration)
+                self.state = HALF_OPEN
+                try:
+                    ok = await asyncio.wait_for(self.probe_fn(), timeout=self.max_timeout)
+                except Exception:
+                    ok = False
+
+                if ok:
+                    self._close()
+                else:
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+                    logger.info(f"🔌 فحص {self.name} فشل - يبقى القاطع مفتوحاً")
+        finally:
+            self._probe_task = None
+
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'error_rate': self.error_rate,
+            'timeout': self.timeout(),
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+ذاكرة مؤقتة لنتائج الصياغة
+Content-addressed rewrite cache (in-memory LRU + optional SQLite tier)
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from arabic_module import normalize_arabic
+
+logger = logging.getLogger(__name__)
+
+
+def rewrite_cache_key(text: str, style: str, model: str, prompt_version: str) -> str:
+    """
+    مفتاح المحتوى: تجزئة النص المطبّع مع الأسلوب والنموذج ونسخة الـ prompt
+
+    النصوص التي لا تختلف إلا في التشكيل أو علامات الترقيم أو المسافات
+    تشترك في المفتاح نفسه.
+    """
+    material = '\x1f'.join((normalize_arabic(text), style, model, prompt_version))
+    return hashlib.blake2b(material.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RewriteCache:
+    """
+    ذاكرة مؤقتة بطبقتين أمام استدعاءات LLM:
+
+    - طبقة في الذاكرة (LRU) بحد أقصى max_items مدخل
+    - طبقة اختيارية على القرص (StateStore) تبقى بعد إعادة التشغيل
+
+    كل مدخل ينتهي بعد ttl ثانية من حفظه في الطبقتين.
+    """
+
+    def __init__(self, max_items: int = 2000, ttl: float = 86400, store=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.store = store
+
+        # key -> (وقت الانتهاء، النص المعاد صياغته)
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    make_key = staticmethod(rewrite_cache_key)
+
+    def get(self, key: str, now: float = None) -> Optional[str]:
+        """
+        البحث عن صياغة محفوظة (None عند عدم الوجود أو انتهاء الصلاحية)
+        """
+        return self.get_any((key,), now)
+
+    def get_any(self, keys: Iterable[Optional[str]], now: float = None) -> Optional[str]:
+        """
+        أول صياغة محفوظة لأي من المفاتيح (مثلاً مفتاح كل مزود عند التوجيه)،
+        ويُحسب البحث كله إصابة أو إخفاقاً واحداً
+        """
+        if now is None:
+            now = time.time()
+
+        keys = [key for key in keys if key is not None]
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        if self.store is not None:
+            for key in keys:
+                entry = self.store.get_rewrite(key, now)
+                if entry is not None:
+                    self._remember(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry[1]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, rewritten: str, now: float = None):
+        """
+        حفظ صياغة ناجحة في الطبقتين
+        """
+        if now is None:
+            now = time.time()
+        expires_at = now + self.ttl
+
+        self._remember(key, (expires_at, rewritten))
+        if self.store is not None:
+            self.store.put_rewrite(key, rewritten, expires_at)
+
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        عدادات الإصابة والإخفاق
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+سجل القنوات: حل كيانات القنوات مرة واحدة عند بدء التشغيل
+Channel registry: entities resolved once at startup, looked up by chat_id
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Union
+
+from telethon.utils import get_input_peer, get_peer_id
+
+logger = logging.getLogger(__name__)
+
+
+def _input_peer(entity):
+    try:
+        return get_input_peer(entity)
+    except TypeError:
+        return None
+
+
+class ChannelInfo:
+    """
+    قناة محلولة: المعرف، الاسم المستخدم في الإعدادات (مفتاح الأولوية)،
+    العنوان المعروض، الأولوية، وInputPeer الجاهز للطلبات دون حل جديد
+    """
+
+    def __init__(self, chat_id: int, name: str, title: str = '', priority: int = 999,
+                 input_peer=None):
+        self.chat_id = chat_id
+        self.name = name
+        self.title = title or name
+        self.priority = priority
+        self.input_peer = input_peer
+
+
+class ChannelRegistry:
+    """
+    يحل أسماء القنوات المصدر وقناة الوجهة إلى كيانات مرة واحدة، ثم يصبح
+    البحث عن قناة أي رسالة واردة قراءة من dict بمفتاح chat_id بلا طلبات شبكة.
+
+    الأولوية تُقرأ بالاسم المستخدم في الإعدادات (username)، لا بعنوان القناة.
+    """
+
+    def __init__(self, client, priorities: Dict[str, int], default_priority: int = 999):
+        self.client = client
+        self.priorities = priorities
+        self.default_priority = default_priority
+
+        self.channels: Dict[int, ChannelInfo] = {}
+        self.sources: List[ChannelInfo] = []
+        self.unresolved: List[str] = []
+        self.destination: Optional[ChannelInfo] = None
+
+    def _priority(self, *names: str) -> int:
+        for name in names:
+            if name and name in self.priorities:
+                return self.priorities[name]
+        return self.default_priority
+
+    async def _resolve_one(self, channel: Union[str, int]) -> ChannelInfo:
+        entity = await self.client.get_entity(channel)
+        chat_id = get_peer_id(entity)
+        name = str(channel)
+        info = ChannelInfo(
+            chat_id,
+            name=name,
+            title=getattr(entity, 'title', None) or getattr(entity, 'username', None) or name,
+            priority=self._priority(name, getattr(entity, 'username', None)),
+            input_peer=_input_peer(entity),
+        )
+        self.channels[chat_id] = info
+        return info
+
+    async def resolve(self, sources: List[Union[str, int]], destination: Union[str, int] = None):
+        """
+        حل كل القنوات المصدر (وقناة الوجهة) عند بدء التشغيل
+
+        القناة التي يتعذر حلها تُسجل في unresolved ويبقى اسمها في chats()
+        فيحاول Telethon حلها بنفسه.
+
+        الطلبات متزامنة (زمن ذهاب وإياب واحد تقريباً بدل واحد لكل قناة)،
+        وsources يبقى بترتيب الإعدادات.
+        """
+        channels = list(sources) + ([destination] if destination is not None else [])
+        results = await asyncio.gather(
+            *(self._resolve_one(channel) for channel in channels), return_exceptions=True
+        )
+
+        for channel, result in zip(sources, results):
+            if isinstance(result, BaseException):
+                self.unresolved.append(channel)
+                logger.error(f"❌ تعذر حل القناة {channel}: {str(result)}")
+            else:
+                self.sources.append(result)
+
+        if destination is not None:
+            result = results[-1]
+            if isinstance(result, BaseException):
+                logger.error(f"❌ تعذر حل قناة الوجهة {destination}: {str(result)}")
+            else:
+                self.destination = result
+
+        logger.info(f"📇 سجل القنوات: {len(self.sources)} مصدر محلول، {len(self.unresolved)} غير محلول")
+
+    def chats(self) -> List[Union[int, str]]:
+        """
+        مرشح events.NewMessage: معرفات القنوات المحلولة وأسماء غير المحلولة
+        """
+        return [info.chat_id for info in self.sources] + list(self.unresolved)
+
+    def destination_peer(self, fallback: Union[str, int]):
+        """
+        InputPeer قناة الوجهة (أو اسمها إن لم تُحل بعد)
+        """
+        return self.destination.input_peer if self.destination is not None else fallback
+
+    def get(self, chat_id: int) -> Optional[ChannelInfo]:
+        return self.channels.get(chat_id)
+
+    async def from_event(self, event) -> ChannelInfo:
+        """
+        قناة رسالة واردة: قراءة من السجل، وget_chat() مرة واحدة فقط لقناة لم تُحل
+        """
+        info = self.channels.get(event.chat_id)
+        if info is not None:
+            return info
+
+        chat = await event.get_chat()
+        username = getattr(chat, 'username', None)
+        title = getattr(chat, 'title', None)
+        info = ChannelInfo(
+            event.chat_id,
+            name=username or title or str(event.chat_id),
+            title=title or username or str(event.chat_id),
+            priority=self._priority(username, title),
+            input_peer=_input_peer(chat),
+        )
+        self.channels[event.chat_id] = info
+        return info
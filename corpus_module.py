@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+مولد مجموعة أخبار عربية اصطناعية للقياس والاختبار
+Synthetic Arabic news corpus: breaking news, ads, duplicates and near-duplicates
+"""
+
+import random
+from typing import Dict, List, Optional
+
+SOURCES = [
+    'مصدر عسكري للجزيرة', 'مراسل الحدث', 'وكالة رويترز', 'مصدر دبلوماسي',
+    'التلفزيون الرسمي', 'مسؤول أمني', 'وكالة الأنباء الرسمية', 'مصادر محلية',
+    'شبكة سكاي نيوز', 'صحيفة واشنطن بوست', 'مصدر حكومي', 'قناة العربية',
+]
+
+ACTORS = [
+    'وزارة الخارجية', 'وزارة الدفاع', 'رئيس الوزراء العراقي', 'الرئيس الأمريكي ترامب',
+    'الأمم المتحدة', 'الجيش', 'الدفاع المدني', 'مجلس الأمن الدولي', 'الحكومة',
+    'البنك المركزي', 'وزارة الصحة', 'الاتحاد الأوروبي', 'الرئيس السوري احمد الشرع',
+    'محافظ البصرة', 'قيادة العمليات المشتركة', 'وزير النفط', 'البرلمان', 'الصليب الأحمر',
+    'منظمة الصحة العالمية', 'الكرملين', 'حركة حماس', 'الجيش الإسرائيلي', 'هيئة الطيران المدني',
+]
+
+VERBS = [
+    'تعلن', 'يؤكد', 'تنفي', 'يحذر من', 'تدين', 'يدعو إلى', 'تكشف عن', 'يبحث',
+    'يرحب بـ', 'يعلق على', 'يتابع', 'ترفض', 'تطالب بـ', 'تستنكر',
+]
+
+EVENTS = [
+    'انفجار قرب مبنى حكومي', 'غارة جوية على موقع عسكري', 'اجتماع طارئ لبحث التصعيد',
+    'اتفاق لوقف إطلاق النار', 'إغلاق المعابر الحدودية', 'ارتفاع أسعار النفط',
+    'زلزال بقوة {magnitude} درجات', 'إطلاق سراح {count} محتجزين', 'حريق في منطقة صناعية',
+    'هجوم بطائرات مسيرة', 'تعليق الرحلات الجوية', 'مفاوضات جديدة حول الملف النووي',
+    'سقوط صاروخ في منطقة مفتوحة', 'انقطاع التيار الكهربائي عن {count} أحياء', 'فيضانات تجتاح القرى',
+    'اعتقال خلية مسلحة', 'تفشي وباء الكوليرا', 'انهيار مبنى سكني', 'تظاهرات أمام السفارة',
+    'تبادل لإطلاق النار على الحدود', 'ضربات صاروخية متبادلة', 'قرار برفع الرواتب',
+    'صفقة تبادل أسرى', 'قمة عربية طارئة', 'عقوبات اقتصادية جديدة', 'اغتيال قيادي بارز',
+]
+
+PLACES = [
+    'بغداد', 'دمشق', 'بيروت', 'غزة', 'البصرة', 'الموصل', 'عمان', 'القاهرة',
+    'طهران', 'أربيل', 'حلب', 'صنعاء', 'الرياض', 'الخرطوم', 'طرابلس',
+    'كركوك', 'النجف', 'كربلاء', 'الأنبار', 'ديالى', 'إدلب', 'درعا', 'الحديدة', 'رفح',
+    'خان يونس', 'جنوب لبنان', 'الضاحية الجنوبية', 'واشنطن', 'موسكو', 'أنقرة', 'الدوحة',
+]
+
+# جمل التفاصيل مركبة من أجزاء (أدوات ربط × أفعال × فاعلين × وقائع × أماكن) حتى
+# لا تتشابه أخبار مختلفة بما يكفي لتُضم إلى قصة واحدة
+CONNECTORS = ['و', 'كما', 'في حين', 'بينما', 'من جهته', 'إلى ذلك', 'في غضون ذلك', 'بدوره']
+
+DETAIL_VERBS = ['أعلن', 'أكد', 'نفى', 'رجح', 'تابع', 'وثق', 'رصد', 'طلب', 'كشف', 'انتقد']
+
+DETAIL_OBJECTS = [
+    'وصول تعزيزات عسكرية', 'ارتفاع حصيلة الضحايا إلى {count}', 'إخلاء المستشفيات',
+    'فتح تحقيق عاجل', 'استدعاء السفير', 'تأجيل الانتخابات', 'إغلاق المدارس',
+    'توقف حركة الملاحة', 'نقل {count} جرحى', 'إسقاط طائرة مسيرة', 'قطع الطرق الرئيسية',
+    'تجميد الأصول', 'بدء عملية برية', 'تعليق المفاوضات', 'عودة النازحين', 'نفاد الوقود',
+]
+
+AD_TEMPLATES = [
+    'اشتري الآن! عرض خاص على {product} بخصم {discount}% لفترة محدودة. اضغط هنا: https://shop{n}.example.com',
+    'اربح جائزة قيمة! شارك في السحب المجاني واحصل على {product} مجاناً. اتصل الآن 07{phone}',
+    'فرصة عمل أونلاين بأرباح يومية مضمونة، استثمار رقمي بدون تكلفة. تواصل عبر واتس 07{phone}',
+    'لا تفوت! {product} أصلي بأفضل سعر، توصيل سريع لكل المحافظات. زيارة موقعنا www.store{n}.com',
+]
+
+PRODUCTS = ['العطور', 'الساعات', 'الهواتف', 'الملابس', 'الحقائب', 'النظارات']
+
+# بدائل تحافظ على المعنى (تنتج نسخاً شبه مكررة كما تعيد القنوات صياغة الخبر)
+NEAR_SWAPS = [
+    ('تعلن', 'أعلنت'), ('يؤكد', 'أكد'), ('تنفي', 'نفت'), ('يحذر من', 'حذر من'),
+    ('قتلى', 'ضحايا'), ('الجرحى', 'المصابين'), ('الحادث', 'الواقعة'),
+    ('المنطقة', 'المكان'), ('جارية', 'مستمرة'),
+]
+
+CHANNELS = ['AjaNews', 'alhadath_brk', 'AlarabyTvBrk', 'Mena_Live', 'alhaqnews', 'llio76ioll']
+
+
+class SyntheticCorpus:
+    """
+    مولد حتمي (بالبذرة seed) لرسائل بشكل رسائل قنوات الأخبار العاجلة
+    """
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def _fill(self, template: str) -> str:
+        return template.format(
+            magnitude=self.random.choice(['4.8', '5.6', '6.1']),
+            count=self.random.randint(2, 40),
+            discount=self.random.choice([20, 30, 50, 70]),
+            product=self.random.choice(PRODUCTS),
+            phone=self.random.randint(100000000, 999999999),
+            n=self.random.randint(1, 99),
+        )
+
+    def news(self) -> str:
+        """
+        خبر عاجل: بادئة مصدر، عنوان، ثم جملة أو جملتان من التفاصيل
+        """
+        r = self.random
+        headline = (
+            f"عاجل | {r.choice(SOURCES)}: {r.choice(ACTORS)} {r.choice(VERBS)} "
+            f"{self._fill(r.choice(EVENTS))} في {r.choice(PLACES)}"
+        )
+        details = ' '.join(
+            f"{r.choice(CONNECTORS)} {r.choice(DETAIL_VERBS)} {r.choice(ACTORS)} "
+            f"{self._fill(r.choice(DETAIL_OBJECTS))} في {r.choice(PLACES)}."
+            for _ in range(r.randint(1, 2))
+        )
+        return f"{headline}.\n{details}"
+
+    def ad(self) -> str:
+        return self._fill(self.random.choice(AD_TEMPLATES))
+
+    def near_duplicate(self, text: str) -> str:
+        """
+        نسخة معدلة قليلاً: مصدر آخر، تبديل كلمات، أو إضافة تحديث
+        """
+        r = self.random
+        if text.startswith('عاجل |') and ':' in text:
+            text = f"عاجل | {r.choice(SOURCES)}:" + text.split(':', 1)[1]
+        for old, new in r.sample(NEAR_SWAPS, 3):
+            text = text.replace(old, new)
+        if r.random() < 0.5:
+            text += ' (تحديث)'
+        return text
+
+    def texts(self, count: int) -> List[str]:
+        """
+        count خبراً مختلفاً (لملء سجل النصوص المخزنة)
+        """
+        return [self.news() for _ in range(count)]
+
+    def generate(self, count: int, ad_ratio: float = 0.15, duplicate_ratio: float = 0.1,
+                 near_duplicate_ratio: float = 0.15, rate_per_minute: float = 30,
+                 channels: Optional[List[str]] = None) -> List[Dict]:
+        """
+        تيار رسائل مختلط بأزمنة وصول عشوائية (عملية بواسون بمعدل rate_per_minute)
+
+        Returns:
+            [{'id', 'kind', 'channel', 'offset', 'text'}] حيث kind أحد
+            news / ad / duplicate / near_duplicate وoffset ثوانٍ منذ أول رسالة
+        """
+        r = self.random
+        channels = channels or CHANNELS
+        published: List[str] = []
+        messages = []
+        offset = 0.0
+
+        for i in range(count):
+            roll = r.random()
+            if roll < ad_ratio:
+                kind, text = 'ad', self.ad()
+            elif published and roll < ad_ratio + duplicate_ratio:
+                kind, text = 'duplicate', r.choice(published[-50:])
+            elif published and roll < ad_ratio + duplicate_ratio + near_duplicate_ratio:
+                kind, text = 'near_duplicate', self.near_duplicate(r.choice(published[-50:]))
+            else:
+                kind, text = 'news', self.news()
+                published.append(text)
+
+            messages.append({
+                'id': i + 1,
+                'kind': kind,
+                'channel': r.choice(channels),
+                'offset': round(offset, 3),
+                'text': text,
+            })
+            offset += r.expovariate(rate_per_minute / 60.0)
+
+        return messages
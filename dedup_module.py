@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+
+"""
+فهرس كشف التكرار التقريبي
+MinHash + LSH index for sub-linear near-duplicate lookup
+"""
+
+import hashlib
+import itertools
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+from arabic_module import tokenize
+
+# عدد أولي كبير (2^61 - 1) لدوال التجزئة الشاملة
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+@lru_cache(maxsize=65536)
+def hash_token(token: str) -> int:
+    """
+    تجزئة ثابتة لكلمة (لا تتغير بين العمليات أو إعادة التشغيل، بخلاف hash())
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def text_tokens(text: str) -> FrozenSet[int]:
+    """
+    مجموعة تجزئات كلمات النص (بنفس تقسيم calculate_similarity: arabic_module.tokenize)
+    """
+    return frozenset(hash_token(word) for word in set(tokenize(text)))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """
+    تشابه Jaccard بين مجموعتين
+    """
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class MinHashLSHIndex:
+    """
+    فهرس تكرار يحتفظ بآخر max_items نص ويجيب عن "هل يوجد نص مشابه؟"
+    بكلفة شبه ثابتة مهما كبرت النافذة.
+
+    لكل نص توقيع MinHash من num_perm قيمة يُقسم إلى bands شريحة؛ نصان يتطابقان
+    في شريحة واحدة على الأقل يصبحان مرشحين، ثم يُحسب تشابه Jaccard الدقيق
+    للمرشحين فقط. بالإعدادات الافتراضية (64 = 8×8) يُلتقط تقريباً كل زوج تشابهه
+    فوق 0.95، بينما نادراً ما يُرشح زوج تشابهه دون 0.5.
+
+    النتيجة النهائية إذاً مطابقة لمقارنة Jaccard على مستوى الكلمات في
+    SmartFilter.calculate_similarity وبنفس الحد 0.95.
+    """
+
+    def __init__(self, max_items: int = 20000, threshold: float = 0.95,
+                 num_perm: int = 64, bands: int = 8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm يجب أن يقبل القسمة على bands")
+
+        self.max_items = max_items
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+
+        # معاملات دوال التجزئة (a*x + b) mod p - ثابتة لنفس البذرة
+        rng = _Lcg(seed)
+        self._perms = [
+            (rng.next() % (_MERSENNE_PRIME - 1) + 1, rng.next() % _MERSENNE_PRIME)
+            for _ in range(num_perm)
+        ]
+
+        # key -> (tokens, signature)
+        self._entries: 'OrderedDict[Hashable, Tuple[FrozenSet[int], Tuple[int, ...]]]' = OrderedDict()
+        # شريحة -> مفتاح الشريحة -> مجموعة المفاتيح
+        self._buckets: List[Dict[Tuple[int, ...], Set[Hashable]]] = [{} for _ in range(bands)]
+        self._keys = itertools.count()
+
+        # آخر نص تم تحليله (query ثم add لنفس النص لا يعيدان الحساب)
+        self._last_text = None
+        self._last_features = None
+
+    # ------------------------------------------------------------------
+    # التوقيعات
+    # ------------------------------------------------------------------
+
+    def signature(self, tokens: FrozenSet[int]) -> Tuple[int, ...]:
+        """
+        توقيع MinHash لمجموعة تجزئات
+        """
+        if not tokens:
+            return tuple([_MAX_HASH] * self.num_perm)
+        p = _MERSENNE_PRIME
+        return tuple(
+            min(((a * x + b) % p) & _MAX_HASH for x in tokens)
+            for a, b in self._perms
+        )
+
+    def features_many(self, texts: List[str]) -> List[Tuple[FrozenSet[int], Tuple[int, ...]]]:
+        """
+        تجزئات الكلمات والتوقيع لدفعة نصوص (مطابقة لـ features لكل نص)
+
+        الكلمة تُجزأ وتُحسب قيمها الـ num_perm مرة واحدة للدفعة كلها (أخبار
+        الدفعة تتشارك معظم كلماتها)، ثم توقيع كل نص هو الحد الأدنى لكل عمود
+        من صفوف كلماته، والنص المكرر حرفياً داخل الدفعة لا يُحسب مرتين.
+        """
+        p = _MERSENNE_PRIME
+        perms = self._perms
+        empty = tuple([_MAX_HASH] * self.num_perm)
+        hashes: Dict[str, int] = {}
+        rows: Dict[int, Tuple[int, ...]] = {}
+        done: Dict[str, Tuple[FrozenSet[int], Tuple[int, ...]]] = {}
+        features = []
+
+        for text in texts:
+            if text in done:
+                features.append(done[text])
+                continue
+
+            tokens = set()
+            for word in set(tokenize(text)):
+                x = hashes.get(word)
+                if x is None:
+                    x = hashes[word] = hash_token(word)
+                tokens.add(x)
+            tokens = frozenset(tokens)
+
+            token_rows = []
+            for x in tokens:
+                row = rows.get(x)
+                if row is None:
+                    row = rows[x] = tuple(((a * x + b) % p) & _MAX_HASH for a, b in perms)
+                token_rows.append(row)
+
+            if not token_rows:
+                signature = empty
+            elif len(token_rows) == 1:
+                signature = token_rows[0]
+            else:
+                signature = tuple(map(min, *token_rows))
+
+            done[text] = (tokens, signature)
+            features.append(done[text])
+
+        return features
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def features(self, text: str) -> Tuple[FrozenSet[int], Tuple[int, ...]]:
+        """
+        تجزئات كلمات النص وتوقيعه (آخر نص محفوظ: الفحص ثم الإضافة يحسبانها مرة واحدة)
+        """
+        if text != self._last_text:
+            tokens = text_tokens(text)
+            self._last_features = (tokens, self.signature(tokens))
+            self._last_text = text
+        return self._last_features
+
+    # ------------------------------------------------------------------
+    # الإضافة والإزالة
+    # ------------------------------------------------------------------
+
+    def add(self, text: str, key: Hashable = None) -> Hashable:
+        """
+        إضافة نص إلى الفهرس (مع إزالة الأقدم إذا تجاوزت النافذة max_items)
+        """
+        tokens, signature = self.features(text)
+        return self.add_signature(tokens, signature, key)
+
+    def add_signature(self, tokens: FrozenSet[int], signature: Tuple[int, ...],
+                      key: Hashable = None) -> Hashable:
+        """
+        إضافة مدخل محسوب مسبقاً (تجزئات الكلمات والتوقيع)
+        """
+        if key is None:
+            key = next(self._keys)
+        if key in self._entries:
+            self.remove(key)
+
+        self._entries[key] = (tokens, signature)
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+        while len(self._entries) > self.max_items:
+            self.remove(next(iter(self._entries)))
+
+        return key
+
+    # توافق مع الاستخدام السابق لقائمة stored_texts
+    append = add
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        إزالة مدخل من الفهرس
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        for band, band_key in self._band_keys(entry[1]):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets = [{} for _ in range(self.bands)]
+
+    # ------------------------------------------------------------------
+    # البحث
+    # ------------------------------------------------------------------
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        """
+        المفاتيح التي تشترك مع التوقيع في شريحة واحدة على الأقل
+        """
+        found = set()
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket:
+                found |= bucket
+        return found
+
+    def query(self, text: str) -> Tuple[Optional[Hashable], float]:
+        """
+        البحث عن أشبه نص مخزن تشابهه أعلى من الحد
+
+        Returns:
+            (المفتاح، التشابه) أو (None، أعلى تشابه بين المرشحين)
+        """
+        tokens, signature = self.features(text)
+        return self.query_signature(tokens, signature)
+
+    def query_signature(self, tokens: FrozenSet[int],
+                        signature: Tuple[int, ...]) -> Tuple[Optional[Hashable], float]:
+        best_key, best = None, 0.0
+        for key in self.candidates(signature):
+            similarity = jaccard(tokens, self._entries[key][0])
+            if similarity > best:
+                best_key, best = key, similarity
+
+        if best > self.threshold:
+            return best_key, best
+        return None, best
+
+    def matches(self, tokens: FrozenSet[int],
+                signature: Tuple[int, ...]) -> List[Tuple[Hashable, float]]:
+        """
+        كل المرشحين الذين يتجاوز تشابههم الحد، من الأشبه إلى الأقل
+
+        Returns:
+            [(المفتاح، التشابه)]
+        """
+        found = []
+        for key in self.candidates(signature):
+            similarity = jaccard(tokens, self._entries[key][0])
+            if similarity > self.threshold:
+                found.append((key, similarity))
+        found.sort(key=lambda match: match[1], reverse=True)
+        return found
+
+    def view(self) -> 'MinHashLSHIndex':
+        """
+        MinHashLSHIndex عادي (في الذاكرة فقط) يشارك مدخلات هذا الفهرس وشرائحه دون نسخ
+
+        للعملية العاملة بعد fork، حيث الفهرس الموروث نسخة خاصة بها أصلاً: لا
+        إعادة بناء ولا كتابة في مخزن الفهرس المحفوظ. أي إضافة إلى أحدهما تظهر في الآخر.
+        """
+        view = MinHashLSHIndex(self.max_items, self.threshold, self.num_perm, self.bands, self.seed)
+        view._entries = self._entries
+        view._buckets = self._buckets
+        view._keys = self._keys
+        return view
+
+    def entries(self) -> List[Tuple[Hashable, FrozenSet[int], Tuple[int, ...]]]:
+        """
+        كل المدخلات (المفتاح، التجزئات، التوقيع) بترتيب الإضافة - لبناء نسخة مطابقة
+        """
+        return [(key, tokens, signature) for key, (tokens, signature) in self._entries.items()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+
+class _Lcg:
+    """
+    مولد أرقام بسيط وحتمي لمعاملات التجزئة (مستقل عن random وحالته العامة)
+    """
+
+    def __init__(self, seed: int):
+        self.state = seed & 0xFFFFFFFFFFFFFFFF
+
+    def next(self) -> int:
+        self.state = (self.state * 6364136223846793005 + 1442695040888963407) & 0xFFFFFFFFFFFFFFFF
+        return self.state >> 3
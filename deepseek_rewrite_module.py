@@ -6,9 +6,15 @@ DeepSeek-based Text Rewriting System
 """
 
 import os
+import json
+import asyncio
+import time
 import logging
-import requests
-from typing import Dict, Tuple
+import aiohttp
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from http_pool_module import get_http_session
+from breaker_module import CircuitBreaker
+from news_format_module import SYSTEM_PROMPT, clean_output, create_prompt, remove_source_info
 
 logger = logging.getLogger(__name__)
 
@@ -17,71 +23,110 @@ class DeepSeekRewriter:
     نظام صياغة متقدم باستخدام DeepSeek API
     """
     
-    def __init__(self):
+    # تُرفع عند تغيير نص الـ prompt أو المعالجة اللاحقة لإبطال الصياغات المحفوظة
+    prompt_version = '1'
+    
+    # وصف الأسلوب في طلب الدفعة
+    BATCH_STYLES = {
+        'professional': 'بأسلوب احترافي وموضوعي',
+        'casual': 'بأسلوب بسيط وسهل',
+        'formal': 'بأسلوب رسمي وفخم',
+    }
+    
+    def __init__(self, cache=None):
+        self.cache = cache  # RewriteCache اختيارية أمام استدعاءات API
         self.api_key = os.getenv('DEEPSEEK_API_KEY', '')
+        self.models_url = "https://api.deepseek.com/models"
         self.api_url = "https://api.deepseek.com/chat/completions"
         self.model = "deepseek-chat"
+        self.timeout = 5
+        # قاطع الدائرة: self.timeout هو الحد الأعلى للمهلة التكيفية
+        self.breaker = CircuitBreaker('DeepSeek', max_timeout=self.timeout, probe_fn=self.aprobe)
         
         if not self.api_key:
             logger.warning("⚠️ DeepSeek API Key غير محدد!")
     
-    def _remove_source_info(self, text: str) -> str:
-        """
-        إزالة بيانات المصدر من النص
-        """
-        import re
-        
-        # Remove source mentions at the beginning
-        # e.g., "عاجل | مصدر عسكري لبناني مسؤول للجزيرة:"
-        # e.g., "عاجل | واشنطن بوست عن مصادر:"
-        text = re.sub(r'^عاجل\s*\|\s*[^:]+:\s*', '', text)
-        text = re.sub(r'^عاجل\s*\|\s*[^|]+\|\s*', '', text)
-        
-        # Remove source mentions in parentheses
-        text = re.sub(r'\([^)]*(?:مصدر|مراسل|وكالة)[^)]*\)', '', text)
-        
-        # Remove lines that are purely source attribution
-        source_keywords = [
-            'مصدر للحدث',
-            'مراسل الحدث',
-            'مصدر عسكري',
-            'مصدر دبلوماسي',
-            'مصدر أمني',
-            'مراسل',
-            'وكالة',
-            'تقرير من',
-            'حسب',
-            'وفقاً لـ',
-            'بحسب',
-            'بناءً على',
-            'عن مصادر',
-            'عن مصدر',
-            'مسؤول ل',
-            'مسؤول في',
-        ]
-        
-        lines = text.split('\n')
-        filtered_lines = []
-        
-        for line in lines:
-            should_skip = False
-            # Skip lines that contain source keywords
-            for keyword in source_keywords:
-                if keyword in line:
-                    should_skip = True
-                    break
-            
-            # Skip lines that are just source attribution
-            if re.match(r'^[^:]*(?:مصدر|مراسل|وكالة)[^:]*:\s*$', line):
-                should_skip = True
-            
-            if not should_skip and line.strip():
-                filtered_lines.append(line)
+    def _build_request(self, text: str, style: str) -> Tuple[Dict, Dict]:
+        """
+        بناء ترويسات وحمولة طلب DeepSeek (مشتركة بين المسار المتزامن وغير المتزامن)
+        """
+        # إزالة بيانات المصدر أولاً
+        text_without_source = remove_source_info(text)
         
-        result = '\n'.join(filtered_lines).strip()
-        # Clean up extra spaces
-        result = re.sub(r'\s+', ' ', result)
-        return result
+        # إنشاء الـ prompt
+        prompt = create_prompt(text_without_source, style)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 500
+        }
+        
+        return headers, payload
+    
+    def _postprocess(self, result: Dict) -> str:
+        """
+        استخراج النص من استجابة DeepSeek وتنظيفه
+        """
+        return clean_output(result["choices"][0]["message"]["content"])
+    
+    def _cache_lookup(self, text: str, style: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        البحث في الذاكرة المؤقتة قبل استدعاء API
+        
+        Returns:
+            (مفتاح الذاكرة المؤقتة، الصياغة المحفوظة أو None)
+        """
+        key = self._cache_key(text, style)
+        if key is None:
+            return None, None
+        return key, self.cache.get(key)
+    
+    def _cache_key(self, text: str, style: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.make_key(text, style, self.model, self.prompt_version)
+    
+    def _cache_store(self, key: Optional[str], rewritten_text: str):
+        if key is not None:
+            self.cache.put(key, rewritten_text)
+    
+    async def aprobe(self) -> bool:
+        """
+        فحص خفيف لتوفر DeepSeek (قائمة النماذج، دون توليد نص)
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        session = await get_http_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with session.get(self.models_url, headers=headers, timeout=timeout) as response:
+            return response.status == 200
+    
+    def lookup_cache(self, text: str, style: str = 'professional') -> Optional[str]:
+        """
+        الصياغة المحفوظة للنص إن وجدت (دون استدعاء API)
+        """
+        return self._cache_lookup(text, style)[1]
+    
+    def cache_key(self, text: str, style: str = 'professional') -> Optional[str]:
+        """
+        مفتاح النص في الذاكرة المؤقتة لهذا المزود (None بلا ذاكرة مؤقتة)
+        """
+        return self._cache_key(text, style)
     
     def rewrite(self, text: str, style: str = 'professional') -> Tuple[str, bool]:
         """
@@ -94,104 +139,276 @@ class DeepSeekRewriter:
         Returns:
             (النص المعاد صياغته، هل نجح)
         """
+        cache_key, cached = self._cache_lookup(text, style)
+        if cached is not None:
+            logger.info("♻️ صياغة محفوظة مسبقاً (دون استدعاء DeepSeek)")
+            return cached, True
+        
         if not self.api_key:
             logger.warning("⚠️ لا يمكن استخدام DeepSeek API بدون API Key")
             return text, False
         
+        # القاطع مفتوح: البديل المحلي فوراً دون انتظار مهلة
+        if not self.breaker.allow():
+            logger.info("🔌 DeepSeek متوقف مؤقتاً (القاطع مفتوح) - الانتقال للبديل")
+            return text, False
+        
         try:
-            # إزالة بيانات المصدر أولاً
-            text_without_source = self._remove_source_info(text)
+            headers, payload = self._build_request(text, style)
             
-            # إنشاء الـ prompt
-            prompt = self._create_prompt(text_without_source, style)
+            # المسار المتزامن وحده يحتاج requests: لا يُستورد عند بدء البوت
+            import requests
             
             # إرسال الطلب إلى DeepSeek
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "أنت محرر نصوص احترافي متخصص في إعادة الصياغة. أعد صياغة النص بأسلوب احترافي مع الحفاظ على المعنى الأصلي. غير الأسلوب والتراكيب بشكل واضح. تذكر: ترامب هو الرئيس الحالي للولايات المتحدة (2025)، ورئيس سوريا اسمه احمد الشرع، ورئيس الوزراء العراقي الحالي هو محمد شياع السوداني. لا تذكر مصادر الأخبار أو المراسلين أو الوكالات في النص المعاد صياغته."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
-            
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=5)
+            started = time.monotonic()
+            response = requests.post(self.api_url, json=payload, headers=headers, timeout=self.breaker.timeout())
             
             if response.status_code == 200:
-                result = response.json()
-                rewritten_text = result["choices"][0]["message"]["content"].strip()
-                # Post-processing to clean up the output
-                rewritten_text = rewritten_text.replace("النسخة المعدلة:", "").strip()
-                rewritten_text = rewritten_text.replace("تابعنا على @AjeelNewsIq", "").strip()
-                if not rewritten_text.startswith("🔴 عاجل | "):
-                    rewritten_text = "🔴 عاجل | " + rewritten_text
+                self.breaker.record(True, time.monotonic() - started)
+                rewritten_text = self._postprocess(response.json())
+                self._cache_store(cache_key, rewritten_text)
                 logger.info("✨ تمت إعادة الصياغة بنجاح عبر DeepSeek!")
                 return rewritten_text, True
             else:
+                self.breaker.record(False)
                 error_msg = f"خطأ DeepSeek: {response.status_code} - {response.text}"
                 logger.error(f"❌ {error_msg}")
                 return text, False
         
         except Exception as e:
+            self.breaker.record(False)
             logger.error(f"❌ خطأ في الاتصال بـ DeepSeek: {str(e)}")
             return text, False
     
-    def _create_prompt(self, text: str, style: str) -> str:
+    async def arewrite(self, text: str, style: str = 'professional',
+                       cache_lookup: bool = True) -> Tuple[str, bool]:
         """
-        إنشاء prompt لـ DeepSeek
+        إعادة صياغة النص باستخدام DeepSeek API بشكل غير متزامن
+        
+        يستخدم جلسة HTTP المشتركة (keep-alive وإعادة استخدام الاتصالات)،
+        فلا تُجمَّد حلقة الأحداث أثناء انتظار الرد ويمكن صياغة عدة رسائل في آن واحد.
+        
+        cache_lookup=False يتخطى البحث في الذاكرة المؤقتة (حين يكون المستدعي
+        قد بحث فيها مسبقاً) مع حفظ الصياغة الناجحة فيها كالمعتاد.
+        
+        Returns:
+            (النص المعاد صياغته، هل نجح)
         """
-        if style == 'professional':
-            return f"""أعد صياغة النص التالي بأسلوب احترافي وموضوعي مع تغيير الكلمات والتراكيب بشكل واضح:
-
-النص الأصلي:
-{text}
-
-المتطلبات:
-1. غير الأسلوب والتراكيب بشكل واضح وملحوظ
-2. احتفظ بالمعنى الأصلي تماماً
-3. لا تضيف معلومات جديدة
-4. اجعل النص أكثر وضوحاً واحترافية
-5. استخدم مرادفات مختلفة للكلمات الرئيسية
-
-أعد الصياغة مباشرة بدون تعليقات أو مقدمات مثل \"النسخة المعدلة:\":"""
+        if cache_lookup:
+            cache_key, cached = self._cache_lookup(text, style)
+            if cached is not None:
+                logger.info("♻️ صياغة محفوظة مسبقاً (دون استدعاء DeepSeek)")
+                return cached, True
+        else:
+            cache_key = self._cache_key(text, style)
         
-        elif style == 'casual':
-            return f"""أعد صياغة النص التالي بأسلوب بسيط وسهل مع تغيير الكلمات:
-
-النص الأصلي:
-{text}
-
-المتطلبات:
-1. استخدم كلمات بسيطة وسهلة
-2. احتفظ بالمعنى الأصلي
-3. غير التراكيب بشكل واضح
-
-أعد الصياغة مباشرة بدون تعليقات أو مقدمات مثل \"النسخة المعدلة:\":"""
+        if not self.api_key:
+            logger.warning("⚠️ لا يمكن استخدام DeepSeek API بدون API Key")
+            return text, False
+        
+        # القاطع مفتوح: البديل المحلي فوراً دون انتظار مهلة
+        if not self.breaker.allow():
+            logger.info("🔌 DeepSeek متوقف مؤقتاً (القاطع مفتوح) - الانتقال للبديل")
+            return text, False
         
-        else:  # formal
-            return f"""أعد صياغة النص التالي بأسلوب رسمي وفخم مع تغيير الكلمات والتراكيب:
+        try:
+            headers, payload = self._build_request(text, style)
+            
+            session = await get_http_session()
+            request_timeout = self.breaker.timeout()
+            timeout = aiohttp.ClientTimeout(total=request_timeout)
+            started = time.monotonic()
+            async with session.post(self.api_url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status == 200:
+                    self.breaker.record(True, time.monotonic() - started)
+                    rewritten_text = self._postprocess(await response.json())
+                    self._cache_store(cache_key, rewritten_text)
+                    logger.info("✨ تمت إعادة الصياغة بنجاح عبر DeepSeek!")
+                    return rewritten_text, True
+                
+                self.breaker.record(False)
+                error_msg = f"خطأ DeepSeek: {response.status} - {await response.text()}"
+                logger.error(f"❌ {error_msg}")
+                return text, False
+        
+        except asyncio.TimeoutError:
+            self.breaker.record_timeout(request_timeout)
+            logger.error(f"❌ انتهت مهلة الاتصال بـ DeepSeek ({request_timeout:.1f}s)")
+            return text, False
+        except Exception as e:
+            self.breaker.record(False)
+            logger.error(f"❌ خطأ في الاتصال بـ DeepSeek: {str(e)}")
+            return text, False
+    
+    def _build_batch_request(self, texts: List[str], style: str) -> Tuple[Dict, Dict]:
+        """
+        طلب واحد لعدة نصوص: نصوص مرقمة ومخرجات JSON بالأرقام نفسها
+        
+        موجه النظام يُرسل مرة واحدة للدفعة كلها بدلاً من مرة لكل رسالة.
+        """
+        headers, payload = self._build_request(texts[0], style)
+        
+        numbered = '\n\n'.join(
+            f"[{i}]\n{remove_source_info(text)}" for i, text in enumerate(texts, 1)
+        )
+        style_name = self.BATCH_STYLES.get(style, self.BATCH_STYLES['formal'])
+        payload["messages"][1]["content"] = f"""أعد صياغة كل نص من النصوص المرقمة التالية {style_name} مع تغيير الكلمات والتراكيب بشكل واضح:
 
-النص الأصلي:
-{text}
+{numbered}
 
 المتطلبات:
-1. استخدم لغة رسمية وفخمة
-2. احتفظ بالمعنى الأصلي
-3. غير التراكيب بشكل واضح
-
-أعد الصياغة مباشرة بدون تعليقات أو مقدمات مثل \"النسخة المعدلة:\":"""
+1. صغ كل نص على حدة واحتفظ بمعناه الأصلي تماماً
+2. لا تضيف معلومات جديدة ولا تدمج النصوص
+3. أعد كائن JSON فقط، مفاتيحه أرقام النصوص وقيمه الصياغات، مثل: {{"1": "...", "2": "..."}}"""
+        payload["response_format"] = {"type": "json_object"}
+        payload["max_tokens"] = min(8192, payload["max_tokens"] * len(texts))
+        
+        return headers, payload
+    
+    def _parse_batch(self, content: str, count: int) -> List[Optional[str]]:
+        """
+        استخراج الصياغات من مخرجات JSON (None لكل عنصر مفقود أو مشوه)
+        """
+        try:
+            outputs = json.loads(content)
+        except ValueError:
+            return [None] * count
+        if not isinstance(outputs, dict):
+            return [None] * count
+        
+        results = []
+        for i in range(1, count + 1):
+            output = outputs.get(str(i))
+            if isinstance(output, str) and output.strip():
+                results.append(clean_output(output))
+            else:
+                results.append(None)
+        return results
+    
+    async def arewrite_batch(self, texts: List[str], style: str = 'professional') -> Optional[List[Optional[str]]]:
+        """
+        إعادة صياغة عدة نصوص في طلب DeepSeek واحد
+        
+        Returns:
+            قائمة بصياغة كل نص (None للعنصر الذي تعذر استخراجه من المخرجات)،
+            أو None إذا فشل الطلب نفسه
+        """
+        if not self.api_key:
+            logger.warning("⚠️ لا يمكن استخدام DeepSeek API بدون API Key")
+            return None
+        
+        if not self.breaker.allow():
+            logger.info("🔌 DeepSeek متوقف مؤقتاً (القاطع مفتوح) - الانتقال للبديل")
+            return None
+        
+        try:
+            headers, payload = self._build_batch_request(texts, style)
+            
+            session = await get_http_session()
+            # التوليد يطول مع عدد النصوص
+            timeout = aiohttp.ClientTimeout(total=self.timeout + len(texts))
+            async with session.post(self.api_url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    self.breaker.record(False)
+                    logger.error(f"❌ خطأ DeepSeek (دفعة): {response.status} - {await response.text()}")
+                    return None
+                result = await response.json()
+            
+            # زمن الدفعة يتبع حجمها، فلا يدخل في المهلة التكيفية
+            self.breaker.record(True)
+            outputs = self._parse_batch(result["choices"][0]["message"]["content"], len(texts))
+            for text, output in zip(texts, outputs):
+                if output is not None:
+                    self._cache_store(self._cache_key(text, style), output)
+            
+            logger.info(f"✨ دفعة DeepSeek: {sum(o is not None for o in outputs)}/{len(texts)} صياغة")
+            return outputs
+        
+        except asyncio.TimeoutError:
+            self.breaker.record(False)
+            logger.error(f"❌ انتهت مهلة دفعة DeepSeek ({len(texts)} نصوص)")
+            return None
+        except Exception as e:
+            self.breaker.record(False)
+            logger.error(f"❌ خطأ في دفعة DeepSeek: {str(e)}")
+            return None
+    
+    async def arewrite_stream(self, text: str, style: str = 'professional',
+                              on_partial: Callable[[str], Awaitable] = None) -> Tuple[str, bool]:
+        """
+        إعادة الصياغة عبر بث SSE من DeepSeek (stream=true)
+        
+        on_partial يُستدعى مع النص المنظف المتراكم بعد كل جزء مبثوث، فيمكن
+        نشر أول جملة قبل اكتمال الصياغة. الصياغة المحفوظة مسبقاً تُعاد مباشرة
+        دون استدعاء on_partial.
+        
+        Returns:
+            (النص المعاد صياغته كاملاً، هل نجح)
+        """
+        cache_key, cached = self._cache_lookup(text, style)
+        if cached is not None:
+            logger.info("♻️ صياغة محفوظة مسبقاً (دون استدعاء DeepSeek)")
+            return cached, True
+        
+        if not self.api_key:
+            logger.warning("⚠️ لا يمكن استخدام DeepSeek API بدون API Key")
+            return text, False
+        
+        # القاطع مفتوح: البديل المحلي فوراً دون انتظار مهلة
+        if not self.breaker.allow():
+            logger.info("🔌 DeepSeek متوقف مؤقتاً (القاطع مفتوح) - الانتقال للبديل")
+            return text, False
+        
+        try:
+            headers, payload = self._build_request(text, style)
+            payload["stream"] = True
+            
+            session = await get_http_session()
+            # المهلة بين جزأين متتاليين لا على البث كاملاً
+            timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+            chunks = []
+            async with session.post(self.api_url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    self.breaker.record(False)
+                    error_msg = f"خطأ DeepSeek: {response.status} - {await response.text()}"
+                    logger.error(f"❌ {error_msg}")
+                    return text, False
+                
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if not delta:
+                        continue
+                    chunks.append(delta)
+                    if on_partial is not None:
+                        await on_partial(clean_output(''.join(chunks)))
+            
+            if not chunks:
+                self.breaker.record(False)
+                logger.error("❌ بث DeepSeek انتهى دون نص")
+                return text, False
+            
+            # زمن البث كاملاً يتبع طول النص لا صحة الخدمة، فلا يدخل في المهلة التكيفية
+            self.breaker.record(True)
+            rewritten_text = clean_output(''.join(chunks))
+            self._cache_store(cache_key, rewritten_text)
+            logger.info("✨ تمت إعادة الصياغة بنجاح عبر DeepSeek (بث)!")
+            return rewritten_text, True
+        
+        except asyncio.TimeoutError:
+            self.breaker.record(False)
+            logger.error(f"❌ انتهت مهلة بث DeepSeek ({self.timeout}s بين جزأين)")
+            return text, False
+        except Exception as e:
+            self.breaker.record(False)
+            logger.error(f"❌ خطأ في بث DeepSeek: {str(e)}")
+            return text, False
     
     def get_rewrite_stats(self, original: str, rewritten: str) -> Dict:
         """
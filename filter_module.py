@@ -6,91 +6,151 @@ Advanced Filtering System for News Content
 """
 
 import re
-from typing import Tuple, Dict
+from collections import Counter
+from typing import Tuple, Dict, List
+from arabic_module import strip_diacritics, tokenize
+from dedup_module import MinHashLSHIndex
+from keyword_matcher_module import KeywordHits, KeywordMatcher
+from lexicon_module import Lexicon, default_lexicon
+
+# الأحرف الخاصة (نفس الفئة [!@#$%^&*()_+=\[\]{};:\'",.<>?/\\|`~-] المستخدمة سابقاً)
+SPECIAL_CHARS = frozenset('!@#$%^&*()_+=[]{};:\'",.<>?/\\|`~-')
+SENTENCE_ENDINGS = '.!?'
+
+# حرف يتكرر 5 مرات متتالية أو أكثر
+_REPEATED_CHARS = re.compile(r'(.)\1{4,}')
+
+# أنماط الروابط (تم تخفيف المعايير - فقط الروابط المباشرة)
+URL_PATTERNS = [
+    r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+    r'www\.[a-zA-Z0-9-]+\.[a-zA-Z]{2,}',
+    r'bit\.ly/\w+',
+    r'tinyurl\.com/\w+',
+    # تم إزالة: @\w+ و #\w+ للسماح بـ mentions و hashtags
+]
+
+
+class TextFeatures:
+    """
+    خصائص النص محسوبة مرة واحدة لكل رسالة
+    
+    كل فحوصات SmartFilter تقرأ من هذا الكائن بدلاً من إعادة تقسيم النص
+    ومسحه في كل دالة. أعداد الأحرف تأتي من مرور واحد (Counter) على النص.
+    """
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        
+        # الكلمات
+        self.words = text.split()
+        self.word_count = len(self.words)
+        # الكلمات المطبّعة (مشتركة مع فهرس التكرار عبر ذاكرة tokenize):
+        # أعلنَ وأعلن واعلن كلمة واحدة
+        self.tokens = tokenize(text)
+        self.unique_word_count = len(set(self.tokens))
+        self.unique_ratio = self.unique_word_count / len(self.tokens) if self.tokens else 0.0
+        
+        # مرور واحد على الأحرف
+        char_counts = Counter(text)
+        self.special_count = sum(n for c, n in char_counts.items() if c in SPECIAL_CHARS)
+        uppercase_count = sum(n for c, n in char_counts.items() if c.isupper())
+        self.uppercase_ratio = uppercase_count / self.length if self.length else 0.0
+        # عدد الأجزاء الناتجة عن re.split(r'[.!?]', text)
+        self.sentence_count = sum(char_counts[c] for c in SENTENCE_ENDINGS) + 1
+        
+        self.has_repeated_chars = _REPEATED_CHARS.search(text) is not None
+        
+        # نتيجة مطابقة الكلمات المفتاحية (تُملأ عند الحاجة)
+        self.keyword_hits = None
+
 
 class SmartFilter:
     """
     نظام فلترة ذكي لكشف الإعلانات والمحتوى غير المرغوب
     """
     
-    def __init__(self):
-        # كلمات مفتاحية للإعلانات
-        self.ad_keywords = [
-            'اشتري', 'شراء', 'عرض خاص', 'خصم', 'تخفيف', 'توفير',
-            'اضغط هنا', 'انقر هنا', 'رابط', 'زيارة', 'موقع',
-            'تحميل', 'تنزيل', 'تطبيق', 'برنامج', 'إعلان',
-            'إعلانات', 'دعاية', 'تسويق', 'عرض', 'ترويج',
-            'مجاني', 'بدون تكلفة', 'احصل على', 'اربح', 'جائزة',
-            'يانصيب', 'سحب', 'فوز', 'محظوظ', 'حظك',
-            'اتصل', 'هاتف', 'واتس', 'تليجرام', 'بريد',
-            'عنوان', 'موقع', 'فرع', 'فروع', 'مقر',
-            'سعر', 'ثمن', 'تكلفة', 'قيمة', 'دفع',
-            'بطاقة', 'حساب', 'تحويل', 'تمويل', 'قرض',
-            'استثمار', 'أرباح', 'عائد', 'فائدة', 'رأس مال',
-            'عمل', 'وظيفة', 'توظيف', 'فرصة عمل', 'تدريب',
-            'دورة', 'كورس', 'تعليم', 'شهادة', 'درجة',
-            'صحة', 'علاج', 'دواء', 'طبي', 'طبيب',
-            'جمال', 'مستحضرات', 'كريم', 'عطر', 'مكياج',
-            'ملابس', 'أحذية', 'حقائب', 'إكسسوارات', 'مجوهرات',
-            'سيارة', 'سيارات', 'عقار', 'عقارات', 'بيت', 'منزل',
-            'فندق', 'سفر', 'رحلة', 'تذاكر', 'حجز',
-            'طعام', 'مطعم', 'وجبة', 'قهوة', 'مشروب',
-            'ألعاب', 'رياضة', 'ترفيه', 'حفلة', 'حدث',
-            'كازينو', 'مراهنة', 'قمار', 'رهان', 'لعب',
-            'عملة', 'بيتكوين', 'كريبتو', 'استثمار رقمي',
-            'شبكة', 'تسويق شبكي', 'mlm', 'بيزنس', 'مشروع',
-            'أونلاين', 'إنترنت', 'ويب', 'موقع إلكتروني',
-            'تطبيق', 'برنامج', 'سوفتوير', 'تقنية', 'تكنولوجيا',
-            'ساعة', 'عطر', 'نظارة', 'حقيبة', 'منتج',
-            'جديد', 'حصري', 'محدود', 'نادر', 'فريد',
-            'الأفضل', 'الأسرع', 'الأرخص', 'الأقوى', 'الأجمل',
-            'مضمون', 'مجرب', 'موثوق', 'معتمد', 'أصلي',
-            'الآن', 'فقط اليوم', 'لفترة محدودة', 'قبل انتهاء', 'عجل',
-            'لا تفوت', 'لا تتأخر', 'سريع', 'فوري', 'فاجل'
-        ]
-        
-        # أنماط الروابط (تم تخفيف المعايير - فقط الروابط المباشرة)
-        self.url_patterns = [
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
-            r'www\.[a-zA-Z0-9-]+\.[a-zA-Z]{2,}',
-            r'bit\.ly/\w+',
-            r'tinyurl\.com/\w+',
-            # تم إزالة: @\w+ و #\w+ للسماح بـ mentions و hashtags
-        ]
-        
-        # كلمات مفتاحية للمحتوى الموثوق
-        self.trusted_keywords = [
-            'وكالة', 'رويترز', 'ap', 'afp', 'bbc', 'cnn', 'الجزيرة',
-            'الحدث', 'الأخبار', 'عاجل', 'تقرير', 'تحقيق',
-            'بيان', 'إعلان رسمي', 'وزارة', 'حكومة', 'سفارة',
-            'مسؤول', 'رسمي', 'حكومي', 'دولي', 'عالمي',
-            'أمم متحدة', 'يونسكو', 'الاتحاد الأوروبي', 'ناتو',
-            'اقتصاد', 'سياسة', 'رياضة', 'ثقافة', 'علوم',
-            'تكنولوجيا', 'صحة', 'بيئة', 'تعليم', 'قانون'
-        ]
+    # الأنماط مجمعة مرة واحدة عند تحميل الصنف
+    URL_REGEX = re.compile('|'.join(URL_PATTERNS))
+    PHONE_REGEX = re.compile(r'(\+\d{1,3})?[\s.-]?\d{3}[\s.-]?\d{3}[\s.-]?\d{4}')
+    
+    def __init__(self, lexicon: Lexicon = None):
+        # الكلمات الإعلانية والموثوقة وآلة مطابقتها من المعجم المجمع (lexicon.json)،
+        # مشترك بين كل النسخ بدلاً من بنائه لكل نسخة
+        self.lexicon = lexicon if lexicon is not None else default_lexicon()
+        
+        # أنماط الروابط (مجمعة مسبقاً في URL_REGEX)
+        self.url_patterns = list(URL_PATTERNS)
+    
+    @property
+    def ad_keywords(self) -> Tuple[str, ...]:
+        return self.lexicon.ad_keywords
+    
+    @property
+    def trusted_keywords(self) -> Tuple[str, ...]:
+        return self.lexicon.trusted_keywords
     
-    def is_advertisement(self, text: str) -> Tuple[bool, str]:
+    @property
+    def keyword_matcher(self) -> KeywordMatcher:
+        return self.lexicon.matcher
+    
+    def use_lexicon(self, lexicon: Lexicon):
+        """
+        استبدال المعجم أثناء التشغيل بإسناد واحد: الرسائل قيد الفحص تكمل
+        بالمعجم القديم ولا تتوقف المعالجة
+        """
+        self.lexicon = lexicon
+    
+    def reload_keywords(self, ad_keywords: list = None, trusted_keywords: list = None):
+        """
+        استبدال قوائم الكلمات أثناء التشغيل (المرادفات وبقية المعجم كما هي)
+        
+        يُبنى المعجم الجديد كاملاً أولاً ثم يُستبدل بإسناد واحد.
+        """
+        self.use_lexicon(self.lexicon.replace(ad_keywords=ad_keywords, trusted_keywords=trusted_keywords))
+    
+    def scan_keywords(self, text: str) -> KeywordHits:
+        """
+        فحص النص مرة واحدة مقابل كل قوائم الكلمات (الإعلانية والموثوقة)
+        
+        التشكيل والتطويل محذوفان من النص والكلمات، فتطابق إعلان إعلانٌ وإعـلان.
+        """
+        return self.keyword_matcher.scan(strip_diacritics(text))
+    
+    def analyze(self, text: str) -> TextFeatures:
+        """
+        حساب خصائص النص ومطابقة الكلمات المفتاحية مرة واحدة لكل الفحوصات
+        """
+        features = TextFeatures(text)
+        features.keyword_hits = self.scan_keywords(text)
+        return features
+    
+    def _features(self, text: str, features: TextFeatures = None) -> TextFeatures:
+        if features is None or features.text is not text:
+            features = self.analyze(text)
+        return features
+    
+    def is_advertisement(self, text: str, features: TextFeatures = None) -> Tuple[bool, str]:
         """
         كشف إذا كان النص إعلاناً
         
+        Args:
+            features: نتيجة analyze إن كانت محسوبة مسبقاً
+        
         Returns:
             (is_ad, reason)
         """
-        text_lower = text.lower()
+        features = self._features(text, features)
         
         # فحص الكلمات المفتاحية للإعلانات
-        ad_count = 0
-        for keyword in self.ad_keywords:
-            if keyword in text_lower:
-                ad_count += 1
+        ad_count = features.keyword_hits.count('ad')
         
         if ad_count >= 5:  # تم رفع الحد من 3 إلى 5 - تخفيف معايير الإعلانات
             return True, "كلمات إعلانية متعددة"
         
         # فحص الروابط (فقط الروابط المباشرة، ليس mentions أو hashtags)
-        for pattern in self.url_patterns:
-            if re.search(pattern, text):
-                return True, "يحتوي على روابط مباشرة"
+        if self.URL_REGEX.search(text):
+            return True, "يحتوي على روابط مباشرة"
         
         # فحص الأسعار والأرقام المشبوهة (تم تخفيف - فقط إذا كانت مع كلمات إعلانية)
         # تم إزالة هذا الفحص لأنه قد يحجب أخبار اقتصادية مهمة
@@ -98,45 +158,43 @@ class SmartFilter:
         #     return True, "يحتوي على أسعار"
         
         # فحص الأرقام الهاتفية (تم تخفيف - فقط إذا كانت متعددة)
-        phone_count = len(re.findall(r'(\+\d{1,3})?[\s.-]?\d{3}[\s.-]?\d{3}[\s.-]?\d{4}', text))
+        phone_count = len(self.PHONE_REGEX.findall(text))
         if phone_count >= 3:  # فقط إذا كانت 3 أرقام أو أكثر
             return True, "يحتوي على أرقام هاتفية متعددة"
         
         return False, "نص موثوق"
     
-    def is_low_quality(self, text: str) -> Tuple[bool, str]:
+    def is_low_quality(self, text: str, features: TextFeatures = None) -> Tuple[bool, str]:
         """
         كشف إذا كان النص منخفض الجودة
         
         Returns:
             (is_low_quality, reason)
         """
+        features = self._features(text, features)
+        word_count = features.word_count
+        
         # فحص الطول
-        words = text.split()
-        if len(words) < 5:  # تم تخفيف من 10 إلى 5
+        if word_count < 5:  # تم تخفيف من 10 إلى 5
             return True, "نص قصير جداً"
         
-        if len(words) > 1000:  # تم تخفيف من 500 إلى 1000
+        if word_count > 1000:  # تم تخفيف من 500 إلى 1000
             return True, "نص طويل جداً"
         
         # فحص الأحرف الخاصة الزائدة
-        special_chars = len(re.findall(r'[!@#$%^&*()_+=\[\]{};:\'",.<>?/\\|`~-]', text))
-        if special_chars > len(words) * 0.3:
+        if features.special_count > word_count * 0.3:
             return True, "أحرف خاصة زائدة"
         
         # فحص الأحرف المكررة
-        if re.search(r'(.)\1{4,}', text):
+        if features.has_repeated_chars:
             return True, "أحرف مكررة"
         
         # فحص الكلمات المكررة
-        words_lower = [w.lower() for w in words]
-        unique_ratio = len(set(words_lower)) / len(words_lower)
-        if unique_ratio < 0.5:
+        if features.unique_ratio < 0.5:
             return True, "كلمات مكررة كثيراً"
         
         # فحص الأحرف الكبيرة الزائدة
-        uppercase_ratio = sum(1 for c in text if c.isupper()) / len(text)
-        if uppercase_ratio > 0.5:
+        if features.uppercase_ratio > 0.5:
             return True, "أحرف كبيرة زائدة"
         
         return False, "جودة جيدة"
@@ -145,16 +203,21 @@ class SmartFilter:
         """
         كشف إذا كان النص مكرراً
         
+        stored_texts إما قائمة نصوص (مقارنة مع كل نص) أو MinHashLSHIndex
+        (بحث شبه ثابت الكلفة مهما كبرت النافذة، بنفس الحد 0.95)
+        
         Returns:
             (is_duplicate, reason)
         """
-        text_lower = text.lower()
+        if isinstance(stored_texts, MinHashLSHIndex):
+            key, similarity = stored_texts.query(text)
+            if key is not None:
+                return True, f"نص مكرر (تشابه: {similarity:.0%})"
+            return False, "نص جديد"
         
         for stored_text in stored_texts:
-            stored_lower = stored_text.lower()
-            
             # حساب التشابه
-            similarity = self.calculate_similarity(text_lower, stored_lower)
+            similarity = self.calculate_similarity(text, stored_text)
             
             if similarity > 0.95:  # تم رفع الحد من 0.8 إلى 0.95 - السماح برسائل متشابهة قليلاً
                 return True, f"نص مكرر (تشابه: {similarity:.0%})"
@@ -163,10 +226,10 @@ class SmartFilter:
     
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """
-        حساب نسبة التشابه بين نصين
+        حساب نسبة التشابه بين نصين (على الكلمات المطبّعة، كفهرس التكرار)
         """
-        words1 = set(text1.split())
-        words2 = set(text2.split())
+        words1 = set(tokenize(text1))
+        words2 = set(tokenize(text2))
         
         if not words1 or not words2:
             return 0.0
@@ -176,38 +239,34 @@ class SmartFilter:
         
         return intersection / union if union > 0 else 0.0
     
-    def get_quality_score(self, text: str) -> float:
+    def get_quality_score(self, text: str, features: TextFeatures = None) -> float:
         """
         حساب درجة جودة النص (0-100)
         """
+        features = self._features(text, features)
+        word_count = features.word_count
         score = 100.0
         
         # فحص الطول
-        words = text.split()
-        if len(words) < 20:
+        if word_count < 20:
             score -= 20
-        elif len(words) > 400:
+        elif word_count > 400:
             score -= 10
         
         # فحص الأحرف الخاصة
-        special_chars = len(re.findall(r'[!@#$%^&*()_+=\[\]{};:\'",.<>?/\\|`~-]', text))
-        if special_chars > len(words) * 0.2:
+        if features.special_count > word_count * 0.2:
             score -= 15
         
         # فحص الكلمات المكررة
-        words_lower = [w.lower() for w in words]
-        unique_ratio = len(set(words_lower)) / len(words_lower)
-        if unique_ratio < 0.6:
+        if features.unique_ratio < 0.6:
             score -= 20
         
         # فحص الأحرف الكبيرة
-        uppercase_ratio = sum(1 for c in text if c.isupper()) / len(text)
-        if uppercase_ratio > 0.3:
+        if features.uppercase_ratio > 0.3:
             score -= 10
         
         # فحص الجمل
-        sentences = re.split(r'[.!?]', text)
-        if len(sentences) < 2:
+        if features.sentence_count < 2:
             score -= 15
         
         return max(0, score)
@@ -223,35 +282,100 @@ class SmartFilter:
                 'quality_score': float,
                 'is_ad': bool,
                 'is_low_quality': bool,
-                'is_duplicate': bool
+                'is_duplicate': bool,
+                'trusted_count': int
             }
         """
         if stored_texts is None:
             stored_texts = []
         
+        # خصائص النص ومطابقة الكلمات المفتاحية (مرة واحدة لكل الفحوصات)
+        features = self.analyze(text)
+        
+        # فحص التكرار
+        is_duplicate, duplicate_reason = self.is_duplicate(text, stored_texts)
+        
+        return self._result(text, features, is_duplicate, duplicate_reason)
+    
+    def filter_many(self, texts: List[str], stored_texts: list = None, add: bool = False) -> List[Dict]:
+        """
+        فلترة دفعة نصوص (الاستيراد الأولي، إعادة التشغيل، الرسائل المتراكمة)
+        
+        نتيجة كل نص مطابقة لـ filter_text، مع كشف التكرار داخل الدفعة نفسها:
+        كل نص يُقارن بالسجل وبالنصوص التي مرت قبله في الدفعة، كأن الدفعة
+        فُلترت بالترتيب وأُضيف كل نص ناجح إلى السجل. مع add=True تُضاف
+        النصوص الناجحة إلى stored_texts فعلاً، وإلا يبقى السجل كما هو.
+        
+        النص المكرر حرفياً يُحلل مرة واحدة، وتوقيعات MinHash للدفعة كلها
+        تُحسب معاً (MinHashLSHIndex.features_many) وهي معظم كلفة الفلترة.
+        
+        Returns:
+            قائمة نتائج filter_text بترتيب texts
+        """
+        if stored_texts is None:
+            stored_texts = []
+        
+        indexed = isinstance(stored_texts, MinHashLSHIndex)
+        if indexed:
+            signatures = stored_texts.features_many(texts)
+            batch = stored_texts if add else MinHashLSHIndex(
+                max_items=max(len(texts), 1), threshold=stored_texts.threshold,
+                num_perm=stored_texts.num_perm, bands=stored_texts.bands, seed=stored_texts.seed,
+            )
+        else:
+            batch = stored_texts if add else list(stored_texts)
+        
+        analyzed = {}
+        results = []
+        for i, text in enumerate(texts):
+            features = analyzed.get(text)
+            if features is None:
+                features = analyzed[text] = self.analyze(text)
+            
+            if indexed:
+                tokens, signature = signatures[i]
+                # أعلى تشابه بين السجل وما مر من الدفعة (كما لو كانا فهرساً واحداً)
+                _, similarity = batch.query_signature(tokens, signature)
+                if batch is not stored_texts:
+                    similarity = max(similarity, stored_texts.query_signature(tokens, signature)[1])
+                is_duplicate = similarity > stored_texts.threshold
+                duplicate_reason = f"نص مكرر (تشابه: {similarity:.0%})" if is_duplicate else "نص جديد"
+            else:
+                is_duplicate, duplicate_reason = self.is_duplicate(text, batch)
+            
+            result = self._result(text, features, is_duplicate, duplicate_reason)
+            if result['passed']:
+                if indexed:
+                    batch.add_signature(tokens, signature)
+                else:
+                    batch.append(text)
+            results.append(result)
+        
+        return results
+    
+    def _result(self, text: str, features: TextFeatures, is_duplicate: bool, duplicate_reason: str) -> Dict:
         reasons = []
         passed = True
         
         # فحص الإعلانات
-        is_ad, ad_reason = self.is_advertisement(text)
+        is_ad, ad_reason = self.is_advertisement(text, features)
         if is_ad:
             passed = False
             reasons.append(f"❌ إعلان: {ad_reason}")
         
         # فحص الجودة
-        is_low_quality, quality_reason = self.is_low_quality(text)
+        is_low_quality, quality_reason = self.is_low_quality(text, features)
         if is_low_quality:
             passed = False
             reasons.append(f"❌ جودة منخفضة: {quality_reason}")
         
         # فحص التكرار
-        is_duplicate, duplicate_reason = self.is_duplicate(text, stored_texts)
         if is_duplicate:
             passed = False
             reasons.append(f"❌ تكرار: {duplicate_reason}")
         
         # حساب درجة الجودة
-        quality_score = self.get_quality_score(text)
+        quality_score = self.get_quality_score(text, features)
         
         if passed:
             reasons.append(f"✅ نص موثوق (درجة الجودة: {quality_score:.0f}/100)")
@@ -262,7 +386,8 @@ class SmartFilter:
             'quality_score': quality_score,
             'is_ad': is_ad,
             'is_low_quality': is_low_quality,
-            'is_duplicate': is_duplicate
+            'is_duplicate': is_duplicate,
+            'trusted_count': features.keyword_hits.count('trusted')
         }
 
 
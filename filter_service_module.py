@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+"""
+خدمة الفلترة في عمليات منفصلة حتى لا تحجب حلقة الأحداث
+Process-pool filter service with replicated, incrementally updated dedup indexes
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple, Union
+
+from dedup_module import MinHashLSHIndex, jaccard
+from filter_module import SmartFilter
+from lexicon_module import Lexicon
+
+logger = logging.getLogger(__name__)
+
+# (المفتاح، التجزئات، التوقيع) لمدخل أُضيف إلى الفهرس
+Entry = Tuple[Hashable, FrozenSet[int], Tuple[int, ...]]
+
+# حالة العملية العاملة (عملية لكل منفذ، فلا مشاركة بين العمال)
+_worker_filter = None
+_worker_index = None
+
+
+def _init_worker(params: Dict, source: Union[MinHashLSHIndex, List[Entry]], lexicon: Lexicon):
+    global _worker_filter, _worker_index
+    _worker_filter = SmartFilter(lexicon)
+    if isinstance(source, MinHashLSHIndex):
+        # fork: الفهرس الموروث من ذاكرة العملية الرئيسية، دون إعادة بناء
+        _worker_index = source.view()
+        return
+    _worker_index = MinHashLSHIndex(**params)
+    for key, tokens, signature in source:
+        _worker_index.add_signature(tokens, signature, key)
+
+
+def _index_size() -> int:
+    return len(_worker_index)
+
+
+def _filter_task(text: str, updates: List[Entry],
+                 lexicon: Lexicon = None) -> Tuple[Dict, FrozenSet[int], Tuple[int, ...]]:
+    # معجم أُعيد تحميله في العملية الرئيسية منذ آخر مهمة
+    if lexicon is not None:
+        _worker_filter.use_lexicon(lexicon)
+
+    # الإضافات التي فاتت هذه النسخة منذ آخر مهمة، بترتيبها في الفهرس الأصلي
+    for key, tokens, signature in updates:
+        _worker_index.add_signature(tokens, signature, key)
+
+    result = _worker_filter.filter_text(text, _worker_index)
+    tokens, signature = _worker_index.features(text)
+    return result, tokens, signature
+
+
+class FilterService:
+    """
+    يشغل SmartFilter.filter_text في workers عملية منفصلة (منفذ بعامل واحد
+    لكل عملية)، ولكل عملية نسخة من فهرس التكرار.
+
+    الفهرس الأصلي (index) يبقى في العملية الرئيسية ويُضاف إليه النص الذي
+    يمر. كل إضافة تُسجل في سجل تحديثات متسلسل، وكل مهمة تحمل إلى عمليتها
+    الإضافات التي لم تطبقها بعد، فتبقى النسخ مطابقة دون إعادة إرسال الفهرس.
+
+    نسخة العامل قد لا تحوي إضافات حدثت أثناء تنفيذ المهمة (رسالتان
+    متشابهتان تُفلتران بالتوازي)، فيُعاد فحص النص الناجح مقابل هذه الإضافات
+    فقط في العملية الرئيسية قبل إضافته، بلا انتظار بين الفحص والإضافة.
+    """
+
+    def __init__(self, index: MinHashLSHIndex, filter_system: SmartFilter, workers: int = 1):
+        self.index = index
+        self.filter_system = filter_system
+
+        self._params = {
+            'max_items': index.max_items,
+            'threshold': index.threshold,
+            'num_perm': index.num_perm,
+            'bands': index.bands,
+            'seed': index.seed,
+        }
+        # سجل التحديثات: self._log[i] هو التحديث رقم self._base + i
+        self._log: List[Entry] = []
+        self._base = 0
+        self._executors = [self._spawn() for _ in range(max(1, workers))]
+        # تشغيل عامل بديل جارٍ في خيط: مهام العامل تنتظره قبل الإرسال إليه
+        self._starting: List[Optional[asyncio.Future]] = [None] * len(self._executors)
+        # آخر تحديث أُرسل إلى كل عامل، وعدد المهام المعلقة لكل عامل
+        self._applied = [0] * len(self._executors)
+        self._busy = [0] * len(self._executors)
+        # المعجم الذي يستخدمه كل عامل (يُرسل الجديد مع أول مهمة بعد إعادة التحميل)
+        self._lexicons = [filter_system.lexicon] * len(self._executors)
+        # أرقام التحديثات التي تنتظر مهام معلقة إعادة الفحص مقابل ما بعدها
+        self._dispatched = Counter()
+
+        self.offloaded = 0
+        self.rechecked_duplicates = 0
+        self.fallbacks = 0
+
+    async def start(self):
+        """
+        تشغيل العمليات مبكراً (قبل الاتصال بـ Telegram) بدلاً من أول رسالة
+        """
+        loop = asyncio.get_running_loop()
+        sizes = await asyncio.gather(*(
+            loop.run_in_executor(executor, _index_size) for executor in self._executors
+        ))
+        logger.info(f"🧮 خدمة الفلترة: {len(sizes)} عملية، {sizes[0]} بصمة في كل نسخة")
+
+    @property
+    def _seq(self) -> int:
+        return self._base + len(self._log)
+
+    def _spawn(self, entries: List[Entry] = None) -> ProcessPoolExecutor:
+        """
+        منفذ بعامل واحد: العمليات الأولى تُنسخ بـ fork (قبل الاتصال بـ Telegram)
+        وترث الفهرس نفسه بلا تسلسل. العامل البديل بعد الاتصال (entries) لا يُنسخ
+        من العملية الرئيسية (مقبس Telegram ومخزن الحالة) بل يبدأ من forkserver أو
+        spawn - فيستورد bot.py بوصفه __mp_main__ دون تشغيله - ويبني نسخته من المدخلات.
+        """
+        methods = multiprocessing.get_all_start_methods()
+        if entries is None and 'fork' in methods:
+            context, source = multiprocessing.get_context('fork'), self.index
+        else:
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            source = self.index.entries() if entries is None else entries
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._params, source, self.filter_system.lexicon),
+        )
+
+    def _respawn(self, worker: int):
+        """
+        استبدال عامل انهارت عمليته بنسخة من الفهرس الحالي
+        """
+        self._executors[worker].shutdown(wait=False)
+        # لقطة المدخلات في الحلقة (قائمة مراجع، ولا تتغير أثناء أخذها)؛ تسلسلها
+        # وإرسالها عند تشغيل العملية يتبعان حجم الفهرس فيجريان في خيط
+        executor = self._spawn(self.index.entries())
+        self._executors[worker] = executor
+        self._applied[worker] = self._seq
+        self._lexicons[worker] = self.filter_system.lexicon
+        self._starting[worker] = asyncio.get_running_loop().run_in_executor(
+            None, lambda: executor.submit(_index_size).result()
+        )
+
+    def _trim(self):
+        # ما طبقه كل العمال ولا تحتاجه مهمة معلقة لا داعي لبقائه
+        low = min(self._applied)
+        if self._dispatched:
+            low = min(low, min(self._dispatched))
+        if low > self._base:
+            del self._log[:low - self._base]
+            self._base = low
+
+    async def filter(self, text: str) -> Dict:
+        """
+        فلترة النص في عملية عاملة؛ النص الذي يمر يُضاف إلى الفهرس
+
+        Returns:
+            نتيجة SmartFilter.filter_text
+        """
+        # الأقل انشغالاً، وعند التساوي الأقدم تحديثاً (فلا يبقى عامل خاملاً ويطول السجل)
+        worker = min(range(len(self._executors)), key=lambda w: (self._busy[w], self._applied[w]))
+        dispatched = self._seq
+        updates = self._log[self._applied[worker] - self._base:]
+        self._applied[worker] = dispatched
+        lexicon = self.filter_system.lexicon
+        if lexicon is self._lexicons[worker]:
+            lexicon = None
+        else:
+            self._lexicons[worker] = lexicon
+        self._busy[worker] += 1
+        self._dispatched[dispatched] += 1
+        # الإضافات من هذا الرقم فصاعداً لم تكن في نسخة العامل
+        since = dispatched
+
+        executor, starting = self._executors[worker], self._starting[worker]
+
+        try:
+            if starting is not None:
+                await starting
+                if self._starting[worker] is starting:
+                    self._starting[worker] = None
+            loop = asyncio.get_running_loop()
+            result, tokens, signature = await loop.run_in_executor(
+                executor, _filter_task, text, updates, lexicon
+            )
+            self.offloaded += 1
+        except BrokenProcessPool:
+            # عملية انهارت: عامل جديد بنسخة حالية من الفهرس، وهذه الرسالة في الحلقة
+            logger.error("❌ انهارت عملية الفلترة - إعادة تشغيلها والفلترة محلياً")
+            self.fallbacks += 1
+            # مهام أخرى على العامل نفسه تنهار معه: بديل واحد فقط
+            if self._executors[worker] is executor:
+                self._respawn(worker)
+            result = self.filter_system.filter_text(text, self.index)
+            tokens, signature = self.index.features(text)
+            since = self._seq
+        finally:
+            self._busy[worker] -= 1
+            self._dispatched[dispatched] -= 1
+            if not self._dispatched[dispatched]:
+                del self._dispatched[dispatched]
+
+        if result['passed']:
+            similarity = self._recheck(tokens, since)
+            if similarity is not None:
+                self.rechecked_duplicates += 1
+                result['passed'] = False
+                result['is_duplicate'] = True
+                result['reasons'] = [f"❌ تكرار: نص مكرر (تشابه: {similarity:.0%})"]
+            else:
+                self.add(tokens, signature)
+
+        self._trim()
+        return result
+
+    def _recheck(self, tokens: FrozenSet[int], since: int):
+        """
+        تشابه فوق الحد مع إضافة لم تكن في نسخة العامل (أو None)
+        """
+        for _, other, _ in self._log[since - self._base:]:
+            similarity = jaccard(tokens, other)
+            if similarity > self.index.threshold:
+                return similarity
+        return None
+
+    def add(self, tokens: FrozenSet[int], signature: Tuple[int, ...]) -> Hashable:
+        """
+        إضافة مدخل إلى الفهرس الأصلي وتسجيله لنسخ العمال
+        """
+        key = self.index.add_signature(tokens, signature)
+        self._log.append((key, tokens, signature))
+        return key
+
+    def stats(self) -> Dict:
+        return {
+            'workers': len(self._executors),
+            'offloaded': self.offloaded,
+            'rechecked_duplicates': self.rechecked_duplicates,
+            'fallbacks': self.fallbacks,
+            'pending_updates': len(self._log),
+        }
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
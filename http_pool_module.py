@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""
+مجمّع اتصالات HTTP المشترك
+Shared pooled async HTTP client for the LLM rewriters
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# حدود المجمّع: عدد الاتصالات المفتوحة الكلي ولكل مضيف
+POOL_LIMIT = 32
+POOL_LIMIT_PER_HOST = 16
+KEEPALIVE_TIMEOUT = 60
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    الحصول على جلسة HTTP المشتركة (تُنشأ مرة واحدة عند أول استخدام)
+
+    الجلسة تحتفظ بالاتصالات مفتوحة (keep-alive) وتعيد استخدامها بين الطلبات،
+    فلا يدفع كل طلب كلفة مصافحة TCP/TLS من جديد.
+    """
+    global _session
+
+    if _session is not None and not _session.closed:
+        return _session
+
+    async with _session_lock:
+        if _session is None or _session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            _session = aiohttp.ClientSession(connector=connector)
+            logger.info("🌐 تم إنشاء مجمّع اتصالات HTTP المشترك")
+
+    return _session
+
+
+async def close_http_session():
+    """
+    إغلاق جلسة HTTP المشتركة عند إيقاف البوت
+    """
+    global _session
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+مطابقة الكلمات المفتاحية في مرور واحد
+Single-pass multi-keyword matcher (Aho-Corasick automaton)
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+class KeywordHits:
+    """
+    نتيجة فحص نص واحد: لكل مجموعة (مثل 'ad' و 'trusted') الكلمات التي ظهرت ومواقعها
+    """
+
+    def __init__(self):
+        # مجموعة -> كلمة -> [مواقع البداية]
+        self.positions: Dict[str, Dict[str, List[int]]] = {}
+        self._weights: Dict[str, Dict[str, int]] = {}
+
+    def _add(self, group: str, keyword: str, weight: int, start: int):
+        self.positions.setdefault(group, {}).setdefault(keyword, []).append(start)
+        self._weights.setdefault(group, {})[keyword] = weight
+
+    def count(self, group: str) -> int:
+        """
+        عدد الكلمات المختلفة من القائمة التي ظهرت في النص
+        """
+        return sum(self._weights.get(group, {}).values())
+
+    def keywords(self, group: str) -> List[str]:
+        return list(self.positions.get(group, {}))
+
+    def occurrences(self, group: str) -> int:
+        """
+        العدد الكلي لمرات الظهور (مع التكرار)
+        """
+        return sum(len(p) for p in self.positions.get(group, {}).values())
+
+
+class KeywordMatcher:
+    """
+    آلة Aho-Corasick مبنية مرة واحدة من عدة قوائم كلمات. فحص النص يمر على
+    أحرفه مرة واحدة فقط مهما بلغ عدد الكلمات (مئات أو آلاف)، بدلاً من إعادة
+    مسح النص لكل كلمة.
+
+    المطابقة مطابقة جزئية (substring) كما في `keyword in text_lower`.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        # كل عقدة: انتقالات، رابط الفشل، والمخرجات [(مجموعة، كلمة، طول)]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int]]] = [[]]
+        self._weights: Dict[Tuple[str, str], int] = {}
+
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                pair = (group, keyword)
+                if pair in self._weights:
+                    self._weights[pair] += 1
+                    continue
+                self._weights[pair] = 1
+                self._insert(group, keyword)
+
+        self._build_failure_links()
+
+    def _insert(self, group: str, keyword: str):
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][char] = nxt
+            node = nxt
+        self._out[node].append((group, keyword, len(keyword)))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # مخرجات رابط الفشل تصبح جزءاً من مخرجات العقدة
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text: str) -> KeywordHits:
+        """
+        فحص النص (بعد lower) وإرجاع كل الكلمات التي ظهرت ومواقعها
+        """
+        hits = KeywordHits()
+        goto, fail, out, weights = self._goto, self._fail, self._out, self._weights
+
+        node = 0
+        for i, char in enumerate(text.lower()):
+            nxt = goto[node].get(char)
+            while nxt is None and node:
+                node = fail[node]
+                nxt = goto[node].get(char)
+            node = nxt or 0
+            outputs = out[node]
+            if outputs:
+                for group, keyword, length in outputs:
+                    hits._add(group, keyword, weights[(group, keyword)], i - length + 1)
+
+        return hits
+
+    def __len__(self) -> int:
+        return len(self._weights)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+"""
+معجم الكلمات: ملف بيانات مُصدَّر يُجمع مرة واحدة ويُحفظ مجمعاً على القرص
+Versioned lexicon file compiled into a keyword automaton and synonym table, cached by content hash
+"""
+
+import os
+import json
+import pickle
+import signal
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from arabic_module import strip_diacritics, word_key
+from keyword_matcher_module import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicon.json')
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.lexicon_cache')
+
+# يُرفع عند تغيير شكل Lexicon أو طريقة التجميع لإبطال الملفات المجمعة السابقة
+COMPILER_VERSION = 3
+
+
+def _unique(words: Iterable[str]) -> Tuple[str, ...]:
+    """
+    الكلمات دون تكرار وبترتيبها (مع حذف الفارغ)
+    """
+    return tuple(dict.fromkeys(word.strip() for word in words if word and word.strip()))
+
+
+class Lexicon:
+    """
+    معجم مجمع وغير قابل للتعديل: قوائم الكلمات بلا تكرار، آلة Aho-Corasick
+    لمجموعتي 'ad' و'trusted'، وجدول المرادفات (كلمة -> مرادفات بلا تكرار).
+
+    الآلة ومفاتيح المرادفات بالشكل الذي يُبحث به في النص (arabic_module:
+    الكلمات دون تشكيل، والمفاتيح مطبّعة)، والقوائم نفسها تبقى كما كُتبت في الملف.
+
+    يُستبدل كاملاً عند إعادة التحميل (إسناد واحد) ولا يُعدل في مكانه، فمن
+    يحمل مرجعاً إليه يكمل عمله بالنسخة نفسها.
+    """
+
+    def __init__(self, data: Dict, digest: str = None):
+        self.version = data.get('version', 0)
+        self.ad_keywords = _unique(data.get('ad_keywords', ()))
+        self.trusted_keywords = _unique(data.get('trusted_keywords', ()))
+        # أسماء الأماكن: قصتان بالصياغة نفسها في مدينتين مختلفتين لا تُدمجان
+        self.places = _unique(data.get('places', ()))
+        self.synonyms: Dict[str, Tuple[str, ...]] = {}
+        # الكلمة كما كُتبت في الملف لكل مفتاح مطبّع (لـ to_dict)
+        self._synonym_words: Dict[str, str] = {}
+        for word, synonyms in data.get('synonyms', {}).items():
+            synonyms = _unique(synonyms)
+            if synonyms:
+                key = word_key(word)[0]
+                self.synonyms[key] = synonyms
+                self._synonym_words[key] = word
+        self.digest = digest or _digest(json.dumps(self.to_dict(), ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+        # آلة مطابقة واحدة لكل القوائم (مرور واحد على النص دون تشكيل)
+        self.matcher = KeywordMatcher({
+            'ad': _unique(map(strip_diacritics, self.ad_keywords)),
+            'trusted': _unique(map(strip_diacritics, self.trusted_keywords)),
+        })
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': self.version,
+            'ad_keywords': list(self.ad_keywords),
+            'trusted_keywords': list(self.trusted_keywords),
+            'places': list(self.places),
+            'synonyms': {self._synonym_words[key]: list(synonyms) for key, synonyms in self.synonyms.items()},
+        }
+
+    def replace(self, **changes) -> 'Lexicon':
+        """
+        معجم جديد مجمع بعد استبدال بعض القوائم (مثلاً ad_keywords=[...])
+        """
+        data = self.to_dict()
+        data.update({key: value for key, value in changes.items() if value is not None})
+        return Lexicon(data)
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.sha256(raw + f"|compiler={COMPILER_VERSION}".encode()).hexdigest()[:16]
+
+
+def load_lexicon(path: str = DEFAULT_PATH, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Lexicon:
+    """
+    تحميل المعجم من ملف JSON
+
+    النسخة المجمعة تُحفظ في cache_dir باسم بصمة محتوى الملف، فتشغيل لاحق بالملف
+    نفسه يقرأ الآلة جاهزة بدل إعادة بنائها. تعذر الكتابة (قرص للقراءة فقط)
+    لا يمنع التحميل.
+
+    Raises:
+        OSError أو ValueError إذا تعذرت قراءة الملف أو كان JSON غير صالح
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = _digest(raw)
+
+    cache_path = os.path.join(cache_dir, f"lexicon-{digest}.pickle") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                lexicon = pickle.load(f)
+            if isinstance(lexicon, Lexicon) and lexicon.digest == digest:
+                return lexicon
+        except Exception as e:
+            logger.warning(f"⚠️ تعذرت قراءة المعجم المجمع {cache_path}: {str(e)}")
+
+    lexicon = Lexicon(json.loads(raw.decode('utf-8')), digest=digest)
+
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # كتابة ثم إعادة تسمية: لا يقرأ تشغيل آخر ملفاً نصف مكتوب
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(lexicon, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"⚠️ تعذر حفظ المعجم المجمع: {str(e)}")
+
+    return lexicon
+
+
+_default_lexicon: Optional[Lexicon] = None
+
+
+def default_lexicon() -> Lexicon:
+    """
+    المعجم الافتراضي (lexicon.json بجانب الوحدة)، يُحمّل مرة واحدة لكل العملية
+    """
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = load_lexicon()
+    return _default_lexicon
+
+
+class LexiconWatcher:
+    """
+    إعادة تحميل المعجم عند تغير الملف (فحص دوري لزمن التعديل) أو عند SIGHUP
+
+    المعجم الجديد يُجمع كاملاً ثم يُمرر إلى on_reload (الذي يستبدله بإسناد
+    واحد)، فلا تتوقف معالجة الرسائل. ملف غير صالح يُسجل ويبقى المعجم الحالي.
+    """
+
+    def __init__(self, path: str, on_reload: Callable[[Lexicon], None], current: Lexicon = None,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR, interval: float = 30.0):
+        self.path = path
+        self.on_reload = on_reload
+        self.current = current
+        self.cache_dir = cache_dir
+        self.interval = interval
+
+        self.reloads = 0
+        self._mtime = self._stat()
+        self._task: Optional[asyncio.Task] = None
+        self._signal = False
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """
+        إعادة التحميل الآن
+
+        Returns:
+            True إذا تغير المحتوى واستُبدل المعجم
+        """
+        self._mtime = self._stat()
+        try:
+            lexicon = load_lexicon(self.path, self.cache_dir)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ تعذر تحميل المعجم {self.path}: {str(e)} - يبقى المعجم الحالي")
+            return False
+
+        if self.current is not None and lexicon.digest == self.current.digest:
+            return False
+
+        self.on_reload(lexicon)
+        self.current = lexicon
+        self.reloads += 1
+        logger.info(
+            f"📚 تم تحميل المعجم (الإصدار {lexicon.version}، {lexicon.digest}): "
+            f"{len(lexicon.ad_keywords)} كلمة إعلانية، {len(lexicon.trusted_keywords)} موثوقة، "
+            f"{len(lexicon.synonyms)} مرادف"
+        )
+        return True
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+            self._signal = True
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # لا SIGHUP (Windows) أو ليست الحلقة في الخيط الرئيسي: الفحص الدوري فقط
+            pass
+
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._stat() != self._mtime:
+                self.reload()
+
+    async def stop(self):
+        if self._signal:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            self._signal = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
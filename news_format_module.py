@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+تجهيز النص لمزودي LLM وتوحيد شكل مخرجاتهم
+Shared prompts, source stripping and output cleanup for every LLM provider
+"""
+
+import re
+
+# موجه النظام لكل المزودين: أي مزود يختاره الموجه ينشر بالشكل نفسه
+SYSTEM_PROMPT = (
+    "أنت محرر نصوص احترافي متخصص في إعادة الصياغة. أعد صياغة النص بأسلوب احترافي مع الحفاظ على "
+    "المعنى الأصلي. غير الأسلوب والتراكيب بشكل واضح. تذكر: ترامب هو الرئيس الحالي للولايات المتحدة "
+    "(2025)، ورئيس سوريا اسمه احمد الشرع، ورئيس الوزراء العراقي الحالي هو محمد شياع السوداني. "
+    "لا تذكر مصادر الأخبار أو المراسلين أو الوكالات في النص المعاد صياغته."
+)
+
+
+def remove_source_info(text: str) -> str:
+    """
+    إزالة بيانات المصدر من النص
+    """
+    # Remove source mentions at the beginning
+    # e.g., "عاجل | مصدر عسكري لبناني مسؤول للجزيرة:"
+    # e.g., "عاجل | واشنطن بوست عن مصادر:"
+    text = re.sub(r'^عاجل\s*\|\s*[^:]+:\s*', '', text)
+    text = re.sub(r'^عاجل\s*\|\s*[^|]+\|\s*', '', text)
+
+    # Remove source mentions in parentheses
+    text = re.sub(r'\([^)]*(?:مصدر|مراسل|وكالة)[^)]*\)', '', text)
+
+    # Remove lines that are purely source attribution
+    source_keywords = [
+        'مصدر للحدث',
+        'مراسل الحدث',
+        'مصدر عسكري',
+        'مصدر دبلوماسي',
+        'مصدر أمني',
+        'مراسل',
+        'وكالة',
+        'تقرير من',
+        'حسب',
+        'وفقاً لـ',
+        'بحسب',
+        'بناءً على',
+        'عن مصادر',
+        'عن مصدر',
+        'مسؤول ل',
+        'مسؤول في',
+    ]
+
+    lines = text.split('\n')
+    filtered_lines = []
+
+    for line in lines:
+        should_skip = False
+        # Skip lines that contain source keywords
+        for keyword in source_keywords:
+            if keyword in line:
+                should_skip = True
+                break
+
+        # Skip lines that are just source attribution
+        if re.match(r'^[^:]*(?:مصدر|مراسل|وكالة)[^:]*:\s*$', line):
+            should_skip = True
+
+        if not should_skip and line.strip():
+            filtered_lines.append(line)
+
+    result = '\n'.join(filtered_lines).strip()
+    # Clean up extra spaces
+    result = re.sub(r'\s+', ' ', result)
+    return result
+
+
+def create_prompt(text: str, style: str) -> str:
+    """
+    الطلب (prompt) بحسب الأسلوب
+    """
+    if style == 'professional':
+        return f"""أعد صياغة النص التالي بأسلوب احترافي وموضوعي مع تغيير الكلمات والتراكيب بشكل واضح:
+
+النص الأصلي:
+{text}
+
+المتطلبات:
+1. غير الأسلوب والتراكيب بشكل واضح وملحوظ
+2. احتفظ بالمعنى الأصلي تماماً
+3. لا تضيف معلومات جديدة
+4. اجعل النص أكثر وضوحاً واحترافية
+5. استخدم مرادفات مختلفة للكلمات الرئيسية
+
+أعد الصياغة مباشرة بدون تعليقات أو مقدمات مثل \"النسخة المعدلة:\":"""
+
+    elif style == 'casual':
+        return f"""أعد صياغة النص التالي بأسلوب بسيط وسهل مع تغيير الكلمات:
+
+النص الأصلي:
+{text}
+
+المتطلبات:
+1. استخدم كلمات بسيطة وسهلة
+2. احتفظ بالمعنى الأصلي
+3. غير التراكيب بشكل واضح
+
+أعد الصياغة مباشرة بدون تعليقات أو مقدمات مثل \"النسخة المعدلة:\":"""
+
+    else:  # formal
+        return f"""أعد صياغة النص التالي بأسلوب رسمي وفخم مع تغيير الكلمات والتراكيب:
+
+النص الأصلي:
+{text}
+
+المتطلبات:
+1. استخدم لغة رسمية وفخمة
+2. احتفظ بالمعنى الأصلي
+3. غير التراكيب بشكل واضح
+
+أعد الصياغة مباشرة بدون تعليقات أو مقدمات مثل \"النسخة المعدلة:\":"""
+
+
+def clean_output(rewritten_text: str) -> str:
+    """
+    تنظيف نص النموذج (كاملاً أو جزءاً مبثوثاً منه) وإضافة بادئة العاجل
+    """
+    rewritten_text = rewritten_text.strip()
+    # Post-processing to clean up the output
+    rewritten_text = rewritten_text.replace("النسخة المعدلة:", "").strip()
+    rewritten_text = rewritten_text.replace("تابعنا على @AjeelNewsIq", "").strip()
+    if not rewritten_text.startswith("🔴 عاجل | "):
+        rewritten_text = "🔴 عاجل | " + rewritten_text
+    return rewritten_text
@@ -6,9 +6,14 @@ OpenAI-based Text Rewriting System
 """
 
 import os
+import asyncio
+import time
 import logging
-import requests
-from typing import Dict, Tuple
+import aiohttp
+from typing import Dict, Optional, Tuple
+from http_pool_module import get_http_session
+from breaker_module import CircuitBreaker
+from news_format_module import SYSTEM_PROMPT, clean_output, create_prompt, remove_source_info
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +22,104 @@ class OpenAIRewriter:
     نظام صياغة متقدم باستخدام OpenAI API
     """
     
-    def __init__(self):
+    # تُرفع عند تغيير نص الـ prompt أو المعالجة اللاحقة لإبطال الصياغات المحفوظة
+    prompt_version = '2'
+    
+    def __init__(self, cache=None):
+        self.cache = cache  # RewriteCache اختيارية أمام استدعاءات API
         self.api_key = os.getenv('OPENAI_API_KEY', '')
+        self.models_url = "https://api.openai.com/v1/models"
         self.api_url = "https://api.openai.com/v1/chat/completions"
         self.model = "gpt-3.5-turbo"
+        self.timeout = 10
+        # قاطع الدائرة: self.timeout هو الحد الأعلى للمهلة التكيفية
+        self.breaker = CircuitBreaker('OpenAI', max_timeout=self.timeout, probe_fn=self.aprobe)
         
         if not self.api_key:
             logger.warning("⚠️ OpenAI API Key غير محدد!")
     
+    def _cache_lookup(self, text: str, style: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        البحث في الذاكرة المؤقتة قبل استدعاء API
+        
+        Returns:
+            (مفتاح الذاكرة المؤقتة، الصياغة المحفوظة أو None)
+        """
+        key = self._cache_key(text, style)
+        if key is None:
+            return None, None
+        return key, self.cache.get(key)
+    
+    def _cache_key(self, text: str, style: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.make_key(text, style, self.model, self.prompt_version)
+    
+    def _cache_store(self, key: Optional[str], rewritten_text: str):
+        if key is not None:
+            self.cache.put(key, rewritten_text)
+    
+    async def aprobe(self) -> bool:
+        """
+        فحص خفيف لتوفر OpenAI (قائمة النماذج، دون توليد نص)
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        session = await get_http_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with session.get(self.models_url, headers=headers, timeout=timeout) as response:
+            return response.status == 200
+    
+    def lookup_cache(self, text: str, style: str = 'professional') -> Optional[str]:
+        """
+        الصياغة المحفوظة للنص إن وجدت (دون استدعاء API)
+        """
+        return self._cache_lookup(text, style)[1]
+    
+    def cache_key(self, text: str, style: str = 'professional') -> Optional[str]:
+        """
+        مفتاح النص في الذاكرة المؤقتة لهذا المزود (None بلا ذاكرة مؤقتة)
+        """
+        return self._cache_key(text, style)
+    
+    def _build_request(self, text: str, style: str) -> Tuple[Dict, Dict]:
+        """
+        بناء ترويسات وحمولة طلب OpenAI (مشتركة بين المسار المتزامن وغير المتزامن)
+        """
+        # إزالة بيانات المصدر أولاً (كما في كل المزودين)
+        text_without_source = remove_source_info(text)
+        
+        # إنشاء الـ prompt
+        prompt = create_prompt(text_without_source, style)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+        
+        return headers, payload
+    
+    def _postprocess(self, result: Dict) -> str:
+        """
+        استخراج النص من استجابة OpenAI وتنظيفه (بشكل منشورات المزودين الآخرين نفسه)
+        """
+        return clean_output(result['choices'][0]['message']['content'])
+    
     def rewrite(self, text: str, style: str = 'professional') -> Tuple[str, bool]:
         """
         إعادة صياغة النص باستخدام OpenAI API
@@ -36,85 +131,103 @@ class OpenAIRewriter:
         Returns:
             (النص المعاد صياغته، هل نجح)
         """
+        cache_key, cached = self._cache_lookup(text, style)
+        if cached is not None:
+            logger.info("♻️ صياغة محفوظة مسبقاً (دون استدعاء OpenAI)")
+            return cached, True
+        
         if not self.api_key:
             logger.warning("⚠️ لا يمكن استخدام OpenAI API بدون API Key")
             return text, False
         
+        # القاطع مفتوح: البديل المحلي فوراً دون انتظار مهلة
+        if not self.breaker.allow():
+            logger.info("🔌 OpenAI متوقف مؤقتاً (القاطع مفتوح) - الانتقال للبديل")
+            return text, False
+        
         try:
-            # إنشاء الـ prompt
-            prompt = self._create_prompt(text, style)
-            
-            # إرسال الطلب إلى OpenAI
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            headers, payload = self._build_request(text, style)
             
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "أنت محرر نصوص احترافي متخصص في إعادة الصياغة. أعد صياغة النص بأسلوب احترافي مع الحفاظ على المعنى الأصلي."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 1000
-            }
+            # المسار المتزامن وحده يحتاج requests: لا يُستورد عند بدء البوت
+            import requests
             
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=10)
+            # إرسال الطلب إلى OpenAI
+            started = time.monotonic()
+            response = requests.post(self.api_url, json=payload, headers=headers, timeout=self.breaker.timeout())
             
             if response.status_code == 200:
-                result = response.json()
-                rewritten_text = result['choices'][0]['message']['content'].strip()
+                self.breaker.record(True, time.monotonic() - started)
+                rewritten_text = self._postprocess(response.json())
+                self._cache_store(cache_key, rewritten_text)
                 logger.info("✨ تمت إعادة الصياغة بنجاح عبر OpenAI!")
                 return rewritten_text, True
             else:
+                self.breaker.record(False)
                 error_msg = f"خطأ OpenAI: {response.status_code} - {response.text}"
                 logger.error(f"❌ {error_msg}")
                 return text, False
         
         except Exception as e:
+            self.breaker.record(False)
             logger.error(f"❌ خطأ في الاتصال بـ OpenAI: {str(e)}")
             return text, False
     
-    def _create_prompt(self, text: str, style: str) -> str:
+    async def arewrite(self, text: str, style: str = 'professional',
+                       cache_lookup: bool = True) -> Tuple[str, bool]:
         """
-        إنشاء prompt لـ OpenAI
+        إعادة صياغة النص باستخدام OpenAI API بشكل غير متزامن (عبر جلسة HTTP المشتركة)
+        
+        cache_lookup=False يتخطى البحث في الذاكرة المؤقتة (حين يكون المستدعي
+        قد بحث فيها مسبقاً) مع حفظ الصياغة الناجحة فيها كالمعتاد.
+        
+        Returns:
+            (النص المعاد صياغته، هل نجح)
         """
-        if style == 'professional':
-            return f"""أعد صياغة النص التالي بأسلوب احترافي وموضوعي مع تغيير الكلمات والتراكيب بشكل بسيط:
-
-النص الأصلي:
-{text}
-
-المتطلبات:
-1. غير الأسلوب والتراكيب بشكل بسيط
-2. احتفظ بالمعنى الأصلي تماماً
-3. لا تضيف معلومات جديدة
-4. اجعل النص أكثر وضوحاً واحترافية
-
-أعد الصياغة مباشرة بدون تعليقات:"""
+        if cache_lookup:
+            cache_key, cached = self._cache_lookup(text, style)
+            if cached is not None:
+                logger.info("♻️ صياغة محفوظة مسبقاً (دون استدعاء OpenAI)")
+                return cached, True
+        else:
+            cache_key = self._cache_key(text, style)
         
-        elif style == 'casual':
-            return f"""أعد صياغة النص التالي بأسلوب بسيط وسهل:
-
-النص الأصلي:
-{text}
-
-أعد الصياغة مباشرة بدون تعليقات:"""
+        if not self.api_key:
+            logger.warning("⚠️ لا يمكن استخدام OpenAI API بدون API Key")
+            return text, False
         
-        else:  # formal
-            return f"""أعد صياغة النص التالي بأسلوب رسمي وفخم:
-
-النص الأصلي:
-{text}
-
-أعد الصياغة مباشرة بدون تعليقات:"""
+        # القاطع مفتوح: البديل المحلي فوراً دون انتظار مهلة
+        if not self.breaker.allow():
+            logger.info("🔌 OpenAI متوقف مؤقتاً (القاطع مفتوح) - الانتقال للبديل")
+            return text, False
+        
+        try:
+            headers, payload = self._build_request(text, style)
+            
+            session = await get_http_session()
+            request_timeout = self.breaker.timeout()
+            timeout = aiohttp.ClientTimeout(total=request_timeout)
+            started = time.monotonic()
+            async with session.post(self.api_url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status == 200:
+                    self.breaker.record(True, time.monotonic() - started)
+                    rewritten_text = self._postprocess(await response.json())
+                    self._cache_store(cache_key, rewritten_text)
+                    logger.info("✨ تمت إعادة الصياغة بنجاح عبر OpenAI!")
+                    return rewritten_text, True
+                
+                self.breaker.record(False)
+                error_msg = f"خطأ OpenAI: {response.status} - {await response.text()}"
+                logger.error(f"❌ {error_msg}")
+                return text, False
+        
+        except asyncio.TimeoutError:
+            self.breaker.record_timeout(request_timeout)
+            logger.error(f"❌ انتهت مهلة الاتصال بـ OpenAI ({request_timeout:.1f}s)")
+            return text, False
+        except Exception as e:
+            self.breaker.record(False)
+            logger.error(f"❌ خطأ في الاتصال بـ OpenAI: {str(e)}")
+            return text, False
     
     def get_rewrite_stats(self, original: str, rewritten: str) -> Dict:
         """
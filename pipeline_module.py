@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+"""
+خط المعالجة المرحلي
+Staged news pipeline with bounded queues between ingest, filter, rewrite and publish
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+from typing import Callable, Dict, List, Optional
+from scheduler_module import PriorityStageQueue
+
+logger = logging.getLogger(__name__)
+
+
+class NewsItem:
+    """
+    رسالة واحدة أثناء مرورها عبر مراحل الخط
+    """
+
+    def __init__(self, text: str, channel_name: str = '', priority: int = 999,
+                 chat_id: int = None, message_id: int = None, message_date=None):
+        self.text = text
+        self.channel_name = channel_name
+        self.priority = priority
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.message_date = message_date
+        self.received_at = time.monotonic()
+        # مصدر الرسالة: live (حية)، backfill (مسترجعة بعد توقف)، replay (مستأنفة من صندوق الصادر)
+        self.origin = 'live'
+
+        # تُملأ أثناء المرور بالمراحل
+        self.filter_result = None
+        self.rewritten = None
+        self.rewrite_stats = None
+        self.result = None
+        self.cluster_id = None
+        self.story_key = None
+        # سبب تخطي الرسالة عمداً (مثلاً حلت محلها رسالة أعلى أولوية من القصة نفسها)
+        self.skip_reason = None
+        # الرسالة المنشورة مبكراً أثناء بث الصياغة (مرحلة النشر لا تعيد نشرها)
+        self.message = None
+        # رسائل منخفضة الأولوية سُحبت من طابور النشر لتُنشر مع هذه في موجز واحد
+        self.digest: List['NewsItem'] = []
+
+
+class NewsPipeline:
+    """
+    خط معالجة من أربع مراحل تفصل بينها طوابير محدودة السعة:
+
+        ingest → filter → rewrite → publish
+
+    لكل مرحلة عدد عمال مستقل. امتلاء طابور مرحلة لاحقة يوقف المرحلة السابقة
+    (backpressure)، وعند امتلاء طابور الاستقبال تُسقط الرسائل الجديدة مع تسجيل ذلك
+    بدلاً من تراكمها بلا حد.
+
+    طابورا الصياغة والنشر طوابير أولويات (PriorityStageQueue): رسائل القنوات
+    الأعلى أولوية تحصل على أول استدعاء LLM وأول فرصة نشر متاحة، مع تقادم يمنع
+    حرمان القنوات الأدنى، وموعد نهائي اختياري تُسقط بعده الرسالة القديمة.
+
+    عند تراكم طابور النشر تُدمج رسائل الأولوية المنخفضة المنتظرة في منشور
+    موجز واحد (digest_backlog)، فلا يتأخر ما بعدها خلف حدود معدل النشر.
+
+    دوال المراحل تستقبل NewsItem وتعيد True للمتابعة أو False لإيقاف الرسالة:
+        filter_fn  - متزامنة (عمل حسابي على المعالج)
+        rewrite_fn - غير متزامنة (استدعاء LLM)
+        publish_fn - غير متزامنة (الإرسال إلى Telegram)
+
+    drop_fn (اختيارية) تُستدعى لكل رسالة يُسقطها الخط نفسه دون أن تقرر ذلك
+    دالة مرحلة: انتهاء موعدها النهائي في الطابور أو خطأ غير متوقع في المرحلة
+    (مع رسائل الموجز المضمومة إليها)، ليُسجل صندوق الصادر إسقاطها.
+    """
+
+    STAGES = ('ingest', 'filter', 'rewrite', 'publish')
+
+    def __init__(self, filter_fn: Callable, rewrite_fn: Callable, publish_fn: Callable,
+                 filter_workers: int = 1, rewrite_workers: int = 4, publish_workers: int = 1,
+                 queue_size: int = 100, publish_interval: float = 1.0,
+                 report_interval: float = 30.0, aging_step: float = 30.0,
+                 deadlines: Optional[Dict[int, float]] = None,
+                 digest_backlog: int = 0, digest_min_priority: int = 3,
+                 digest_max_items: int = 5, drop_fn: Optional[Callable] = None):
+        self.filter_fn = filter_fn
+        self.rewrite_fn = rewrite_fn
+        self.publish_fn = publish_fn
+        self.drop_fn = drop_fn
+
+        self.workers = {
+            'filter': filter_workers,
+            'rewrite': rewrite_workers,
+            'publish': publish_workers,
+        }
+        self.queue_size = queue_size
+        self.publish_interval = publish_interval
+        self.report_interval = report_interval
+        self.aging_step = aging_step
+        self.deadlines = deadlines or {}
+        # عند تجاوز طابور النشر digest_backlog رسالة تُدمج رسائل الأولوية
+        # digest_min_priority فأدنى في منشور واحد (0 = معطل)
+        self.digest_backlog = digest_backlog
+        self.digest_min_priority = digest_min_priority
+        self.digest_max_items = digest_max_items
+
+        # طابور المدخلات لكل مرحلة: ingest يغذي filter، وهكذا
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.in_flight = {stage: 0 for stage in self.STAGES[1:]}
+        self.counters = {
+            'received': 0,
+            'dropped': 0,
+            'rejected': 0,
+            'rewritten': 0,
+            'published': 0,
+            'failed': 0,
+            'expired': 0,
+            'skipped': 0,
+            'digested': 0,
+        }
+
+        self._tasks: List[asyncio.Task] = []
+        self._publish_lock = asyncio.Lock()
+        self._last_publish = 0.0
+
+    # ------------------------------------------------------------------
+    # دورة الحياة
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """
+        إنشاء الطوابير وتشغيل عمال جميع المراحل
+        """
+        self.queues = {
+            'filter': asyncio.Queue(maxsize=self.queue_size),
+            'rewrite': PriorityStageQueue(self.queue_size, self.aging_step, deadlines=self.deadlines),
+            'publish': PriorityStageQueue(self.queue_size, self.aging_step, deadlines=self.deadlines),
+        }
+
+        for stage, count in self.workers.items():
+            for i in range(max(1, count)):
+                task = asyncio.create_task(self._worker(stage), name=f"{stage}-{i}")
+                self._tasks.append(task)
+
+        if self.report_interval:
+            self._tasks.append(asyncio.create_task(self._reporter(), name="pipeline-reporter"))
+
+        logger.info(
+            f"🏭 خط المعالجة يعمل: فلترة×{self.workers['filter']}، "
+            f"صياغة×{self.workers['rewrite']}، نشر×{self.workers['publish']} "
+            f"(سعة الطابور: {self.queue_size})"
+        )
+
+    async def stop(self):
+        """
+        إيقاف جميع العمال
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        """
+        انتظار تفريغ جميع الطوابير (مفيد للاختبار وإعادة التشغيل)
+        """
+        for stage in self.STAGES[1:]:
+            await self.queues[stage].join()
+
+    # ------------------------------------------------------------------
+    # الاستقبال
+    # ------------------------------------------------------------------
+
+    def submit(self, item: NewsItem) -> bool:
+        """
+        مرحلة الاستقبال: إدخال رسالة جديدة إلى الخط دون انتظار
+
+        Returns:
+            False إذا كان الطابور ممتلئاً وأُسقطت الرسالة
+        """
+        self.counters['received'] += 1
+        try:
+            self.queues['filter'].put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.counters['dropped'] += 1
+            logger.warning(
+                f"🚧 طابور الاستقبال ممتلئ ({self.queue_size})، تم إسقاط رسالة من {item.channel_name}"
+            )
+            return False
+
+    async def resume(self, item: NewsItem, stage: str):
+        """
+        إعادة رسالة إلى الخط من مرحلة محددة (استئناف رسائل لم تكتمل قبل إعادة التشغيل)
+
+        على عكس submit تنتظر مكاناً في الطابور بدلاً من إسقاط الرسالة.
+        """
+        self.counters['received'] += 1
+        await self.queues[stage].put(item)
+
+    def requeue(self, item: NewsItem, stage: str) -> bool:
+        """
+        إعادة رسالة إلى مرحلة دون انتظار مكان في طابورها (من داخل عامل مرحلة
+        لاحقة، حيث قد يوقف الانتظار الطوابير بعضها بعضاً)
+
+        Returns:
+            False إذا كان الطابور ممتلئاً ولم تُعد الرسالة
+        """
+        try:
+            self.queues[stage].put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    # ------------------------------------------------------------------
+    # العمال
+    # ------------------------------------------------------------------
+
+    async def _worker(self, stage: str):
+        queue = self.queues[stage]
+
+        while True:
+            item = await queue.get()
+            self.in_flight[stage] += 1
+            try:
+                if stage != 'filter' and queue.is_expired(item):
+                    self.counters['expired'] += 1
+                    logger.warning(
+                        f"⌛ تم إسقاط رسالة قديمة من {item.channel_name} "
+                        f"(الأولوية: {item.priority}) قبل مرحلة {stage}"
+                    )
+                    self._drop(item)
+
+                elif stage == 'filter':
+                    passed = self.filter_fn(item)
+                    if inspect.isawaitable(passed):
+                        passed = await passed
+                    if passed:
+                        await self.queues['rewrite'].put(item)
+                    else:
+                        self.counters['rejected'] += 1
+
+                elif stage == 'rewrite':
+                    if await self.rewrite_fn(item):
+                        self.counters['rewritten'] += 1
+                        await self.queues['publish'].put(item)
+                    elif item.skip_reason:
+                        self.counters['skipped'] += 1
+                    else:
+                        self.counters['failed'] += 1
+
+                else:
+                    self._collect_digest(item, queue)
+                    if item.message is None:
+                        await self.throttle_publish()
+                    if await self.publish_fn(item):
+                        self.counters['published'] += 1
+                    else:
+                        self.counters['failed'] += 1
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"❌ خطأ في مرحلة {stage}: {str(e)}")
+                for dropped in [item] + item.digest:
+                    self._drop(dropped)
+            finally:
+                self.in_flight[stage] -= 1
+                queue.task_done()
+
+    def _drop(self, item: NewsItem):
+        if self.drop_fn is None:
+            return
+        try:
+            self.drop_fn(item)
+        except Exception as e:
+            logger.error(f"❌ خطأ في تسجيل إسقاط الرسالة: {str(e)}")
+
+    def _collect_digest(self, item: NewsItem, queue):
+        """
+        عند تراكم طابور النشر: ضم رسائل منخفضة الأولوية منتظرة إلى هذه الرسالة
+        """
+        if (not self.digest_backlog or item.message is not None
+                or item.priority < self.digest_min_priority
+                or queue.qsize() < self.digest_backlog):
+            return
+
+        item.digest = queue.drain(
+            lambda other: (other.priority >= self.digest_min_priority and other.message is None
+                           and not queue.is_expired(other)),
+            self.digest_max_items - 1,
+        )
+        if item.digest:
+            self.counters['digested'] += len(item.digest)
+            logger.info(f"🗞️ طابور النشر متراكم ({queue.qsize()}) - دمج {len(item.digest) + 1} أخبار في موجز")
+
+    async def throttle_publish(self):
+        """
+        الحفاظ على حد أدنى من الزمن بين عمليتي نشر متتاليتين
+
+        تستدعيها مرحلة النشر، وأيضاً مرحلة الصياغة قبل النشر المبكر أثناء البث.
+        """
+        async with self._publish_lock:
+            wait = self._last_publish + self.publish_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_publish = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # المراقبة
+    # ------------------------------------------------------------------
+
+    def queue_depths(self) -> Dict[str, int]:
+        """
+        عمق كل طابور (عدد الرسائل المنتظرة قبل المرحلة)
+        """
+        return {stage: queue.qsize() for stage, queue in self.queues.items()}
+
+    def stats(self) -> Dict:
+        """
+        لقطة من حالة الخط: أعماق الطوابير، الرسائل قيد المعالجة، والعدادات
+        """
+        return {
+            'queue_depths': self.queue_depths(),
+            'in_flight': dict(self.in_flight),
+            'counters': dict(self.counters),
+        }
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            depths = self.queue_depths()
+            if any(depths.values()) or any(self.in_flight.values()):
+                logger.info(
+                    "📊 الطوابير: "
+                    + "، ".join(f"{stage}={depth}" for stage, depth in depths.items())
+                    + " | قيد المعالجة: "
+                    + "، ".join(f"{stage}={n}" for stage, n in self.in_flight.items())
+                )
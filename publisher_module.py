@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+ناشر قناة الوجهة: تحديد المعدل واحترام FloodWait
+Token-bucket rate-limited publisher with FloodWait-aware retries
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from telethon.errors import FloodWaitError
+
+logger = logging.getLogger(__name__)
+
+# حد طول رسالة Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TokenBucket:
+    """
+    دلو رموز: rate رمز في الثانية بسعة burst؛ كل منشور يستهلك رمزاً
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """
+        انتظار رمز متاح (بترتيب الوصول)
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class Publisher:
+    """
+    يرسل المنشورات عبر send_fn(text) بمعدل لا يتجاوز حدود Telegram.
+
+    - FloodWaitError: يتوقف النشر كله (كل العمال) طوال المدة المطلوبة ثم
+      يُعاد الإرسال، فلا تضيع الرسالة ويتراكم الباقي في طابور النشر
+    - الأخطاء الأخرى: إعادة المحاولة max_retries مرة بتأخير أسي مع jitter
+    """
+
+    def __init__(self, send_fn: Callable[[str], Awaitable], rate_per_minute: float = 20,
+                 burst: int = 3, max_retries: int = 3, retry_base: float = 1.0,
+                 max_flood_waits: int = 5):
+        self.send_fn = send_fn
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.max_flood_waits = max_flood_waits
+
+        self.paused_until = 0.0
+        self.flood_waits = 0
+        self.retries = 0
+
+    async def _wait_if_paused(self):
+        while True:
+            wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def _pause(self, seconds: float):
+        # jitter صغير حتى لا يعود كل العمال في اللحظة نفسها
+        until = time.monotonic() + seconds + random.uniform(0, 1)
+        self.paused_until = max(self.paused_until, until)
+
+    async def send(self, text: str) -> Optional[object]:
+        """
+        نشر رسالة مع احترام المعدل وFloodWait
+
+        Returns:
+            الرسالة المنشورة، أو None بعد استنفاد المحاولات
+        """
+        failures = 0
+        flood_waits = 0
+
+        while True:
+            await self._wait_if_paused()
+            await self.bucket.acquire()
+            # قد يبدأ توقف جديد أثناء انتظار الرمز
+            await self._wait_if_paused()
+
+            try:
+                return await self.send_fn(text)
+
+            except FloodWaitError as e:
+                flood_waits += 1
+                self.flood_waits += 1
+                if flood_waits > self.max_flood_waits:
+                    logger.error(f"❌ FloodWait متكرر ({flood_waits} مرات) - التخلي عن الرسالة")
+                    return None
+                logger.warning(f"🌊 FloodWait: إيقاف النشر {e.seconds}s ثم إعادة الإرسال")
+                self._pause(e.seconds)
+
+            except Exception as e:
+                failures += 1
+                if failures > self.max_retries:
+                    logger.error(f"❌ خطأ في الإرسال بعد {failures} محاولات: {str(e)}")
+                    return None
+                self.retries += 1
+                delay = self.retry_base * 2 ** (failures - 1)
+                delay += random.uniform(0, delay)
+                logger.warning(f"⚠️ خطأ في الإرسال ({str(e)}) - إعادة المحاولة بعد {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+def build_digest(texts: List[str], header: str = '', footer: str = '',
+                 limit: int = MAX_MESSAGE_LENGTH) -> str:
+    """
+    دمج عدة أخبار في منشور واحد لا يتجاوز limit حرفاً (يُقتطع كل خبر بالتساوي عند الحاجة)
+    """
+    separator = '\n\n'
+    bullet = '▪️ '
+    fixed = len(header) + len(footer) + (len(separator) + len(bullet)) * (len(texts) + 1)
+    budget = max(1, (limit - fixed) // max(1, len(texts)))
+
+    entries = []
+    for text in texts:
+        text = text.strip()
+        if len(text) > budget:
+            text = text[:budget - 1].rstrip() + '…'
+        entries.append(bullet + text)
+
+    return separator.join(part for part in [header, *entries, footer] if part)
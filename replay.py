@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+إعادة تشغيل سجل رسائل مسجل عبر خط معالجة البوت الكامل دون اتصال
+Offline replay of a recorded message log through the full bot pipeline
+
+سطر السجل (JSONL): {"channel": "AjaNews", "timestamp": "2025-06-01T08:00:00+00:00", "text": "..."}
+(timestamp نص ISO أو ثوانٍ منذ epoch، وid اختياري)
+
+    python replay.py busy_day.jsonl --speed 10
+    python replay.py busy_day.jsonl --speed max
+    python replay.py --synthetic 2000 --write-log synthetic.jsonl --speed 60
+
+الزمن مضغوط بمعامل السرعة: الفواصل بين الرسائل وزمن رد LLM وحدود النشر
+ونافذة القصص كلها مقسومة على speed، والأزمنة المقيسة مضروبة فيه (ثوانٍ
+افتراضية قابلة للمقارنة مع اليوم المسجل). عمل المعالج (الفلترة والصياغة
+المحلية) لا يُضغط، فيظهر أين ينفد الهامش. في وضع max تُغذى الرسائل بأسرع ما
+يستوعبه الخط، وتُلغى حدود النشر، والأزمنة بالثواني الفعلية.
+"""
+
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from benchmark import MockLLMServer, load_bot, reset_bot, summarize
+from corpus_module import SyntheticCorpus
+from dedup_module import MinHashLSHIndex
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# السجل
+# ============================================================================
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    date = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def load_log(path: str) -> List[Dict]:
+    """
+    قراءة سجل JSONL مرتباً بالتاريخ مع offset (ثوانٍ منذ أول رسالة)
+    """
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            records.append({
+                'channel': row['channel'],
+                'date': _parse_timestamp(row['timestamp']),
+                'text': row['text'],
+                'id': row.get('id'),
+            })
+
+    records.sort(key=lambda record: record['date'])
+    if records:
+        start = records[0]['date']
+        for record in records:
+            record['offset'] = (record['date'] - start).total_seconds()
+    return records
+
+
+def synthetic_log(count: int, seed: int, rate_per_minute: float) -> List[Dict]:
+    """
+    سجل اصطناعي من SyntheticCorpus بالشكل نفسه
+    """
+    start = datetime.now(timezone.utc).replace(microsecond=0)
+    return [
+        {
+            'channel': message['channel'],
+            'date': start + timedelta(seconds=message['offset']),
+            'text': message['text'],
+            'id': message['id'],
+            'offset': message['offset'],
+        }
+        for message in SyntheticCorpus(seed).generate(count, rate_per_minute=rate_per_minute)
+    ]
+
+
+def write_log(records: List[Dict], path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps({
+                'channel': record['channel'],
+                'timestamp': record['date'].isoformat(),
+                'text': record['text'],
+                'id': record['id'],
+            }, ensure_ascii=False) + '\n')
+
+
+# ============================================================================
+# عميل Telethon وهمي
+# ============================================================================
+
+class FakeMessage:
+    def __init__(self, message_id: int, text: str, date: datetime):
+        self.id = message_id
+        self.text = text
+        self.date = date
+
+
+class FakeChat:
+    def __init__(self, chat_id: int, title: str):
+        self.id = chat_id
+        self.title = title
+        self.username = title
+
+
+class FakeEvent:
+    """
+    ما يقرؤه handle_new_message من events.NewMessage
+    """
+
+    def __init__(self, message: FakeMessage, chat: FakeChat):
+        self.message = message
+        self.chat_id = chat.id
+        self._chat = chat
+
+    async def get_chat(self):
+        return self._chat
+
+
+class FakeClient:
+    """
+    بديل TelegramClient: يسجل المنشورات والتعديلات بعد زمن إرسال ثابت
+    """
+
+    def __init__(self, send_latency: float = 0.0):
+        self.send_latency = send_latency
+        self.sent: List[str] = []
+        self.edits = 0
+        self._ids = itertools.count(1)
+
+    async def send_message(self, entity, text: str):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent.append(text)
+        return FakeMessage(next(self._ids), text, datetime.now(timezone.utc))
+
+    async def edit_message(self, entity, message, text: str):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.edits += 1
+        message.text = text
+        return message
+
+
+# ============================================================================
+# التشغيل
+# ============================================================================
+
+def _compress_time(bot, speed: float):
+    """
+    ضغط حدود الزمن في البوت بمعامل السرعة (أو إلغاء حدود النشر في وضع max)
+    """
+    pipeline = bot.pipeline
+    if speed:
+        bot.publisher.bucket.rate *= speed
+        pipeline.publish_interval /= speed
+        pipeline.aging_step /= speed
+        pipeline.deadlines = {priority: age / speed for priority, age in pipeline.deadlines.items()}
+        bot.story_clusterer.window /= speed
+    else:
+        bot.publisher.bucket.rate = 1e9
+        bot.publisher.bucket.burst = 1e9
+        pipeline.publish_interval = 0
+
+
+async def _replay(bot, records: List[Dict], speed: float, duplicate_threshold: float) -> Dict:
+    from http_pool_module import close_http_session
+
+    pipeline = bot.pipeline
+    scale = speed or 1.0
+    latencies: List[float] = []
+    published_texts = MinHashLSHIndex(max_items=max(len(records), 1), threshold=duplicate_threshold)
+    duplicates = 0
+
+    publish_fn = pipeline.publish_fn
+
+    async def observed_publish(item) -> bool:
+        nonlocal duplicates
+        ok = await publish_fn(item)
+        if ok:
+            now = datetime.now(timezone.utc)
+            for published in [item] + item.digest:
+                latencies.append((now - published.message_date).total_seconds() * scale)
+                key, _ = published_texts.query(published.text)
+                if key is not None:
+                    duplicates += 1
+                published_texts.add(published.text)
+        return ok
+
+    pipeline.publish_fn = observed_publish
+
+    chats = {}
+    await pipeline.start()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        for message_id, record in enumerate(records, 1):
+            if speed:
+                delay = start + record['offset'] / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # أسرع ما يستوعبه الخط: انتظار مكان في طابور الاستقبال بدلاً من الإسقاط
+                while pipeline.queues['filter'].full():
+                    await asyncio.sleep(0.001)
+
+            channel = record['channel']
+            if channel not in chats:
+                chats[channel] = FakeChat(-1000000000000 - len(chats), channel)
+            # تاريخ الرسالة = لحظة دخولها (زمن الوصول يُقاس من هنا)
+            message = FakeMessage(record['id'] or message_id, record['text'], datetime.now(timezone.utc))
+            await bot.handle_new_message(FakeEvent(message, chats[channel]))
+
+        await pipeline.join()
+    finally:
+        await pipeline.stop()
+        await close_http_session()
+
+    return {
+        'wall_s': round(loop.time() - start, 3),
+        'latencies': latencies,
+        'duplicates_published': duplicates,
+    }
+
+
+def run(args, records: List[Dict]) -> Dict:
+    server = MockLLMServer(args.llm_latency / (args.speed or 1.0), args.llm_jitter / (args.speed or 1.0),
+                           seed=args.seed)
+    server.start()
+    try:
+        bot = load_bot(server)
+        reset_bot(bot)
+        bot.client = FakeClient(args.send_latency / (args.speed or 1.0))
+        _compress_time(bot, args.speed)
+
+        outcome = asyncio.run(_replay(bot, records, args.speed, args.duplicate_threshold))
+    finally:
+        server.stop()
+
+    counters = bot.pipeline.counters
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'log': args.log or f"synthetic:{args.synthetic}",
+            'speed': args.speed or 'max',
+            'llm_latency_s': args.llm_latency,
+            'send_latency_s': args.send_latency,
+            'time_unit': 'replayed seconds' if args.speed else 'wall seconds',
+        },
+        'messages': len(records),
+        'recorded_span_s': records[-1]['offset'] if records else 0,
+        'wall_s': outcome['wall_s'],
+        'end_to_end': summarize(outcome['latencies'], outcome['wall_s'] * (args.speed or 1.0)),
+        'pipeline': dict(counters),
+        'drops': {
+            'queue_full': counters['dropped'],
+            'expired': counters['expired'],
+            'failed': counters['failed'],
+        },
+        'duplicates_published': outcome['duplicates_published'],
+        'llm_calls': server.requests,
+        'rewrites': {
+            result: bot.rewrite_results.value(result=result) for result in ('llm', 'fallback')
+        },
+        'filter_rejections': {
+            reason: bot.filter_rejections.value(reason=reason)
+            for reason in ('ad', 'low_quality', 'duplicate', 'story')
+        },
+        'telegram': {'sent': len(bot.client.sent), 'edits': bot.client.edits},
+    }
+
+
+def _speed(value: str) -> float:
+    return 0.0 if value in ('max', '0') else float(value.rstrip('x'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded message log through the bot pipeline')
+    parser.add_argument('log', nargs='?', help='سجل JSONL (channel, timestamp, text)')
+    parser.add_argument('--synthetic', type=int, default=0, help='توليد سجل اصطناعي بهذا العدد بدلاً من ملف')
+    parser.add_argument('--synthetic-rate', type=float, default=30, help='رسائل في الدقيقة في السجل الاصطناعي')
+    parser.add_argument('--write-log', help='حفظ السجل (مثلاً الاصطناعي) لإعادة استخدامه')
+    parser.add_argument('--speed', type=_speed, default=1.0, help='1، 10، ... أو max')
+    parser.add_argument('--llm-latency', type=float, default=1.5, help='زمن رد LLM الوهمي (ثوانٍ)')
+    parser.add_argument('--llm-jitter', type=float, default=0.5)
+    parser.add_argument('--send-latency', type=float, default=0.2, help='زمن send_message الوهمي (ثوانٍ)')
+    parser.add_argument('--duplicate-threshold', type=float, default=0.8,
+                        help='تشابه نصين منشورين يُعد عنده الثاني مكرراً')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='replay_results.json')
+    args = parser.parse_args(argv)
+    if not args.log and not args.synthetic:
+        parser.error('حدد ملف سجل أو --synthetic')
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] - %(message)s')
+    # load_bot يرفع مستوى السجل العام لإسكات سجلات كل رسالة
+    logger.setLevel(logging.INFO)
+
+    records = load_log(args.log) if args.log else synthetic_log(args.synthetic, args.seed, args.synthetic_rate)
+    if args.write_log:
+        write_log(records, args.write_log)
+    if not records:
+        logger.error("السجل فارغ")
+        return 1
+
+    logger.info(f"▶️ إعادة تشغيل {len(records)} رسالة بسرعة {args.speed or 'max'}")
+    report = run(args, records)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    e2e = report['end_to_end']
+    logger.info(
+        f"⏱️ زمن الوصول ({report['meta']['time_unit']}): p50={e2e['p50_ms'] / 1000:.2f} "
+        f"p90={e2e['p90_ms'] / 1000:.2f} p99={e2e['p99_ms'] / 1000:.2f} max={e2e['max_ms'] / 1000:.2f}"
+    )
+    logger.info(
+        f"📊 منشور: {report['pipeline']['published']} | مكرر منشور: {report['duplicates_published']} | "
+        f"مسقط: {report['drops']} | استدعاءات LLM: {report['llm_calls']} | النتائج في {args.output}"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
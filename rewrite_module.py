@@ -8,54 +8,17 @@ Advanced Text Rewriting System
 import re
 import random
 from typing import List, Dict, Tuple
+from arabic_module import CONJUNCTIONS, split_edges, word_key
+from lexicon_module import Lexicon, default_lexicon
 
 class AdvancedRewriter:
     """
     نظام صياغة متقدم لإعادة صياغة النصوص بأسلوب احترافي
     """
     
-    def __init__(self):
-        # قاموس المرادفات
-        self.synonyms = {
-            'قال': ['أفاد', 'ذكر', 'صرح', 'أعلن', 'أشار'],
-            'أعلن': ['أفصح', 'كشف', 'أظهر', 'بين', 'وضح'],
-            'يوم': ['أمس', 'غداً', 'الأمس', 'الغد', 'اليوم'],
-            'قطاع': ['مجال', 'حقل', 'ميدان', 'نطاق', 'مساحة'],
-            'مشكلة': ['قضية', 'معضلة', 'إشكالية', 'تحدي', 'عائق'],
-            'حل': ['معالجة', 'تدبير', 'إجراء', 'خطوة', 'تصرف'],
-            'تأثير': ['تأثر', 'انعكاس', 'نتيجة', 'عاقبة', 'أثر'],
-            'أهمية': ['أولوية', 'جدية', 'قيمة', 'وزن', 'دلالة'],
-            'زيادة': ['ارتفاع', 'تصاعد', 'نمو', 'تضاعف', 'تعاظم'],
-            'انخفاض': ['تراجع', 'هبوط', 'تقهقر', 'تناقص', 'تدني'],
-            'تطور': ['تقدم', 'نمو', 'ازدهار', 'تحسن', 'تطوير'],
-            'أزمة': ['أزمة', 'كارثة', 'محنة', 'ملمة', 'شدة'],
-            'سلبي': ['سيء', 'ضار', 'مؤذي', 'مقلق', 'مثير للقلق'],
-            'إيجابي': ['جيد', 'مفيد', 'مشجع', 'مبشر', 'واعد'],
-            'رسمي': ['حكومي', 'رسمي', 'مسؤول', 'معتمد', 'موثق'],
-            'غير رسمي': ['شعبي', 'عام', 'شفاهي', 'غير موثق', 'تقليدي'],
-            'بداية': ['انطلاق', 'بدء', 'ابتداء', 'بيان', 'انعقاد'],
-            'نهاية': ['انتهاء', 'إغلاق', 'توقف', 'ختام', 'إنهاء'],
-            'عالمي': ['دولي', 'عام', 'شامل', 'جماعي', 'عام'],
-            'محلي': ['إقليمي', 'وطني', 'محدود', 'خاص', 'جزئي'],
-            'كبير': ['ضخم', 'عملاق', 'هائل', 'ضخم', 'كبير الحجم'],
-            'صغير': ['ضئيل', 'محدود', 'بسيط', 'قليل', 'طفيف'],
-            'سريع': ['فوري', 'عاجل', 'حاني', 'سريع الخطى', 'متسارع'],
-            'بطيء': ['متأني', 'تدريجي', 'بطيء الخطى', 'متمهل', 'متراخي'],
-            'جديد': ['حديث', 'طري', 'معاصر', 'عصري', 'مستحدث'],
-            'قديم': ['عتيق', 'أثري', 'تراثي', 'تقليدي', 'موروث'],
-            'قوي': ['قوي البنية', 'متين', 'صلب', 'راسخ', 'محكم'],
-            'ضعيف': ['واهن', 'هش', 'رقيق', 'ناعم', 'لين'],
-            'واضح': ['جلي', 'بين', 'صريح', 'صريح', 'ظاهر'],
-            'غامض': ['غير واضح', 'ملتبس', 'غير محدد', 'غير صريح', 'مبهم'],
-            'مهم': ['حاسم', 'بالغ الأهمية', 'ضروري', 'لازم', 'أساسي'],
-            'ثانوي': ['فرعي', 'إضافي', 'تكميلي', 'هامشي', 'ملحق'],
-            'ناجح': ['ناجح', 'موفق', 'منتصر', 'فائز', 'ظافر'],
-            'فاشل': ['خاسر', 'مهزوم', 'مخفق', 'متعثر', 'منكسر'],
-            'آمن': ['آمن', 'محمي', 'مأمون', 'آمن', 'سالم'],
-            'خطر': ['مخيف', 'مهدد', 'مقلق', 'مثير للقلق', 'مريب'],
-            'صحيح': ['صحيح', 'دقيق', 'سليم', 'صائب', 'موثوق'],
-            'خاطئ': ['خطأ', 'غير صحيح', 'مغلوط', 'خاطئ', 'مشوه'],
-        }
+    def __init__(self, lexicon: Lexicon = None):
+        # قاموس المرادفات من المعجم المجمع (lexicon.json) المشترك بين كل النسخ
+        self.lexicon = lexicon if lexicon is not None else default_lexicon()
         
         # أنماط الجمل
         self.sentence_patterns = [
@@ -87,6 +50,16 @@ class AdvancedRewriter:
             'بالفعل', 'بالتأكيد', 'بالطبع', 'بالفعل', 'بلا ريب',
         ]
     
+    @property
+    def synonyms(self) -> Dict[str, Tuple[str, ...]]:
+        return self.lexicon.synonyms
+    
+    def use_lexicon(self, lexicon: Lexicon):
+        """
+        استبدال المعجم أثناء التشغيل بإسناد واحد
+        """
+        self.lexicon = lexicon
+    
     def clean_text(self, text: str) -> str:
         """
         تنظيف النص من الرموز والمسافات الزائدة
@@ -121,21 +94,37 @@ class AdvancedRewriter:
         words = text.split()
         rewritten_words = []
         
+        # مرجع واحد للجدول طوال الجملة (إعادة تحميل المعجم تستبدله ولا تعدله)
+        synonyms = self.synonyms
+        
         for word in words:
-            # البحث عن مرادف
-            word_lower = word.lower()
+            # علامات الترقيم الملتصقة تبقى في مكانها ("أعلن،" -> "كشف،")
+            lead, core, trail = split_edges(word)
             
-            if word_lower in self.synonyms:
-                # اختيار مرادف عشوائي
-                synonym = random.choice(self.synonyms[word_lower])
-                
-                # الحفاظ على حالة الأحرف الأصلية
-                if word[0].isupper():
-                    synonym = synonym.capitalize()
-                
-                rewritten_words.append(synonym)
+            # البحث عن مرادف: الكلمة المطبّعة كاملة (أعلنَ واعلن -> أعلن)، ثم
+            # جذعها بعد واو العطف أو فائه فقط (وأعلن -> و + أعلن). أداة التعريف
+            # لا تُفصل: مرادفات الكلمة النكرة لا تصلح معرّفة (اليوم -> الأمس)
+            normalized, prefix, stem = word_key(core)
+            
+            if normalized in synonyms:
+                choices, prefix = synonyms[normalized], ''
+            elif prefix in CONJUNCTIONS and stem in synonyms:
+                choices = synonyms[stem]
             else:
+                choices = None
+            
+            if not choices:
                 rewritten_words.append(word)
+                continue
+            
+            # اختيار مرادف عشوائي
+            synonym = random.choice(choices)
+            
+            # الحفاظ على حالة الأحرف الأصلية
+            if core[0].isupper():
+                synonym = synonym.capitalize()
+            
+            rewritten_words.append(lead + prefix + synonym + trail)
         
         return ' '.join(rewritten_words)
     
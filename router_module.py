@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+توجيه طلبات الصياغة بين مزودي LLM
+Latency-aware multi-provider rewrite router with hedged requests
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from breaker_module import OPEN
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """
+    إحصائيات متدحرجة لمزود واحد: زمن آخر window طلب ناجح ونسبة الأخطاء
+    """
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True = نجاح
+        self.last_failure = 0.0
+
+    def record(self, latency: float, ok: bool, now: float = None):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.last_failure = time.monotonic() if now is None else now
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        الشريحة المئوية q (بين 0 و1) لزمن الاستجابة، أو None قبل أول نجاح
+        """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> Dict:
+        return {
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p95': self.percentile(0.95),
+            'error_rate': self.error_rate,
+            'requests': len(self.outcomes),
+        }
+
+
+class RewriteRouter:
+    """
+    يوجه كل طلب صياغة إلى أسرع مزود سليم (حسب p50 المتدحرج).
+
+    كل مزود يتبع واجهة DeepSeekRewriter/OpenAIRewriter:
+        cache_key(text, style) -> مفتاح الذاكرة المؤقتة أو None
+        await arewrite(text, style, cache_lookup=False) -> (النص، هل نجح)
+
+    الذاكرة المؤقتة المشتركة (cache) يُبحث فيها مرة واحدة قبل التوجيه بمفاتيح
+    كل المزودين، فصياغة محفوظة من أي مزود تكفي ويُحسب الطلب إصابة أو إخفاقاً واحداً.
+
+    المزود غير سليم إذا تجاوزت نسبة أخطائه max_error_rate، ويُجرب من جديد
+    بعد cooldown ثانية من آخر فشل.
+
+    مع hedge: إذا لم يرد المزود الأول خلال زمن p90 الخاص به يُرسل الطلب نفسه
+    إلى المزود التالي، وتُعتمد أول صياغة ناجحة ويُلغى الطلب الآخر.
+    """
+
+    def __init__(self, providers: Dict[str, object], cache=None, hedge: bool = True,
+                 window: int = 100, max_error_rate: float = 0.5,
+                 cooldown: float = 30.0, min_hedge_delay: float = 0.2):
+        self.providers = dict(providers)
+        self.cache = cache
+        self.hedge = hedge
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.min_hedge_delay = min_hedge_delay
+        self.stats = {name: ProviderStats(window) for name in self.providers}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    # ------------------------------------------------------------------
+    # الاختيار
+    # ------------------------------------------------------------------
+
+    def is_healthy(self, name: str, now: float = None) -> bool:
+        # قاطع المزود المفتوح يرفض الطلب فوراً، فلا فائدة من تقديمه
+        breaker = getattr(self.providers[name], 'breaker', None)
+        if breaker is not None and breaker.state == OPEN:
+            return False
+
+        stats = self.stats[name]
+        if stats.error_rate <= self.max_error_rate:
+            return True
+        if now is None:
+            now = time.monotonic()
+        return now - stats.last_failure >= self.cooldown
+
+    def ranked(self) -> List[str]:
+        """
+        المزودون مرتبون: السليم قبل غير السليم، ثم الأسرع (p50)؛ من لا
+        إحصائيات له يحافظ على ترتيب التعريف ويسبق المعروفين حتى يُقاس
+        """
+        now = time.monotonic()
+        order = {name: i for i, name in enumerate(self.providers)}
+
+        def sort_key(name):
+            p50 = self.stats[name].percentile(0.5)
+            return (not self.is_healthy(name, now), p50 is not None, p50 or 0.0, order[name])
+
+        return sorted(self.providers, key=sort_key)
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """
+        زمن الانتظار قبل إرسال الطلب الاحتياطي (p90 للمزود الأول)
+        """
+        p90 = self.stats[name].percentile(0.9)
+        if p90 is None:
+            return None
+        return max(p90, self.min_hedge_delay)
+
+    # ------------------------------------------------------------------
+    # الصياغة
+    # ------------------------------------------------------------------
+
+    async def _call(self, name: str, text: str, style: str) -> Tuple[str, bool]:
+        started = time.monotonic()
+        try:
+            rewritten, ok = await self.providers[name].arewrite(text, style=style, cache_lookup=False)
+        except asyncio.CancelledError:
+            # طلب ألغاه التحوط: زمنه حتى الإلغاء حد أدنى لزمنه الفعلي، ويُحسب
+            # حتى لا يبقى مزود تباطأ في الصدارة بأرقامه القديمة
+            self.stats[name].latencies.append(time.monotonic() - started)
+            raise
+        self.stats[name].record(time.monotonic() - started, ok)
+        return rewritten, ok
+
+    async def arewrite(self, text: str, style: str = 'professional') -> Tuple[str, bool]:
+        """
+        إعادة الصياغة عبر أنسب مزود
+
+        Returns:
+            (النص المعاد صياغته، هل نجح) - بنفس واجهة المزودين
+        """
+        if self.cache is not None:
+            cached = self.cache.get_any(provider.cache_key(text, style) for provider in self.providers.values())
+            if cached is not None:
+                logger.info("♻️ صياغة محفوظة مسبقاً")
+                return cached, True
+
+        ranked = self.ranked()
+        if not ranked:
+            return text, False
+
+        primary = ranked[0]
+        rest = ranked[1:]
+        delay = self.hedge_delay(primary) if self.hedge and rest else None
+
+        if delay is None:
+            rewritten, ok = await self._call(primary, text, style)
+            if ok:
+                return rewritten, True
+        else:
+            rewritten, ok = await self._hedged(primary, rest[0], delay, text, style)
+            if ok:
+                return rewritten, True
+            rest = rest[1:]
+
+        # فشل الأول (أو الاثنان عند التحوط): تجربة الباقين بالترتيب
+        for name in rest:
+            logger.info(f"↪️ إعادة المحاولة عبر {name}...")
+            rewritten, ok = await self._call(name, text, style)
+            if ok:
+                return rewritten, True
+
+        return text, False
+
+    async def _hedged(self, primary: str, backup: str, delay: float,
+                      text: str, style: str) -> Tuple[str, bool]:
+        """
+        طلب أساسي، وطلب احتياطي إذا تأخر الأساسي أكثر من delay؛ أول نجاح يفوز
+        """
+        tasks = {asyncio.ensure_future(self._call(primary, text, style)): primary}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+
+        if not done:
+            logger.info(f"⏱️ {primary} تجاوز {delay:.2f}s - إرسال طلب احتياطي إلى {backup}")
+            self.hedges_fired += 1
+            tasks[asyncio.ensure_future(self._call(backup, text, style))] = backup
+        else:
+            # الأساسي رد قبل المهلة: إن فشل يُجرب الاحتياطي مباشرة
+            rewritten, ok = done.pop().result()
+            if ok:
+                return rewritten, True
+            return await self._call(backup, text, style)
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    rewritten, ok = task.result()
+                    if ok:
+                        if tasks[task] == backup:
+                            self.hedges_won += 1
+                        return rewritten, True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return text, False
+
+    def _provider_snapshot(self, name: str) -> Dict:
+        snapshot = self.stats[name].snapshot()
+        breaker = getattr(self.providers[name], 'breaker', None)
+        if breaker is not None:
+            snapshot['breaker'] = breaker.state
+        return snapshot
+
+    def snapshot(self) -> Dict:
+        """
+        إحصائيات كل مزود وعدادات التحوط
+        """
+        return {
+            'providers': {name: self._provider_snapshot(name) for name in self.providers},
+            'hedges_fired': self.hedges_fired,
+            'hedges_won': self.hedges_won,
+        }
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+جدولة الرسائل حسب أولوية القناة
+Priority scheduling with aging and deadlines for the rewrite and publish stages
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Callable, Dict, List, Optional
+
+
+class PriorityStageQueue(asyncio.Queue):
+    """
+    طابور أولويات محدود السعة بواجهة asyncio.Queue نفسها
+
+    الترتيب حسب "الموعد الفعلي" لكل رسالة:
+
+        وقت الاستلام + (الأولوية - 1) × aging_step
+
+    أي أن كل درجة أولوية أدنى تعادل تأخيراً ثابتاً قدره aging_step ثانية.
+    رسائل الأولوية نفسها تخرج بترتيب وصولها، ورسالة منخفضة الأولوية تتقدم
+    تلقائياً على رسائل أعلى منها وصلت بعدها بأكثر من الفارق، فلا تُحرم أبداً.
+    ولأن المفتاح ثابت لكل رسالة يكفي heap عادي دون إعادة ترتيب.
+    """
+
+    def __init__(self, maxsize: int = 0, aging_step: float = 30.0,
+                 max_priority: int = 4, deadlines: Optional[Dict[int, float]] = None):
+        self.aging_step = aging_step
+        self.max_priority = max_priority
+        # أقصى عمر (ثوانٍ) لكل أولوية قبل إسقاط الرسالة بدلاً من نشرها متأخرة
+        self.deadlines = deadlines or {}
+        self._counter = itertools.count()
+        super().__init__(maxsize)
+
+    # -- تخزين داخلي (نفس أسلوب asyncio.PriorityQueue) ----------------
+
+    def _init(self, maxsize):
+        self._queue = []
+
+    def _put(self, item):
+        heapq.heappush(self._queue, (self.sort_key(item), next(self._counter), item))
+
+    def _get(self):
+        return heapq.heappop(self._queue)[2]
+
+    # -- الأولوية والمواعيد ----------------------------------------------
+
+    def _level(self, item) -> int:
+        # القنوات غير المعروفة (999) تُعامل كأدنى مستوى بدلاً من تأخيرها بلا نهاية
+        return max(1, min(item.priority, self.max_priority))
+
+    def sort_key(self, item) -> float:
+        """
+        الموعد الفعلي للرسالة (الأصغر يخرج أولاً)
+        """
+        return item.received_at + (self._level(item) - 1) * self.aging_step
+
+    def deadline_for(self, priority: int) -> Optional[float]:
+        """
+        أقصى عمر مسموح لرسائل هذه الأولوية (أو None إذا لم يُحدد)
+        """
+        if priority in self.deadlines:
+            return self.deadlines[priority]
+        # أقرب أولوية محددة أعلى منها (رقماً أصغر) تنطبق عليها، فالحد 3 يشمل 999
+        applicable = [p for p in self.deadlines if p <= priority]
+        if applicable:
+            return self.deadlines[max(applicable)]
+        return None
+
+    def drain(self, predicate: Callable, limit: int) -> List:
+        """
+        سحب حتى limit رسالة تحقق predicate من الطابور دفعة واحدة (الأقدم موعداً أولاً)
+
+        الرسائل المسحوبة تُعد منجزة (task_done) لأن من سحبها يعالجها ضمن رسالة أخرى.
+        """
+        taken, kept = [], []
+        for entry in sorted(self._queue):
+            if len(taken) < limit and predicate(entry[2]):
+                taken.append(entry[2])
+            else:
+                kept.append(entry)
+        if not taken:
+            return taken
+
+        heapq.heapify(kept)
+        self._queue = kept
+        for _ in taken:
+            self.task_done()
+            # إيقاظ منتجين ينتظرون مكاناً في طابور كان ممتلئاً
+            self._wakeup_next(self._putters)
+        return taken
+
+    def is_expired(self, item, now: float = None) -> bool:
+        """
+        هل تجاوزت الرسالة الموعد النهائي لأولويتها؟
+        """
+        deadline = self.deadline_for(item.priority)
+        if deadline is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        return now - item.received_at > deadline
+
+
+def parse_deadlines(spec: str) -> Dict[int, float]:
+    """
+    تحويل نص مثل "3:600,999:300" إلى {3: 600.0, 999: 300.0}
+    """
+    deadlines = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        priority, seconds = part.split(':')
+        deadlines[int(priority)] = float(seconds)
+    return deadlines
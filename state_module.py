@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+
+"""
+حفظ حالة كشف التكرار والقصص والصياغات على القرص
+Persistent dedup/story/rewrite-cache/outbox state in an embedded SQLite (WAL) store
+"""
+
+import itertools
+import logging
+import sqlite3
+import struct
+import time
+from typing import Dict, FrozenSet, Hashable, Iterator, List, Optional, Tuple
+
+from dedup_module import MinHashLSHIndex
+from story_module import Facts, StoryClusterer
+
+logger = logging.getLogger(__name__)
+
+# حذف الصفوف الخارجة عن النافذة من القرص مرة كل PRUNE_EVERY إضافة
+PRUNE_EVERY = 500
+
+# مراحل صندوق الصادر: الثلاث الأولى غير منتهية وتُستأنف عند التشغيل
+OUTBOX_RECEIVED = 'received'
+OUTBOX_FILTERED = 'filtered'
+OUTBOX_REWRITTEN = 'rewritten'
+OUTBOX_PUBLISHED = 'published'
+OUTBOX_DROPPED = 'dropped'
+OUTBOX_PENDING = (OUTBOX_RECEIVED, OUTBOX_FILTERED, OUTBOX_REWRITTEN)
+
+# أعمدة أُضيفت بعد إنشاء الجداول (تُضاف إلى قاعدة قديمة عند الفتح)
+_ADDED_COLUMNS = {
+    'story': (('channel', 'TEXT'), ('numbers', 'TEXT'), ('places', 'TEXT')),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup (
+    key       INTEGER PRIMARY KEY,
+    added_at  REAL    NOT NULL,
+    tokens    BLOB    NOT NULL,
+    signature BLOB    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS story (
+    key        INTEGER PRIMARY KEY,
+    cluster_id INTEGER NOT NULL,
+    added_at   REAL    NOT NULL,
+    shingles   BLOB    NOT NULL,
+    signature  BLOB    NOT NULL,
+    channel    TEXT,
+    numbers    TEXT,
+    places     TEXT
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    chat_id      INTEGER NOT NULL,
+    message_id   INTEGER NOT NULL,
+    channel_name TEXT    NOT NULL,
+    priority     INTEGER NOT NULL,
+    text         TEXT    NOT NULL,
+    rewritten    TEXT,
+    stage        TEXT    NOT NULL,
+    updated_at   REAL    NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS outbox_stage ON outbox (stage);
+CREATE TABLE IF NOT EXISTS channel_cursor (
+    chat_id         INTEGER PRIMARY KEY,
+    last_message_id INTEGER NOT NULL,
+    updated_at      REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rewrite_cache (
+    key        TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    rewritten  TEXT NOT NULL
+);
+"""
+
+
+def pack_facts(facts: Facts) -> Tuple[str, str]:
+    """
+    أرقام الخبر وأماكنه نصاً (مفصولة بمسافة و|)
+    """
+    numbers, places = facts
+    return ' '.join(map(str, sorted(numbers))), '|'.join(sorted(places))
+
+
+def unpack_facts(numbers: Optional[str], places: Optional[str]) -> Facts:
+    # صف محفوظ قبل إضافة العمودين: لا أرقام ولا أماكن معروفة
+    return (
+        frozenset(int(number) for number in (numbers or '').split()),
+        frozenset(place for place in (places or '').split('|') if place),
+    )
+
+
+def pack_tokens(tokens: FrozenSet[int]) -> bytes:
+    """
+    تجزئات الكلمات (64 بت) بصيغة ثنائية ثابتة الترتيب
+    """
+    return struct.pack(f'<{len(tokens)}Q', *sorted(tokens))
+
+
+def unpack_tokens(blob: bytes) -> FrozenSet[int]:
+    return frozenset(struct.unpack(f'<{len(blob) // 8}Q', blob))
+
+
+def pack_signature(signature: Tuple[int, ...]) -> bytes:
+    """
+    توقيع MinHash (قيم 32 بت) بصيغة ثنائية
+    """
+    return struct.pack(f'<{len(signature)}I', *signature)
+
+
+def unpack_signature(blob: bytes) -> Tuple[int, ...]:
+    return struct.unpack(f'<{len(blob) // 4}I', blob)
+
+
+class StateStore:
+    """
+    مخزن SQLite مدمج بوضع WAL يحفظ بصمات النصوص (تجزئات الكلمات/المقاطع)
+    وتوقيعات MinHash، لا النصوص نفسها، فيُعاد بناء الفهارس عند التشغيل
+    دون إعادة حساب أي توقيع.
+
+    البحث يبقى في الذاكرة (الفهارس)، والمخزن لا يُقرأ إلا عند بدء التشغيل.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # يُفتح ويُقرأ في خيط بدء التشغيل ثم يُستخدم من حلقة الأحداث وحدها
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        # WAL: الكتابة تُلحق بالسجل دون قفل القراءة، وNORMAL يكفي لعدم فساد
+        # القاعدة (قد تضيع آخر إضافات قليلة عند انقطاع الكهرباء فقط)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self._add_columns()
+        self._rewrites = 0
+        self._outbox_marks = 0
+
+    def _add_columns(self):
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')}
+            for name, kind in columns:
+                if name not in existing:
+                    self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {kind}')
+
+    # ------------------------------------------------------------------
+    # كشف التكرار
+    # ------------------------------------------------------------------
+
+    def add_dedup(self, tokens: FrozenSet[int], signature: Tuple[int, ...],
+                  added_at: float = None) -> int:
+        """
+        حفظ مدخل تكرار جديد
+
+        Returns:
+            مفتاح المدخل (متزايد عبر مرات التشغيل)
+        """
+        if added_at is None:
+            added_at = time.time()
+        cursor = self.conn.execute(
+            'INSERT INTO dedup (added_at, tokens, signature) VALUES (?, ?, ?)',
+            (added_at, pack_tokens(tokens), pack_signature(signature)),
+        )
+        return cursor.lastrowid
+
+    def load_dedup(self, limit: int) -> Iterator[Tuple[int, FrozenSet[int], Tuple[int, ...]]]:
+        """
+        آخر limit مدخل (من الأقدم إلى الأحدث)
+        """
+        rows = self.conn.execute(
+            'SELECT key, tokens, signature FROM '
+            '(SELECT * FROM dedup ORDER BY key DESC LIMIT ?) ORDER BY key',
+            (limit,),
+        )
+        for key, tokens, signature in rows:
+            yield key, unpack_tokens(tokens), unpack_signature(signature)
+
+    def prune_dedup(self, keep: int):
+        """
+        حذف كل المدخلات عدا آخر keep
+        """
+        self.conn.execute(
+            'DELETE FROM dedup WHERE key <= (SELECT MAX(key) FROM dedup) - ?',
+            (keep,),
+        )
+
+    # ------------------------------------------------------------------
+    # القصص
+    # ------------------------------------------------------------------
+
+    def add_story_member(self, key: int, cluster_id: int, shingles: FrozenSet[int],
+                         signature: Tuple[int, ...], added_at: float,
+                         channel: str = None, facts: Facts = None):
+        numbers, places = pack_facts(facts) if facts is not None else (None, None)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO story '
+            '(key, cluster_id, added_at, shingles, signature, channel, numbers, places) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, cluster_id, added_at, pack_tokens(shingles), pack_signature(signature),
+             channel, numbers, places),
+        )
+
+    def load_story(self, since: float, limit: int) -> Iterator[Tuple[int, int, float, FrozenSet[int], Tuple[int, ...],
+                                                                    Optional[str], Facts]]:
+        """
+        أعضاء القصص المضافون بعد since (آخر limit عضو، من الأقدم إلى الأحدث)
+        """
+        rows = self.conn.execute(
+            'SELECT key, cluster_id, added_at, shingles, signature, channel, numbers, places FROM '
+            '(SELECT * FROM story WHERE added_at >= ? ORDER BY key DESC LIMIT ?) ORDER BY key',
+            (since, limit),
+        )
+        for key, cluster_id, added_at, shingles, signature, channel, numbers, places in rows:
+            yield (key, cluster_id, added_at, unpack_tokens(shingles), unpack_signature(signature),
+                   channel, unpack_facts(numbers, places))
+
+    def story_counters(self) -> Tuple[int, int]:
+        """
+        أكبر مفتاح عضو وأكبر رقم قصة محفوظين (0 إذا كان السجل فارغاً)
+        """
+        row = self.conn.execute('SELECT MAX(key), MAX(cluster_id) FROM story').fetchone()
+        return row[0] or 0, row[1] or 0
+
+    def prune_story(self, before: float):
+        self.conn.execute('DELETE FROM story WHERE added_at < ?', (before,))
+
+    # ------------------------------------------------------------------
+    # ذاكرة الصياغة المؤقتة
+    # ------------------------------------------------------------------
+
+    def get_rewrite(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        """
+        صياغة محفوظة لم تنته صلاحيتها: (وقت الانتهاء، النص) أو None
+        """
+        return self.conn.execute(
+            'SELECT expires_at, rewritten FROM rewrite_cache WHERE key = ? AND expires_at > ?',
+            (key, now),
+        ).fetchone()
+
+    def put_rewrite(self, key: str, rewritten: str, expires_at: float):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO rewrite_cache (key, expires_at, rewritten) VALUES (?, ?, ?)',
+            (key, expires_at, rewritten),
+        )
+
+        self._rewrites += 1
+        if self._rewrites % PRUNE_EVERY == 0:
+            self.conn.execute('DELETE FROM rewrite_cache WHERE expires_at <= ?', (time.time(),))
+
+    # ------------------------------------------------------------------
+    # صندوق الصادر (سجل مراحل كل رسالة مصدر)
+    # ------------------------------------------------------------------
+
+    def outbox_add(self, chat_id: int, message_id: int, channel_name: str,
+                   priority: int, text: str) -> bool:
+        """
+        تسجيل رسالة مصدر عند استلامها بمرحلة 'received'
+
+        Returns:
+            False إذا كانت الرسالة (chat_id, message_id) مسجلة مسبقاً
+        """
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO outbox '
+            '(chat_id, message_id, channel_name, priority, text, stage, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (chat_id, message_id, channel_name, priority, text, OUTBOX_RECEIVED, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def outbox_mark(self, chat_id: int, message_id: int, stage: str, rewritten: str = None):
+        """
+        نقل الرسالة إلى مرحلة جديدة (مع حفظ الصياغة عند 'rewritten')
+        """
+        self.conn.execute(
+            'UPDATE outbox SET stage = ?, rewritten = COALESCE(?, rewritten), updated_at = ? '
+            'WHERE chat_id = ? AND message_id = ?',
+            (stage, rewritten, time.time(), chat_id, message_id),
+        )
+
+        self._outbox_marks += 1
+        if self._outbox_marks % PRUNE_EVERY == 0:
+            self.prune_outbox()
+
+    def outbox_unfinished(self) -> List[Dict]:
+        """
+        الرسائل التي لم تصل إلى مرحلة نهائية (بترتيب استلامها)
+        """
+        rows = self.conn.execute(
+            'SELECT chat_id, message_id, channel_name, priority, text, rewritten, stage, updated_at '
+            'FROM outbox WHERE stage IN (?, ?, ?) ORDER BY updated_at',
+            OUTBOX_PENDING,
+        )
+        columns = ('chat_id', 'message_id', 'channel_name', 'priority', 'text', 'rewritten', 'stage', 'updated_at')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def cursors(self) -> Dict[int, int]:
+        """
+        مواضع كل القنوات: chat_id -> آخر رسالة مستلمة
+        """
+        return dict(self.conn.execute('SELECT chat_id, last_message_id FROM channel_cursor'))
+
+    def advance_cursor(self, chat_id: int, message_id: int):
+        """
+        تقديم موضع القناة (لا يرجع أبداً إلى رسالة أقدم)
+        """
+        self.conn.execute(
+            'INSERT INTO channel_cursor (chat_id, last_message_id, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (chat_id) DO UPDATE SET '
+            'last_message_id = MAX(last_message_id, excluded.last_message_id), '
+            'updated_at = excluded.updated_at',
+            (chat_id, message_id, time.time()),
+        )
+
+    def prune_outbox(self, max_age: float = 86400):
+        """
+        حذف الرسائل المنتهية الأقدم من max_age ثانية (تبقى فترةً لكشف إعادة تسليم Telegram)
+        """
+        self.conn.execute(
+            'DELETE FROM outbox WHERE stage NOT IN (?, ?, ?) AND updated_at < ?',
+            (*OUTBOX_PENDING, time.time() - max_age),
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+class PersistentDedupIndex(MinHashLSHIndex):
+    """
+    MinHashLSHIndex يحفظ كل إضافة في StateStore ويستعيد آخر max_items مدخل
+    عند الإنشاء، فلا يُعاد نشر خبر نُشر قبل إعادة التشغيل مباشرة.
+    """
+
+    def __init__(self, store: StateStore, max_items: int = 20000, **kwargs):
+        super().__init__(max_items=max_items, **kwargs)
+        self.store = store
+        self._added = 0
+
+        for key, tokens, signature in store.load_dedup(max_items):
+            super().add_signature(tokens, signature, key)
+        logger.info(f"💾 تم تحميل {len(self)} بصمة من سجل التكرار")
+
+    def add_signature(self, tokens: FrozenSet[int], signature: Tuple[int, ...],
+                      key: Hashable = None) -> Hashable:
+        # المفتاح يأتي من المخزن حتى لا يتصادم مع مفاتيح التشغيل السابق
+        if key is None:
+            key = self.store.add_dedup(tokens, signature)
+
+        self._added += 1
+        if self._added % PRUNE_EVERY == 0:
+            self.store.prune_dedup(self.max_items)
+
+        return super().add_signature(tokens, signature, key)
+
+
+class PersistentStoryClusterer(StoryClusterer):
+    """
+    StoryClusterer يحفظ أعضاء القصص ويستعيد قصص آخر window ثانية عند الإنشاء.
+
+    القصص المستعادة تُعامل كقصص نُشر قائدها، فلا تحل محله رسالة لاحقة.
+    """
+
+    def __init__(self, store: StateStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self._added = 0
+
+        # المفاتيح وأرقام القصص تكمل من حيث توقف التشغيل السابق
+        max_key, max_cluster_id = store.story_counters()
+        self._keys = itertools.count(max_key + 1)
+        self._cluster_ids = itertools.count(max_cluster_id + 1)
+
+        now = time.time()
+        restored = 0
+        for key, cluster_id, added_at, shingles, signature, channel, facts in store.load_story(
+                now - self.window, self.max_items):
+            self.restore(key, cluster_id, shingles, signature, added_at, channel, facts)
+            restored += 1
+        logger.info(f"💾 تم تحميل {restored} رسالة في {len(self)} قصة")
+
+    def _on_member(self, key: int, cluster_id: int, shingles: FrozenSet[int],
+                   signature: Tuple[int, ...], now: float, channel: Optional[str], facts: Facts):
+        self.store.add_story_member(key, cluster_id, shingles, signature, now, channel, facts)
+
+        self._added += 1
+        if self._added % PRUNE_EVERY == 0:
+            self.store.prune_story(now - self.window)
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+"""
+تجميع الأخبار المتشابهة من قنوات مختلفة في "قصص"
+Incremental cross-channel story clustering over normalized Arabic shingles
+"""
+
+import re
+import time
+import itertools
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from dedup_module import MinHashLSHIndex, hash_token
+from arabic_module import normalize_arabic, tokenize
+
+# (الأرقام، الأماكن) المذكورة في الخبر
+Facts = Tuple[FrozenSet[int], FrozenSet[str]]
+NO_FACTS: Facts = (frozenset(), frozenset())
+
+# أولوية قيادة شاغرة: أول نسخة من قناة أخرى تصبح القائد
+VACANT = 10 ** 9
+
+# أعداد حتى 6 خانات (الأطول أرقام هواتف ومعرفات)؛ \d تشمل الأرقام العربية الهندية (٣٠) وint() يحولها
+_NUMBER = re.compile(r'(?<!\d)\d{1,6}(?!\d)')
+
+# أرقام ليست أعداداً: الأوقات (10:30، الساعة 9) والتواريخ (15/10، 15 تشرين الأول)؛
+# قناتان تنقلان الحدث نفسه بتوقيت أو تاريخ مختلف لا تتعارضان
+_MONTHS = ('كانون|شباط|آذار|اذار|نيسان|أيار|ايار|حزيران|تموز|آب|اب|أيلول|ايلول|تشرين|'
+           'يناير|فبراير|مارس|أبريل|ابريل|إبريل|مايو|يونيو|يوليو|أغسطس|اغسطس|'
+           'سبتمبر|أكتوبر|اكتوبر|نوفمبر|ديسمبر')
+_NOT_COUNT = re.compile(
+    r'(?:الساعة|الساعه)\s*\d{1,2}(?:\s*:\s*\d{2})?'
+    r'|\d{1,4}\s*[:/\-]\s*\d{1,2}(?:\s*[:/\-]\s*\d{1,4})?'
+    r'|\d{1,2}\s+(?:من\s+)?(?:' + _MONTHS + r')(?!\w)'
+)
+# السنوات (2024) تواريخ لا حصائل
+_YEARS = range(1900, 2101)
+
+# ============================================================================
+# المقاطع الحرفية
+# ============================================================================
+
+def char_shingles(text: str, n: int = 4) -> FrozenSet[int]:
+    """
+    تجزئات المقاطع الحرفية (n حرف) للنص المطبّع
+    """
+    text = normalize_arabic(text)
+    if len(text) <= n:
+        return frozenset([hash_token(text)]) if text else frozenset()
+    return frozenset(hash_token(text[i:i + n]) for i in range(len(text) - n + 1))
+
+
+# ============================================================================
+# الأرقام والأماكن
+# ============================================================================
+
+def _differ(a: Set, b: Set) -> bool:
+    """
+    مجموعتان مذكورتان كلتاهما ولا تحوي إحداهما الأخرى (30 قتيلاً مقابل 120)
+    """
+    return bool(a) and bool(b) and not (a <= b or b <= a)
+
+
+# ============================================================================
+# التجميع
+# ============================================================================
+
+class StoryCluster:
+    """
+    قصة واحدة: مجموعة رسائل من قنوات مختلفة عن الحدث نفسه
+    """
+
+    def __init__(self, cluster_id: int, leader_key, leader_priority: int, now: float):
+        self.cluster_id = cluster_id
+        self.leader_key = leader_key
+        self.leader_priority = leader_priority
+        self.leader_claimed = False
+        self.created_at = now
+        self.members = 1
+        # القنوات التي نقلت القصة، والأرقام والأماكن المذكورة فيها
+        self.channels: Set[str] = set()
+        self.numbers: Set[int] = set()
+        self.places: Set[str] = set()
+        # رسائل لاحقة من قناة في القصة أصلاً (تحديثاتها): تُنشر ولا تُحجب
+        self.updates: Set[int] = set()
+        # قادة سابقون حلت محلهم رسالة أعلى أولوية (المفتاح -> الأولوية): تعود
+        # القيادة إلى أحدهم إن فشل القائد الحالي أو أُسقط قبل النشر
+        self.standby: Dict[int, int] = {}
+
+    def conflicts(self, facts: Facts) -> bool:
+        """
+        هل تذكر الرسالة أرقاماً أو أماكن مختلفة عن القصة (حصيلة محدثة، مدينة أخرى)
+        """
+        numbers, places = facts
+        return _differ(self.numbers, numbers) or _differ(self.places, places)
+
+    def join(self, channel: Optional[str], facts: Facts):
+        if channel:
+            self.channels.add(channel)
+        self.numbers.update(facts[0])
+        self.places.update(facts[1])
+
+
+class StoryClusterer:
+    """
+    تجميع تزايدي: كل رسالة جديدة تُقارن (عبر LSH) مع رسائل آخر window ثانية،
+    فإن تجاوز تشابه (Jaccard) مقاطعها الحرفية threshold مع إحداها انضمت إلى قصتها،
+    ما لم تذكر أرقاماً أو أماكن مختلفة عنها (خبر محدث أو حدث في مدينة أخرى).
+
+    رسالة واحدة فقط من كل قناة جديدة على القصة تُحجب: الأولى ("القائد") تتابع
+    إلى الصياغة، إلا إذا وصلت رسالة من قناة أعلى أولوية قبل أن تبدأ صياغة
+    القائد فتحل محله. رسائل القناة التي نقلت القصة أصلاً تُنشر دائماً.
+
+    القائد الذي لم يُنشر (release) يعيد القيادة إلى من حل محله، أو يتركها
+    شاغرة لأول نسخة لاحقة؛ والقائد المنشور (settle) يُنهي الاحتياط.
+
+    القصة تنتهي بعد window ثانية من إنشائها مهما انضم إليها.
+    """
+
+    def __init__(self, threshold: float = 0.35, window: float = 7200,
+                 shingle_size: int = 4, max_items: int = 5000, places: Iterable[str] = ()):
+        self.threshold = threshold
+        self.window = window
+        self.shingle_size = shingle_size
+        self.max_items = max_items
+
+        # صياغات القنوات المختلفة للخبر نفسه تتشابه عادة بين 0.3 و0.6 فقط،
+        # لذا شرائح صغيرة (96 = 48×2) تلتقط تقريباً كل زوج فوق 0.35
+        self.index = MinHashLSHIndex(max_items=max_items, threshold=threshold,
+                                     num_perm=96, bands=48)
+        self.clusters: Dict[int, StoryCluster] = {}
+        self._member_cluster: Dict[int, int] = {}
+        self._timeline = deque()  # (وقت الإضافة، مفتاح العضو)
+        self._keys = itertools.count()
+        self._cluster_ids = itertools.count(1)
+        self.use_places(places)
+
+    def use_places(self, places: Iterable[str]):
+        """
+        أسماء الأماكن المعروفة (من المعجم)، مفهرسة بأول كلمة مطبّعة
+        """
+        compiled: Dict[str, Set[Tuple[str, ...]]] = {}
+        for place in places:
+            words = tokenize(place)
+            if words:
+                compiled.setdefault(words[0], set()).add(words)
+        self._places = compiled
+
+    def facts(self, text: str) -> Facts:
+        """
+        الأعداد (دون الأوقات والتواريخ) والأماكن المعروفة المذكورة في النص
+        """
+        numbers = frozenset(
+            number for number in map(int, _NUMBER.findall(_NOT_COUNT.sub(' ', text)))
+            if number not in _YEARS
+        )
+
+        places = set()
+        words = tokenize(text)
+        for i, word in enumerate(words):
+            # بغداد وببغداد ولبغداد
+            for first in ((word, word[1:]) if word[:1] in 'بل' else (word,)):
+                for place in self._places.get(first, ()):
+                    if words[i + 1:i + len(place)] == place[1:]:
+                        places.add(' '.join(place))
+        return numbers, frozenset(places)
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._timeline and self._timeline[0][0] < cutoff:
+            _, key = self._timeline.popleft()
+            self.index.remove(key)
+            self._member_cluster.pop(key, None)
+
+        # القصص بترتيب إنشائها: تنتهي بعد window من الإنشاء، لا من آخر عضو
+        # (وإلا أبقت سلسلة تحديثات القصة حية بلا نهاية)
+        while self.clusters:
+            cluster = next(iter(self.clusters.values()))
+            if cluster.created_at >= cutoff:
+                break
+            del self.clusters[cluster.cluster_id]
+
+    def _match(self, shingles: FrozenSet[int], signature: Tuple[int, ...],
+               facts: Facts) -> Optional[StoryCluster]:
+        """
+        قصة أشبه عضو فوق الحد لا تتعارض أرقامها وأماكنها مع الرسالة
+        """
+        for match_key, _ in self.index.matches(shingles, signature):
+            cluster = self.clusters.get(self._member_cluster.get(match_key))
+            if cluster is not None and not cluster.conflicts(facts):
+                return cluster
+        return None
+
+    def assign(self, text: str, priority: int = 999, now: float = None,
+               channel: str = None) -> Tuple[int, int, bool]:
+        """
+        إضافة رسالة إلى قصتها (أو إنشاء قصة جديدة)
+
+        Returns:
+            (رقم القصة، مفتاح العضو، هل تُنشر: قائد القصة أو تحديث من قناة فيها)
+        """
+        if now is None:
+            now = time.time()
+        self._expire(now)
+
+        shingles = char_shingles(text, self.shingle_size)
+        signature = self.index.signature(shingles)
+        facts = self.facts(text)
+        cluster = self._match(shingles, signature, facts)
+
+        key = next(self._keys)
+        self.index.add_signature(shingles, signature, key)
+        self._timeline.append((now, key))
+
+        if cluster is None:
+            cluster = StoryCluster(next(self._cluster_ids), key, priority, now)
+            cluster.join(channel, facts)
+            self.clusters[cluster.cluster_id] = cluster
+            self._member_cluster[key] = cluster.cluster_id
+            self._on_member(key, cluster.cluster_id, shingles, signature, now, channel, facts)
+            return cluster.cluster_id, key, True
+
+        self._member_cluster[key] = cluster.cluster_id
+        self._on_member(key, cluster.cluster_id, shingles, signature, now, channel, facts)
+        cluster.members += 1
+
+        if channel and channel in cluster.channels:
+            # متابعة القناة نفسها للقصة: ليست نسخة من قناة أخرى
+            cluster.join(channel, facts)
+            cluster.updates.add(key)
+            return cluster.cluster_id, key, True
+
+        cluster.join(channel, facts)
+        if not cluster.leader_claimed and priority < cluster.leader_priority:
+            if cluster.leader_key is not None:
+                cluster.standby[cluster.leader_key] = cluster.leader_priority
+            cluster.leader_key = key
+            cluster.leader_priority = priority
+            return cluster.cluster_id, key, True
+
+        return cluster.cluster_id, key, False
+
+    def _on_member(self, key: int, cluster_id: int, shingles: FrozenSet[int],
+                   signature: Tuple[int, ...], now: float, channel: Optional[str], facts: Facts):
+        """
+        يُستدعى بعد ضم كل رسالة إلى قصتها (للحفظ على القرص في الأصناف الفرعية)
+        """
+
+    def restore(self, key: int, cluster_id: int, shingles: FrozenSet[int],
+                signature: Tuple[int, ...], added_at: float,
+                channel: str = None, facts: Facts = NO_FACTS):
+        """
+        إعادة عضو محفوظ إلى قصته (بترتيب الإضافة الأصلي)
+
+        القصة المستعادة تُعد منشورة: قائدها محجوز ولا تحل محله رسالة لاحقة.
+        """
+        self.index.add_signature(shingles, signature, key)
+        self._timeline.append((added_at, key))
+        self._member_cluster[key] = cluster_id
+
+        cluster = self.clusters.get(cluster_id)
+        if cluster is None:
+            cluster = StoryCluster(cluster_id, key, 999, added_at)
+            cluster.leader_claimed = True
+            self.clusters[cluster_id] = cluster
+        else:
+            cluster.members += 1
+        cluster.join(channel, facts)
+
+    def claim(self, cluster_id: int, key: int) -> bool:
+        """
+        حجز القيادة قبل الصياغة: يعيد False إذا حلت محل الرسالة رسالة أعلى أولوية
+        """
+        cluster = self.clusters.get(cluster_id)
+        if cluster is None:
+            # انتهت نافذة القصة قبل الوصول للصياغة - لا يوجد منافس
+            return True
+        if key in cluster.updates:
+            return True
+        if cluster.leader_key != key:
+            return False
+        cluster.leader_claimed = True
+        return True
+
+    def in_standby(self, cluster_id: int, key: int) -> bool:
+        """
+        هل الرسالة قائد سابق قد تعود إليه القيادة؟
+        """
+        cluster = self.clusters.get(cluster_id)
+        return cluster is not None and key in cluster.standby
+
+    def release(self, cluster_id: int, key: int) -> Optional[int]:
+        """
+        القائد لم يُنشر (فشلت صياغته أو نشره أو أُسقط): تعود القيادة إلى أعلى
+        القادة السابقين أولوية، وإلا تبقى شاغرة لأول نسخة لاحقة من قناة أخرى
+
+        Returns:
+            مفتاح القائد الجديد أو None
+        """
+        cluster = self.clusters.get(cluster_id)
+        if cluster is None or key is None or cluster.leader_key != key:
+            return None
+
+        cluster.leader_claimed = False
+        if not cluster.standby:
+            cluster.leader_key = None
+            cluster.leader_priority = VACANT
+            return None
+
+        key = min(cluster.standby, key=cluster.standby.get)
+        cluster.leader_priority = cluster.standby.pop(key)
+        cluster.leader_key = key
+        return key
+
+    def settle(self, cluster_id: int, key: int) -> List[int]:
+        """
+        نُشر القائد: لا حاجة للقادة السابقين بعد الآن
+
+        Returns:
+            مفاتيحهم (ليتخلص المستدعي من رسائلهم المنتظرة)
+        """
+        cluster = self.clusters.get(cluster_id)
+        if cluster is None or key is None or cluster.leader_key != key:
+            return []
+        standby = list(cluster.standby)
+        cluster.standby.clear()
+        return standby
+
+    def __len__(self) -> int:
+        return len(self.clusters)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+النشر المبكر مع التعديل التدريجي أثناء بث الصياغة
+Progressive channel message fed by a streaming LLM rewrite
+"""
+
+import re
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# نهاية جملة مكتملة: علامة وقف يليها فراغ (أي أن النموذج تجاوزها)
+_SENTENCE_END = re.compile(r'[.!?؟…\n](?=\s)')
+
+
+def complete_prefix(text: str) -> str:
+    """
+    الجزء المكتمل من النص المبثوث: حتى آخر نهاية جملة (فارغ إن لم تكتمل جملة بعد)
+    """
+    end = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+    return text[:end].strip()
+
+
+class ProgressiveMessage:
+    """
+    رسالة في قناة الوجهة تُنشر عند اكتمال أول جملة ثم تُعدل مكانها.
+
+    update() لا ينتظر النشر ولا التعديل: يحفظ آخر جزء مكتمل، ومهمة منفصلة
+    تنشره أو تعدل الرسالة به، فلا تتوقف قراءة البث خلف Telegram. التحديثات
+    تُدمج: يُعدل النص مرة واحدة على الأكثر كل min_interval ثانية وبآخر جزء
+    مكتمل فقط، فتبقى التعديلات ضمن حدود Telegram مهما كان عدد الأجزاء المبثوثة.
+
+    إن فشل النشر المبكر لا يُعاد مع كل جزء لاحق: تتوقف التحديثات الجزئية
+    ويُترك النص النهائي لـ finish() (أو لمرحلة النشر العادية).
+
+    send_fn(text) -> الرسالة المنشورة أو None، edit_fn(message, text)، وrender
+    يحول نص الصياغة إلى نص المنشور (مثل format_message).
+    """
+
+    def __init__(self, send_fn: Callable[[str], Awaitable], edit_fn: Callable[[object, str], Awaitable],
+                 render: Callable[[str], str] = None, min_interval: float = 3.0):
+        self.send_fn = send_fn
+        self.edit_fn = edit_fn
+        self.render = render or (lambda text: text)
+        self.min_interval = min_interval
+
+        self.message = None
+        self.shown: Optional[str] = None
+        self.edits = 0
+        # فشل النشر المبكر: لا نشر جزئي بعده
+        self.failed = False
+        self._last_edit = 0.0
+        self._latest: Optional[str] = None
+        self._closed = False
+        self._wake = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def update(self, partial: str):
+        """
+        استقبال النص المبثوث حتى الآن
+        """
+        if self._closed or self.failed:
+            return
+        prefix = complete_prefix(partial)
+        if not prefix or prefix == self._latest:
+            return
+
+        self._latest = prefix
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            while not self._closed and self._latest != self.shown:
+                if self.message is None:
+                    if not await self._send(self._latest):
+                        self.failed = True
+                        logger.warning("⚠️ تعذر النشر المبكر - يُنشر النص النهائي وحده")
+                        return
+                    logger.info("⚡ نُشرت أول جملة قبل اكتمال الصياغة")
+                    continue
+
+                wait = self._last_edit + self.min_interval - time.monotonic()
+                if wait > 0:
+                    # close() يوقظ المهمة فلا ينتظر finish() بقية الفاصل
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                await self._edit(self._latest)
+        finally:
+            self._flusher = None
+
+    async def close(self):
+        """
+        إيقاف التحديثات الجزئية وانتظار نشر أو تعديل جارٍ، فيُعرف بعدها هل نُشرت الرسالة
+        """
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None:
+            await self._flusher
+
+    async def finish(self, final_text: str) -> bool:
+        """
+        إظهار النص النهائي (نشر إن لم يُنشر شيء بعد، وإلا تعديل أخير)
+
+        Returns:
+            هل أصبح النص النهائي ظاهراً في القناة
+        """
+        await self.close()
+        if self.message is None:
+            return await self._send(final_text)
+        if final_text != self.shown:
+            return await self._edit(final_text)
+        return True
+
+    async def _send(self, text: str) -> bool:
+        try:
+            self.message = await self.send_fn(self.render(text))
+        except Exception as e:
+            logger.warning(f"⚠️ تعذر نشر الرسالة: {str(e)}")
+            self.message = None
+        if self.message is None:
+            return False
+        self.shown = text
+        self._last_edit = time.monotonic()
+        return True
+
+    async def _edit(self, text: str) -> bool:
+        self._last_edit = time.monotonic()
+        try:
+            await self.edit_fn(self.message, self.render(text))
+        except Exception as e:
+            # تعديل فائت لا يضر: التعديل التالي (أو النهائي) يحمل النص كاملاً
+            logger.warning(f"⚠️ تعذر تعديل الرسالة المنشورة: {str(e)}")
+            return False
+        self.shown = text
+        self.edits += 1
+        return True
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+# الوحدات ملفات مسطحة في جذر المستودع
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from arabic_module import detach_prefix, normalize_arabic, split_edges, tokenize, word_key
+from rewrite_module import AdvancedRewriter
+
+
+def test_normalize_folds_variants_and_strips_marks():
+    assert normalize_arabic('أعلنَ  الوزيرُ، إنّ «الأزمةَ» انتهـت!') == 'اعلن الوزير ان الازمه انتهت'
+    assert normalize_arabic('مستشفى') == 'مستشفي'
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('والحكومه', ('وال', 'حكومه')),
+    ('بالعراق', ('بال', 'عراق')),
+    ('للحكومه', ('لل', 'حكومه')),
+    ('الوزير', ('ال', 'وزير')),
+    ('وقال', ('و', 'قال')),
+    # الجذع قصير جداً: لا فصل
+    ('وقف', ('', 'وقف')),
+    ('فتح', ('', 'فتح')),
+    ('الي', ('', 'الي')),
+])
+def test_detach_prefix(word, expected):
+    assert detach_prefix(word) == expected
+
+
+def test_tokenize_matches_spelling_variants():
+    assert tokenize('أعلنَ الوزيرُ عن خطةٍ جديدة.') == tokenize('اعلن الوزير عن خطة جديده')
+    assert tokenize('والحكومة، بالعراق') == ('حكومه', 'عراق')
+    assert tokenize('!!! ...') == ()
+
+
+def test_word_key_keeps_whole_word():
+    assert word_key('واضح،') == ('واضح', 'و', 'اضح')
+    assert word_key('') == ('', '', '')
+
+
+def test_split_edges_keeps_diacritics_in_word():
+    assert split_edges('«أعلنَ»،') == ('«', 'أعلنَ', '»،')
+    assert split_edges('...') == ('...', '', '')
+
+
+@pytest.fixture
+def rewriter():
+    return AdvancedRewriter()
+
+
+@pytest.mark.parametrize('text', [
+    'أعلنت وزارة الصحة اليوم عن قرار',
+    'واليوم عُقد الاجتماع',
+    'فاليوم، بالتحديد',
+])
+def test_replace_words_leaves_today(rewriter, text):
+    for seed in range(30):
+        random.seed(seed)
+        assert 'اليوم' in rewriter.replace_words(text)
+
+
+def test_replace_words_does_not_detach_article(rewriter):
+    # حل في المعجم، لكن مرادفاتها النكرة لا تُلصق بأداة التعريف
+    for seed in range(30):
+        random.seed(seed)
+        assert rewriter.replace_words('والحل بالحل') == 'والحل بالحل'
+
+
+def test_replace_words_variants_and_conjunction(rewriter):
+    synonyms = rewriter.synonyms['اعلن']
+    random.seed(0)
+    words = rewriter.replace_words('أعلنَ «اعلن» وأعلن،').split()
+    assert words[0] in synonyms
+    assert words[1][0] == '«' and words[1][-1] == '»' and words[1][1:-1] in synonyms
+    assert words[2].startswith('و') and words[2].endswith('،') and words[2][1:-1] in synonyms
+
+
+def test_replace_words_prefers_whole_word(rewriter):
+    # واضح كلمة معروفة: لا تُقطع إلى و + اضح
+    random.seed(0)
+    assert rewriter.replace_words('واضح') in rewriter.synonyms['واضح']
+
+
+def test_replace_words_punctuation_only(rewriter):
+    assert rewriter.replace_words('— ... !') == '— ... !'
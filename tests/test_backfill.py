@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('telethon')
+
+from telethon.errors import FloodWaitError
+
+from backfill_module import Backfill
+from channels_module import ChannelInfo
+
+NOW = datetime.now(timezone.utc)
+
+
+class Message:
+    def __init__(self, message_id, minutes_ago):
+        self.id = message_id
+        self.date = NOW - timedelta(minutes=minutes_ago)
+
+
+class Client:
+    """
+    عميل وهمي: سجل كل قناة، ويسجل min_id لكل صفحة مطلوبة
+    """
+
+    def __init__(self, history, flood_waits=0):
+        self.history = history
+        self.flood_waits = flood_waits
+        self.requests = []
+
+    async def iter_messages(self, peer, limit, min_id, offset_date, reverse):
+        self.requests.append((peer, min_id))
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise FloodWaitError(request=None, capture=0)
+        page = sorted((m for m in self.history[peer] if m.id > min_id), key=lambda m: m.id)
+        for message in page[:limit]:
+            yield message
+
+
+def _channels(*names):
+    return [ChannelInfo(-100 - i, name, input_peer=name) for i, name in enumerate(names)]
+
+
+def _collect(backfill):
+    async def main():
+        return [(channel.name, message.id) async for channel, message in backfill.stream()]
+    return asyncio.run(main())
+
+
+def test_channels_are_merged_by_date():
+    client = Client({
+        'a': [Message(11, 50), Message(12, 30), Message(13, 10)],
+        'b': [Message(21, 40), Message(22, 20), Message(23, 5)],
+    })
+    channels = _channels('a', 'b')
+    backfill = Backfill(client, channels, {c.chat_id: 10 if c.name == 'a' else 20 for c in channels},
+                        pages_per_minute=6000)
+
+    assert _collect(backfill) == [('a', 11), ('b', 21), ('a', 12), ('b', 22), ('a', 13), ('b', 23)]
+
+
+def test_pages_advance_the_cursor_and_skip_old_messages():
+    # الرسالة 101 أقدم من max_age: تُقرأ (تحرك الموضع) ولا تُعاد
+    client = Client({'a': [Message(101, 120)] + [Message(100 + i, 30 - i) for i in range(2, 6)]})
+    channels = _channels('a')
+    backfill = Backfill(client, channels, {channels[0].chat_id: 100}, max_age=3600,
+                        page_size=2, pages_per_minute=6000)
+
+    assert _collect(backfill) == [('a', 102), ('a', 103), ('a', 104), ('a', 105)]
+    assert [min_id for _, min_id in client.requests] == [100, 102, 104]
+    assert backfill.pages == 3
+
+
+def test_channel_without_cursor_is_not_read():
+    client = Client({'a': [Message(1, 5)], 'b': [Message(2, 5)]})
+    channels = _channels('a', 'b')
+    backfill = Backfill(client, channels, {channels[1].chat_id: 0}, pages_per_minute=6000)
+
+    assert _collect(backfill) == [('b', 2)]
+    assert [peer for peer, _ in client.requests] == ['b']
+
+
+def test_flood_wait_resumes_from_the_same_cursor():
+    client = Client({'a': [Message(6, 5)]}, flood_waits=1)
+    channels = _channels('a')
+    backfill = Backfill(client, channels, {channels[0].chat_id: 5}, pages_per_minute=6000)
+
+    assert _collect(backfill) == [('a', 6)]
+    assert client.requests == [('a', 5), ('a', 5)]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+from batch_module import BatchingRewriter
+
+
+class Rewriter:
+    """
+    مزود وهمي يسجل الطلبات المنفردة والمجمعة
+    """
+
+    api_key = 'key'
+    breaker = None
+
+    def __init__(self, batch_outputs=None):
+        # دالة (النصوص) -> المخرجات، أو None للصياغة العادية لكل نص
+        self.batch_outputs = batch_outputs
+        self.single_calls = []
+        self.batch_calls = []
+
+    def lookup_cache(self, text, style='professional'):
+        return None
+
+    async def arewrite(self, text, style='professional', cache_lookup=True):
+        self.single_calls.append(text)
+        return f'مفرد: {text}', True
+
+    async def arewrite_batch(self, texts, style='professional'):
+        self.batch_calls.append(list(texts))
+        if self.batch_outputs is not None:
+            return self.batch_outputs(texts)
+        return [f'دفعة: {text}' for text in texts]
+
+
+def _rewrite_all(batcher, texts):
+    async def main():
+        return await asyncio.gather(*(batcher.arewrite(text, cache_lookup=False) for text in texts))
+    return asyncio.run(main())
+
+
+def test_full_batch_flushes_without_waiting():
+    rewriter = Rewriter()
+    batcher = BatchingRewriter(rewriter, max_batch=3, max_wait=10.0)
+
+    started = time.monotonic()
+    results = _rewrite_all(batcher, ['أ', 'ب', 'ج'])
+
+    assert time.monotonic() - started < 1.0
+    assert results == [('دفعة: أ', True), ('دفعة: ب', True), ('دفعة: ج', True)]
+    assert rewriter.batch_calls == [['أ', 'ب', 'ج']]
+    assert batcher.stats() == {'batches': 1, 'batched_items': 3, 'fallbacks': 0}
+
+
+def test_partial_batch_flushes_at_deadline():
+    rewriter = Rewriter()
+    batcher = BatchingRewriter(rewriter, max_batch=8, max_wait=0.05)
+
+    started = time.monotonic()
+    results = _rewrite_all(batcher, ['أ', 'ب'])
+
+    assert time.monotonic() - started >= 0.05
+    assert results == [('دفعة: أ', True), ('دفعة: ب', True)]
+    assert rewriter.batch_calls == [['أ', 'ب']]
+
+
+def test_single_request_is_sent_alone():
+    rewriter = Rewriter()
+    batcher = BatchingRewriter(rewriter, max_batch=8, max_wait=0.01)
+
+    assert _rewrite_all(batcher, ['أ']) == [('مفرد: أ', True)]
+    assert rewriter.batch_calls == []
+
+
+def test_missing_output_is_retried_alone():
+    rewriter = Rewriter(batch_outputs=lambda texts: ['دفعة: أ', None])
+    batcher = BatchingRewriter(rewriter, max_batch=2, max_wait=10.0)
+
+    assert _rewrite_all(batcher, ['أ', 'ب']) == [('دفعة: أ', True), ('مفرد: ب', True)]
+    assert rewriter.single_calls == ['ب']
+    assert batcher.fallbacks == 1
+
+
+def test_failed_batch_fails_every_item_without_retries():
+    rewriter = Rewriter(batch_outputs=lambda texts: None)
+    batcher = BatchingRewriter(rewriter, max_batch=2, max_wait=10.0)
+
+    assert _rewrite_all(batcher, ['أ', 'ب']) == [('أ', False), ('ب', False)]
+    assert rewriter.single_calls == []
+
+
+def test_cancelled_request_is_not_sent():
+    rewriter = Rewriter()
+    batcher = BatchingRewriter(rewriter, max_batch=8, max_wait=0.05)
+
+    async def main():
+        cancelled = asyncio.ensure_future(batcher.arewrite('ملغى', cache_lookup=False))
+        kept = asyncio.ensure_future(batcher.arewrite('باق', cache_lookup=False))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept
+
+    assert asyncio.run(main()) == ('مفرد: باق', True)
+    assert rewriter.batch_calls == []
+    assert rewriter.single_calls == ['باق']
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from breaker_module import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _call(breaker, latency):
+    """
+    طلب واحد بزمن latency كما يسجله المزود: نجاح، أو انتهاء مهلة، أو رفض القاطع
+    """
+    if not breaker.allow():
+        return 'rejected'
+    timeout = breaker.timeout()
+    if latency > timeout:
+        breaker.record_timeout(timeout)
+        return 'timeout'
+    breaker.record(True, latency)
+    return 'ok'
+
+
+def test_timeout_adapts_to_fast_provider():
+    breaker = CircuitBreaker('test', max_timeout=5.0, min_timeout=1.0)
+    assert breaker.timeout() == 5.0
+
+    for _ in range(50):
+        assert _call(breaker, 0.5) == 'ok'
+
+    assert breaker.timeout() == 1.0
+
+
+def test_timeout_grows_back_after_slow_down():
+    breaker = CircuitBreaker('test', max_timeout=5.0, min_timeout=1.0)
+    for _ in range(50):
+        _call(breaker, 0.5)
+
+    # المزود يستقر على 2s: أقل من max_timeout بكثير لكنه فوق المهلة الحالية
+    outcomes = [_call(breaker, 2.0) for _ in range(30)]
+
+    assert outcomes[0] == 'timeout'
+    assert outcomes[-10:] == ['ok'] * 10
+    assert breaker.state == CLOSED
+    assert breaker.timeout() >= 2.0
+
+
+def test_half_open_trial_uses_max_timeout():
+    breaker = CircuitBreaker('test', max_timeout=5.0, min_timeout=1.0, open_duration=30.0)
+    for _ in range(50):
+        _call(breaker, 0.5)
+    assert breaker.timeout() == 1.0
+
+    for _ in range(50):
+        breaker.record(False)
+    assert breaker.state == OPEN
+    assert _call(breaker, 2.0) == 'rejected'
+
+    breaker.opened_at = time.monotonic() - 31
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert breaker.timeout() == 5.0
+
+    breaker.record(True, 2.0)
+    assert breaker.state == CLOSED
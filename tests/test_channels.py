@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('telethon')
+
+import channels_module
+from channels_module import ChannelRegistry
+
+
+class Entity:
+    def __init__(self, peer_id, username=None, title=None):
+        self.id = peer_id
+        self.username = username
+        self.title = title
+
+
+class Client:
+    def __init__(self, entities):
+        self.entities = entities
+        self.lookups = []
+
+    async def get_entity(self, channel):
+        self.lookups.append(channel)
+        if channel not in self.entities:
+            raise ValueError(f'No entity for {channel}')
+        return self.entities[channel]
+
+
+class Event:
+    def __init__(self, chat_id, chat):
+        self.chat_id = chat_id
+        self.chat = chat
+        self.get_chat_calls = 0
+
+    async def get_chat(self):
+        self.get_chat_calls += 1
+        return self.chat
+
+
+@pytest.fixture(autouse=True)
+def plain_peers(monkeypatch):
+    # الكيانات هنا ليست أنواع Telethon: المعرف والـ InputPeer من الكيان مباشرة
+    monkeypatch.setattr(channels_module, 'get_peer_id', lambda entity: -entity.id)
+    monkeypatch.setattr(channels_module, 'get_input_peer', lambda entity: ('peer', entity.id))
+
+
+def _registry():
+    client = Client({
+        'AjaNews': Entity(1, 'AjaNews', 'الجزيرة عاجل'),
+        'Mena_Live': Entity(2, 'Mena_Live', 'مينا'),
+        '@dest': Entity(9, 'dest', 'الوجهة'),
+    })
+    registry = ChannelRegistry(client, {'AjaNews': 1, 'Mena_Live': 3})
+    asyncio.run(registry.resolve(['AjaNews', 'missing', 'Mena_Live'], '@dest'))
+    return client, registry
+
+
+def test_resolve_keeps_source_order_and_priorities():
+    _, registry = _registry()
+
+    assert [(info.name, info.chat_id, info.priority) for info in registry.sources] == [
+        ('AjaNews', -1, 1), ('Mena_Live', -2, 3),
+    ]
+    assert registry.unresolved == ['missing']
+    assert registry.chats() == [-1, -2, 'missing']
+    assert registry.destination_peer('@dest') == ('peer', 9)
+
+
+def test_priority_lookup_by_chat_id_without_network():
+    client, registry = _registry()
+    event = Event(-2, Entity(2))
+
+    info = asyncio.run(registry.from_event(event))
+    assert info.name == 'Mena_Live' and info.priority == 3
+    assert event.get_chat_calls == 0
+    assert registry.get(-1).title == 'الجزيرة عاجل'
+
+
+def test_unresolved_channel_is_looked_up_once():
+    _, registry = _registry()
+    chat = Entity(5, 'missing', 'قناة')
+
+    first = Event(-5, chat)
+    info = asyncio.run(registry.from_event(first))
+    assert info.name == 'missing' and info.priority == 999
+
+    second = Event(-5, chat)
+    assert asyncio.run(registry.from_event(second)) is info
+    assert first.get_chat_calls == 1 and second.get_chat_calls == 0
+
+
+def test_unresolved_destination_falls_back_to_name():
+    registry = ChannelRegistry(Client({}), {})
+    asyncio.run(registry.resolve([], '@dest'))
+    assert registry.destination is None
+    assert registry.destination_peer('@dest') == '@dest'
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from corpus_module import SyntheticCorpus
+from dedup_module import MinHashLSHIndex, jaccard, text_tokens
+from filter_module import SmartFilter
+
+
+@pytest.fixture(scope='module')
+def stream():
+    return [message['text'] for message in SyntheticCorpus(seed=7).generate(400)]
+
+
+@pytest.fixture(scope='module')
+def history():
+    return SyntheticCorpus(seed=8).texts(60)
+
+
+def _index(texts=()):
+    index = MinHashLSHIndex(max_items=5000)
+    for text in texts:
+        index.add(text)
+    return index
+
+
+def test_query_matches_brute_force(stream):
+    index = _index()
+    stored = []
+    found = 0
+
+    for text in stream:
+        tokens = text_tokens(text)
+        best = max((jaccard(tokens, other) for other in stored), default=0.0)
+        key, similarity = index.query(text)
+
+        assert (key is not None) == (best > index.threshold), text
+        if key is not None:
+            assert similarity == best
+            found += 1
+
+        index.add(text)
+        stored.append(tokens)
+
+    # التيار يحوي تكراراً حرفياً وشبه حرفي، فالمقارنة ليست بين فهرسين فارغين
+    assert found > 0
+
+
+def test_features_many_matches_features(stream):
+    index = _index()
+    assert index.features_many(stream) == [index.features(text) for text in stream]
+
+
+def _sequential(smart_filter, texts, stored_texts):
+    results = []
+    for text in texts:
+        result = smart_filter.filter_text(text, stored_texts)
+        if result['passed']:
+            if isinstance(stored_texts, MinHashLSHIndex):
+                stored_texts.add(text)
+            else:
+                stored_texts.append(text)
+        results.append(result)
+    return results
+
+
+def test_filter_many_matches_sequential_with_index(stream, history):
+    smart_filter = SmartFilter()
+    expected_index = _index(history)
+    expected = _sequential(smart_filter, stream, expected_index)
+
+    batch_index = _index(history)
+    assert smart_filter.filter_many(stream, batch_index, add=True) == expected
+    assert [tokens for _, tokens, _ in batch_index.entries()] == \
+        [tokens for _, tokens, _ in expected_index.entries()]
+
+    # دون add: النتائج نفسها والسجل لا يتغير
+    untouched = _index(history)
+    assert smart_filter.filter_many(stream, untouched) == expected
+    assert len(untouched) == len(history)
+
+
+def test_filter_many_matches_sequential_with_list(stream, history):
+    smart_filter = SmartFilter()
+    texts = stream[:150]
+    expected_list = list(history)
+    expected = _sequential(smart_filter, texts, expected_list)
+
+    batch_list = list(history)
+    assert smart_filter.filter_many(texts, batch_list, add=True) == expected
+    assert batch_list == expected_list
+
+    untouched = list(history)
+    assert smart_filter.filter_many(texts, untouched) == expected
+    assert untouched == history
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import signal
+
+from corpus_module import SyntheticCorpus
+from dedup_module import MinHashLSHIndex
+from filter_module import SmartFilter
+from filter_service_module import FilterService
+
+
+def _sequential(texts, history):
+    smart_filter = SmartFilter()
+    index = MinHashLSHIndex(max_items=5000)
+    for text in history:
+        index.add(text)
+    results = []
+    for text in texts:
+        result = smart_filter.filter_text(text, index)
+        if result['passed']:
+            index.add(text)
+        results.append(result)
+    return results
+
+
+def test_replacement_worker_keeps_verdicts():
+    texts = [message['text'] for message in SyntheticCorpus(seed=11).generate(120)]
+    history = SyntheticCorpus(seed=12).texts(30)
+    expected = _sequential(texts, history)
+
+    async def main():
+        index = MinHashLSHIndex(max_items=5000)
+        for text in history:
+            index.add(text)
+        service = FilterService(index, SmartFilter(), workers=1)
+        try:
+            await service.start()
+            results = [await service.filter(text) for text in texts[:40]]
+
+            # انهيار العملية: الرسالة التالية تُفلتر محلياً وعامل بديل يكمل
+            original = service._executors[0]
+            for pid in list(original._processes):
+                os.kill(pid, signal.SIGKILL)
+            await asyncio.sleep(0.3)
+
+            results += [await service.filter(text) for text in texts[40:]]
+            replacement = service._executors[0]
+            return results, service.stats(), original, replacement, len(index)
+        finally:
+            service.close()
+
+    results, stats, original, replacement, size = asyncio.run(main())
+
+    assert results == expected
+    assert stats['fallbacks'] == 1
+    assert stats['offloaded'] == len(texts) - 1
+    assert replacement is not original
+    assert replacement._mp_context.get_start_method() != 'fork'
+    assert size == len(history) + sum(result['passed'] for result in expected)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import os
+
+from lexicon_module import Lexicon, LexiconWatcher, load_lexicon
+
+
+def _write(path, ad_keywords, version=1):
+    data = {'version': version, 'ad_keywords': ad_keywords, 'trusted_keywords': ['عاجل'], 'synonyms': {}}
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+
+def _watcher(tmp_path, interval=0.0):
+    path = tmp_path / 'lexicon.json'
+    _write(path, ['خصم'])
+    current = load_lexicon(str(path), cache_dir=str(tmp_path / 'cache'))
+    swapped = []
+    watcher = LexiconWatcher(str(path), swapped.append, current=current,
+                             cache_dir=str(tmp_path / 'cache'), interval=interval)
+    return path, watcher, swapped
+
+
+def test_compiled_lexicon_is_reused_from_cache(tmp_path):
+    path = tmp_path / 'lexicon.json'
+    _write(path, ['خصم', 'خصم', 'عرض'])
+    first = load_lexicon(str(path), cache_dir=str(tmp_path / 'cache'))
+
+    assert first.ad_keywords == ('خصم', 'عرض')
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+
+    second = load_lexicon(str(path), cache_dir=str(tmp_path / 'cache'))
+    assert isinstance(second, Lexicon) and second is not first
+    assert second.digest == first.digest
+    assert second.matcher.scan('خصم كبير').count('ad') == 1
+
+
+def test_reload_swaps_lexicon_only_when_content_changes(tmp_path):
+    path, watcher, swapped = _watcher(tmp_path)
+
+    assert not watcher.reload()
+    assert swapped == []
+
+    _write(path, ['خصم', 'تخفيضات'], version=2)
+    assert watcher.reload()
+    assert [lexicon.version for lexicon in swapped] == [2]
+    assert watcher.current is swapped[0] and watcher.reloads == 1
+    assert swapped[0].matcher.scan('تخفيضات اليوم').count('ad') == 1
+
+
+def test_invalid_file_keeps_current_lexicon(tmp_path):
+    path, watcher, swapped = _watcher(tmp_path)
+    current = watcher.current
+
+    path.write_text('{ليس JSON', encoding='utf-8')
+    assert not watcher.reload()
+    assert watcher.current is current
+    assert swapped == []
+
+
+def test_watcher_picks_up_modified_file(tmp_path):
+    path, watcher, swapped = _watcher(tmp_path, interval=0.01)
+
+    async def main():
+        await watcher.start()
+        try:
+            _write(path, ['تخفيضات'], version=2)
+            # زمن تعديل مختلف حتى على أنظمة ملفات بدقة ثانية
+            stat = os.stat(path)
+            os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+            for _ in range(100):
+                if swapped:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await watcher.stop()
+
+    asyncio.run(main())
+    assert [lexicon.ad_keywords for lexicon in swapped] == [('تخفيضات',)]
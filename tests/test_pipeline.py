@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from pipeline_module import NewsItem, NewsPipeline
+
+
+def _run(items, filter_fn=None, rewrite_fn=None, publish_fn=None, deadlines=None):
+    """
+    تمرير رسائل عبر خط معالجة كامل وإعادة (الرسائل المسقطة، المنشورة، العدادات)
+    """
+    dropped, published = [], []
+
+    async def passthrough(item):
+        return True
+
+    async def publish(item):
+        published.append(item)
+        return True
+
+    async def main():
+        pipeline = NewsPipeline(
+            filter_fn=filter_fn or passthrough,
+            rewrite_fn=rewrite_fn or passthrough,
+            publish_fn=publish_fn or publish,
+            publish_interval=0, report_interval=0,
+            deadlines=deadlines, drop_fn=dropped.append,
+        )
+        await pipeline.start()
+        for item in items:
+            pipeline.submit(item)
+        await pipeline.join()
+        await pipeline.stop()
+        return pipeline.counters
+
+    counters = asyncio.run(main())
+    return dropped, published, counters
+
+
+def test_expired_item_is_reported_dropped():
+    stale = NewsItem('خبر قديم', priority=3)
+    stale.received_at -= 120
+    fresh = NewsItem('خبر جديد', priority=3)
+
+    dropped, published, counters = _run([stale, fresh], deadlines={3: 60})
+
+    assert dropped == [stale]
+    assert published == [fresh]
+    assert counters['expired'] == 1
+
+
+def test_stage_error_is_reported_dropped():
+    async def failing_rewrite(item):
+        if item.text == 'خطأ':
+            raise RuntimeError('boom')
+        return True
+
+    broken = NewsItem('خطأ')
+    good = NewsItem('سليم')
+
+    dropped, published, counters = _run([broken, good], rewrite_fn=failing_rewrite)
+
+    assert dropped == [broken]
+    assert published == [good]
+    assert counters['failed'] == 1
+
+
+def test_publish_error_drops_digest_members():
+    async def failing_publish(item):
+        raise RuntimeError('boom')
+
+    lead = NewsItem('رئيسي')
+    member = NewsItem('مضموم')
+    lead.digest = [member]
+
+    dropped, published, _ = _run([lead], publish_fn=failing_publish)
+
+    assert dropped == [lead, member]
+    assert published == []
+
+
+def test_rejections_are_left_to_stage_functions():
+    async def reject(item):
+        return False
+
+    dropped, published, counters = _run([NewsItem('إعلان')], filter_fn=reject)
+
+    assert dropped == []
+    assert counters['rejected'] == 1
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('telethon')
+
+from telethon.errors import FloodWaitError
+
+import publisher_module
+from publisher_module import Publisher, TokenBucket, build_digest
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(publisher_module.random, 'uniform', lambda a, b: a)
+
+
+class Channel:
+    """
+    send_fn وهمية: ترفع الأخطاء المعدة بالترتيب ثم تنجح
+    """
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.attempts = 0
+
+    async def send(self, text):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f'منشور: {text}'
+
+
+def _publisher(channel, **kwargs):
+    kwargs.setdefault('rate_per_minute', 6000)
+    kwargs.setdefault('burst', 10)
+    kwargs.setdefault('retry_base', 0.01)
+    return Publisher(channel.send, **kwargs)
+
+
+def test_flood_wait_pauses_then_resends():
+    channel = Channel([FloodWaitError(request=None, capture=0)])
+    publisher = _publisher(channel)
+
+    assert asyncio.run(publisher.send('خبر')) == 'منشور: خبر'
+    assert channel.attempts == 2
+    assert publisher.flood_waits == 1
+    assert publisher.retries == 0
+
+
+def test_repeated_flood_wait_gives_up():
+    channel = Channel([FloodWaitError(request=None, capture=0) for _ in range(3)])
+    publisher = _publisher(channel, max_flood_waits=2)
+
+    assert asyncio.run(publisher.send('خبر')) is None
+    assert channel.attempts == 3
+
+
+def test_flood_wait_pauses_every_sender():
+    channel = Channel()
+    publisher = _publisher(channel)
+
+    async def main():
+        # FloodWait تلقاه عامل آخر للتو
+        publisher._pause(0.2)
+        started = time.monotonic()
+        await asyncio.gather(publisher.send('أ'), publisher.send('ب'))
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.2
+
+
+def test_other_errors_retry_with_backoff_then_give_up():
+    channel = Channel([ConnectionError('x')] * 2)
+    publisher = _publisher(channel, max_retries=3)
+    assert asyncio.run(publisher.send('خبر')) == 'منشور: خبر'
+    assert publisher.retries == 2
+
+    channel = Channel([ConnectionError('x')] * 5)
+    publisher = _publisher(channel, max_retries=2)
+    assert asyncio.run(publisher.send('خبر')) is None
+    assert channel.attempts == 3
+
+
+def test_token_bucket_limits_rate_after_burst():
+    bucket = TokenBucket(rate=20.0, burst=2)
+
+    async def main():
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # رمزان فوراً، ثم رمز كل 0.05s
+    assert 0.09 <= asyncio.run(main()) < 0.5
+
+
+def test_build_digest_fits_limit():
+    digest = build_digest(['خبر طويل ' * 200, 'خبر قصير'], header='موجز', limit=500)
+    assert len(digest) <= 500
+    assert digest.startswith('موجز')
+    assert '▪️ خبر قصير' in digest
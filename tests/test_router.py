@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from cache_module import RewriteCache
+from router_module import RewriteRouter
+
+
+class Provider:
+    """
+    مزود وهمي بزمن استجابة ونتيجة ثابتين
+    """
+
+    def __init__(self, name, delay=0.0, ok=True):
+        self.name = name
+        self.delay = delay
+        self.ok = ok
+        self.calls = 0
+        self.cancelled = 0
+
+    def cache_key(self, text, style='professional'):
+        return f'{self.name}|{style}|{text}'
+
+    async def arewrite(self, text, style='professional', cache_lookup=True):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return (f'{self.name}: {text}', True) if self.ok else (text, False)
+
+
+def _router(*providers, hedge=True, measured=0.05, cache=None):
+    router = RewriteRouter({p.name: p for p in providers}, cache=cache, hedge=hedge, min_hedge_delay=0.01)
+    for provider in providers:
+        # زمن مقاس مسبقاً لكل مزود (p90 = مهلة التحوط)
+        for _ in range(10):
+            router.stats[provider.name].record(measured, True)
+    return router
+
+
+def test_hedge_backup_wins_and_primary_is_cancelled():
+    slow, fast = Provider('slow', delay=1.0), Provider('fast', delay=0.01)
+    router = _router(slow, fast)
+
+    async def main():
+        result = await router.arewrite('خبر')
+        # إلغاء الطلب الخاسر يصل إلى المزود
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == ('fast: خبر', True)
+    assert router.hedges_fired == 1 and router.hedges_won == 1
+    assert slow.cancelled == 1
+    assert fast.cancelled == 0
+
+
+def test_fast_primary_does_not_hedge():
+    primary, backup = Provider('primary', delay=0.0), Provider('backup')
+    router = _router(primary, backup)
+
+    assert asyncio.run(router.arewrite('خبر')) == ('primary: خبر', True)
+    assert router.hedges_fired == 0
+    assert backup.calls == 0
+
+
+def test_failed_primary_falls_back_to_next_provider():
+    broken, backup = Provider('broken', ok=False), Provider('backup')
+    router = _router(broken, backup, hedge=False)
+
+    assert asyncio.run(router.arewrite('خبر')) == ('backup: خبر', True)
+    assert broken.calls == 1 and backup.calls == 1
+
+
+def test_all_providers_failing_returns_original():
+    router = _router(Provider('a', ok=False), Provider('b', ok=False), hedge=False)
+    assert asyncio.run(router.arewrite('خبر')) == ('خبر', False)
+
+
+def test_ranked_by_health_then_latency():
+    slow, fast, failing = Provider('slow'), Provider('fast'), Provider('failing')
+    router = RewriteRouter({'slow': slow, 'fast': fast, 'failing': failing}, cooldown=30.0)
+    for _ in range(10):
+        router.stats['slow'].record(0.9, True)
+        router.stats['fast'].record(0.1, True)
+        router.stats['failing'].record(0.01, False)
+
+    assert router.ranked() == ['fast', 'slow', 'failing']
+    assert not router.is_healthy('failing')
+
+
+def test_cache_is_looked_up_once_for_all_providers():
+    first, second = Provider('first'), Provider('second')
+    cache = RewriteCache()
+    router = _router(first, second, hedge=False, cache=cache)
+
+    assert asyncio.run(router.arewrite('خبر')) == ('first: خبر', True)
+    assert cache.stats()['misses'] == 1
+
+    # صياغة محفوظة بمفتاح أي مزود تكفي دون استدعاء
+    cache.put(second.cache_key('نبأ'), 'محفوظ')
+    assert asyncio.run(router.arewrite('نبأ')) == ('محفوظ', True)
+    assert first.calls == 1 and second.calls == 0
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
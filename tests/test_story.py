@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+
+from state_module import PersistentStoryClusterer, StateStore
+from story_module import StoryClusterer
+
+PLACES = ['بغداد', 'البصرة', 'جنوب لبنان']
+
+REPORT = 'عاجل: مقتل 30 شخصاً في انفجار سيارة مفخخة وسط سوق شعبي في بغداد صباح اليوم'
+SAME_REPORT = 'عاجل | مقتل 30 شخصاً بانفجار سيارة مفخخة وسط سوق شعبي في بغداد صباح اليوم'
+UPDATED_TOLL = 'عاجل: مقتل 120 شخصاً في انفجار سيارة مفخخة وسط سوق شعبي في بغداد صباح اليوم'
+OTHER_CITY = 'عاجل: مقتل 30 شخصاً في انفجار سيارة مفخخة وسط سوق شعبي في البصرة صباح اليوم'
+UNRELATED = 'وزير الخارجية يلتقي نظيره الفرنسي لبحث العلاقات الثنائية والتعاون الاقتصادي'
+
+
+@pytest.fixture
+def clusterer():
+    return StoryClusterer(window=7200, places=PLACES)
+
+
+def test_other_channel_is_follower(clusterer):
+    first_id, first_key, first_leader = clusterer.assign(REPORT, 5, now=0, channel='a')
+    second_id, second_key, second_leader = clusterer.assign(SAME_REPORT, 5, now=10, channel='b')
+    assert first_leader and not second_leader
+    assert first_id == second_id
+    assert clusterer.claim(first_id, first_key)
+    assert not clusterer.claim(second_id, second_key)
+
+
+def test_higher_priority_replaces_unclaimed_leader(clusterer):
+    cluster_id, first_key, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    _, second_key, second_leader = clusterer.assign(SAME_REPORT, 1, now=10, channel='b')
+    assert second_leader
+    assert not clusterer.claim(cluster_id, first_key)
+    assert clusterer.claim(cluster_id, second_key)
+
+
+def test_failed_leader_hands_back_to_superseded(clusterer):
+    cluster_id, first_key, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    _, second_key, _ = clusterer.assign(SAME_REPORT, 1, now=10, channel='b')
+    assert not clusterer.claim(cluster_id, first_key)
+    assert clusterer.in_standby(cluster_id, first_key)
+
+    assert clusterer.claim(cluster_id, second_key)
+    # صياغة القائد الجديد أو نشره فشل: القيادة تعود إلى من حل محله
+    assert clusterer.release(cluster_id, second_key) == first_key
+    assert not clusterer.in_standby(cluster_id, first_key)
+    assert clusterer.claim(cluster_id, first_key)
+
+
+def test_failed_leader_without_standby_leaves_leadership_vacant(clusterer):
+    cluster_id, first_key, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    assert clusterer.claim(cluster_id, first_key)
+    assert clusterer.release(cluster_id, first_key) is None
+
+    copy_id, copy_key, publish = clusterer.assign(SAME_REPORT, 5, now=10, channel='b')
+    assert copy_id == cluster_id and publish
+    assert clusterer.claim(cluster_id, copy_key)
+
+
+def test_published_leader_settles_standby(clusterer):
+    cluster_id, first_key, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    _, second_key, _ = clusterer.assign(SAME_REPORT, 1, now=10, channel='b')
+    assert clusterer.claim(cluster_id, second_key)
+
+    assert clusterer.settle(cluster_id, second_key) == [first_key]
+    assert not clusterer.in_standby(cluster_id, first_key)
+    # إسقاط رسالة ليست القائد لا يغير القيادة
+    assert clusterer.release(cluster_id, first_key) is None
+
+
+def test_claimed_leader_is_not_replaced(clusterer):
+    cluster_id, first_key, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    assert clusterer.claim(cluster_id, first_key)
+    assert not clusterer.assign(SAME_REPORT, 1, now=10, channel='b')[2]
+
+
+def test_same_channel_follow_up_is_published(clusterer):
+    cluster_id, _, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    follow_id, follow_key, publish = clusterer.assign(SAME_REPORT, 5, now=10, channel='a')
+    assert follow_id == cluster_id and publish
+    assert clusterer.claim(follow_id, follow_key)
+
+
+@pytest.mark.parametrize('update', [UPDATED_TOLL, OTHER_CITY])
+def test_different_numbers_or_places_start_a_new_story(clusterer, update):
+    cluster_id, _, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    update_id, _, publish = clusterer.assign(update, 5, now=10, channel='b')
+    assert update_id != cluster_id and publish
+
+
+def test_facts():
+    clusterer = StoryClusterer(places=PLACES)
+    assert clusterer.facts('سقوط ٣٠ قتيلاً ببغداد و12 في جنوب لبنان') == (
+        frozenset({30, 12}), frozenset({'بغداد', 'جنوب لبنان'}),
+    )
+    assert clusterer.facts(UNRELATED) == (frozenset(), frozenset())
+
+
+def test_times_and_dates_are_not_counts():
+    clusterer = StoryClusterer(places=PLACES)
+    assert clusterer.facts('مقتل 30 شخصاً الساعة 10:45 صباحاً في 15/10/2024') == (
+        frozenset({30}), frozenset(),
+    )
+    assert clusterer.facts('يوم 15 تشرين الأول 2024 أصيب ٤٥ شخصاً') == (frozenset({45}), frozenset())
+
+
+def test_same_report_with_different_times_is_one_story(clusterer):
+    cluster_id, _, _ = clusterer.assign(REPORT + ' عند الساعة 09:15', 5, now=0, channel='a')
+    copy_id, _, publish = clusterer.assign(SAME_REPORT + ' عند الساعة 10:45', 5, now=10, channel='b')
+    assert copy_id == cluster_id and not publish
+
+
+def test_story_expires_from_creation(clusterer):
+    cluster_id, _, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    # انضمام متواصل لا يمدد عمر القصة
+    for minute in range(1, 120, 20):
+        assert clusterer.assign(SAME_REPORT, 5, now=minute * 60, channel='a')[0] == cluster_id
+    new_id, _, publish = clusterer.assign(SAME_REPORT, 5, now=7201, channel='b')
+    assert new_id != cluster_id and publish
+
+
+def test_unrelated_story(clusterer):
+    first_id, _, _ = clusterer.assign(REPORT, 5, now=0, channel='a')
+    second_id, _, publish = clusterer.assign(UNRELATED, 5, now=10, channel='b')
+    assert first_id != second_id and publish
+
+
+def test_restored_story_keeps_channels_and_facts(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    clusterer = PersistentStoryClusterer(store, places=PLACES)
+    cluster_id, _, _ = clusterer.assign(REPORT, 5, channel='a')
+
+    restored = PersistentStoryClusterer(store, places=PLACES)
+    follow_id, _, publish = restored.assign(SAME_REPORT, 5, channel='a')
+    assert follow_id == cluster_id and publish
+    copy_id, _, publish = restored.assign(SAME_REPORT, 5, channel='b')
+    assert copy_id == cluster_id and not publish
+    assert restored.assign(UPDATED_TOLL, 5, channel='b')[0] != cluster_id
+
+
+def test_old_story_table_gains_columns(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE story (key INTEGER PRIMARY KEY, cluster_id INTEGER NOT NULL, '
+                 'added_at REAL NOT NULL, shingles BLOB NOT NULL, signature BLOB NOT NULL)')
+    conn.close()
+
+    store = StateStore(path)
+    columns = {row[1] for row in store.conn.execute('PRAGMA table_info(story)')}
+    assert {'channel', 'numbers', 'places'} <= columns
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+from stream_module import ProgressiveMessage, complete_prefix
+
+SENTENCES = [f'الجملة رقم {i} من الخبر. ' for i in range(1, 31)]
+
+
+class Channel:
+    """
+    قناة وجهة وهمية تسجل النشر والتعديل
+    """
+
+    def __init__(self, send_ok=True, delay=0.0):
+        self.send_ok = send_ok
+        self.delay = delay
+        self.sent = []
+        self.edited = []
+
+    async def send(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+        return object() if self.send_ok else None
+
+    async def edit(self, message, text):
+        self.edited.append(text)
+
+
+async def _stream(progressive, pause=0.0):
+    text = ''
+    for sentence in SENTENCES:
+        text += sentence
+        await progressive.update(text)
+        await asyncio.sleep(pause)
+    return text.strip()
+
+
+def test_complete_prefix_stops_at_last_sentence():
+    assert complete_prefix('الجملة الأولى. والثانية لم تكتمل') == 'الجملة الأولى.'
+    assert complete_prefix('لا جملة مكتملة بعد') == ''
+
+
+def test_failed_early_send_is_not_retried_per_partial():
+    channel = Channel(send_ok=False)
+
+    async def main():
+        progressive = ProgressiveMessage(channel.send, channel.edit, min_interval=0)
+        final = await _stream(progressive, pause=0.001)
+        await progressive.close()
+        assert progressive.failed
+        assert progressive.message is None
+        assert len(channel.sent) == 1
+
+        # النص النهائي يُنشر مرة واحدة عند finish
+        channel.send_ok = True
+        assert await progressive.finish(final)
+        assert channel.sent[-1] == final
+        assert len(channel.sent) == 2
+
+    asyncio.run(main())
+
+
+def test_update_does_not_wait_for_send():
+    channel = Channel(delay=0.2)
+
+    async def main():
+        progressive = ProgressiveMessage(channel.send, channel.edit, min_interval=0)
+        started = time.monotonic()
+        final = await _stream(progressive)
+        assert time.monotonic() - started < 0.1
+
+        assert await progressive.finish(final)
+        assert channel.sent == [SENTENCES[0].strip()]
+        assert progressive.shown == final
+
+    asyncio.run(main())
+
+
+def test_edits_are_throttled_to_latest_prefix():
+    channel = Channel()
+
+    async def main():
+        progressive = ProgressiveMessage(channel.send, channel.edit, min_interval=0.1)
+        final = await _stream(progressive, pause=0.01)
+        assert await progressive.finish(final)
+        return progressive
+
+    progressive = asyncio.run(main())
+
+    # 30 جزءاً خلال ~0.3s: نشر واحد وتعديلات بعدد الفواصل لا بعدد الأجزاء
+    assert len(channel.sent) == 1
+    assert 1 <= len(channel.edited) <= 5
+    assert progressive.edits == len(channel.edited)
+    assert channel.edited[-1] == progressive.shown == ''.join(SENTENCES).strip()
+    # كل تعديل وسيط يحمل جزءاً مكتملاً أطول من سابقه
+    assert all(len(a) < len(b) for a, b in zip(channel.edited, channel.edited[1:]))